@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Control de admisión por tenant antes de llamar a Groq
+Token bucket de tokens/minuto y presupuesto de USD/día, compartidos entre workers vía SQLite
+"""
+
+import math
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Optional
+
+from sqlite_util import thread_connection
+
+
+class AdmissionRejected(Exception):
+    """El request excede el presupuesto del tenant; retry_after en segundos"""
+
+    def __init__(self, key: str, reason: str, retry_after: float):
+        super().__init__(f"Presupuesto excedido ({reason}) para {key}")
+        self.key = key
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Admission:
+    """Reserva hecha al admitir un request; se ajusta con el uso real al terminar"""
+
+    def __init__(self, key: str, day: str, tokens: float, cost_usd: float):
+        self.key = key
+        self.day = day
+        self.tokens = tokens
+        self.cost_usd = cost_usd
+
+
+class AdmissionController:
+    """Token bucket (tokens/minuto) y gasto diario (USD/día) por clave de tenant"""
+
+    def __init__(self, path: str, tokens_per_minute: float, usd_per_day: float,
+                 pricing: Callable[[str], Dict[str, float]]):
+        self.path = path
+        self.tokens_per_minute = tokens_per_minute
+        self.usd_per_day = usd_per_day
+        self.pricing = pricing
+        self._local = threading.local()
+
+        # Contadores expuestos en /debug (por proceso)
+        self.admitted = 0
+        self.rejected = 0
+
+        self._keepalive = self._connection()
+        with self._keepalive as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS daily_spend ("
+                "key TEXT NOT NULL, day TEXT NOT NULL, cost_usd REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (key, day))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    @staticmethod
+    def make_key(business_id: str, client_ip: Optional[str] = None) -> str:
+        """Clave del presupuesto: el negocio, opcionalmente combinado con la IP del cliente"""
+        return f"{business_id}|{client_ip}" if client_ip else str(business_id)
+
+    def estimate_cost(self, model: str, input_tokens: float, output_tokens: float) -> float:
+        """Costo estimado en USD con la tabla de precios del tracker"""
+        prices = self.pricing(model)
+        return (input_tokens * prices["input"] + output_tokens * prices["output"]) / 1_000_000
+
+    def _refill(self, conn: sqlite3.Connection, key: str, now: float) -> float:
+        """Tokens disponibles en el bucket al momento now (lleno si es la primera vez)"""
+        row = conn.execute("SELECT tokens, updated FROM token_buckets WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return self.tokens_per_minute
+        tokens, updated = row
+        rate = self.tokens_per_minute / 60.0
+        return min(self.tokens_per_minute, tokens + max(now - updated, 0) * rate)
+
+    def admit(self, key: str, model: str, input_tokens: int, output_tokens: int) -> Admission:
+        """Reserva tokens y USD estimados o lanza AdmissionRejected con el tiempo de espera"""
+        # Un request más grande que el bucket entra cuando el bucket está lleno
+        tokens = min(float(input_tokens + output_tokens), self.tokens_per_minute)
+        cost = self.estimate_cost(model, input_tokens, output_tokens)
+        now_dt = datetime.now()
+        now = now_dt.timestamp()
+        day = now_dt.date().isoformat()
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            available = self._refill(conn, key, now)
+            if available < tokens:
+                conn.execute("ROLLBACK")
+                self.rejected += 1
+                raise AdmissionRejected(key, "tokens_per_minute",
+                                        (tokens - available) / (self.tokens_per_minute / 60.0))
+
+            row = conn.execute("SELECT cost_usd FROM daily_spend WHERE key = ? AND day = ?", (key, day)).fetchone()
+            spent = row[0] if row else 0.0
+            if spent + cost > self.usd_per_day:
+                conn.execute("ROLLBACK")
+                self.rejected += 1
+                midnight = datetime.combine(now_dt.date() + timedelta(days=1), datetime.min.time())
+                raise AdmissionRejected(key, "usd_per_day", (midnight - now_dt).total_seconds())
+
+            conn.execute(
+                "INSERT INTO token_buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, available - tokens, now)
+            )
+            conn.execute(
+                "INSERT INTO daily_spend (key, day, cost_usd) VALUES (?, ?, ?) "
+                "ON CONFLICT (key, day) DO UPDATE SET cost_usd = cost_usd + excluded.cost_usd",
+                (key, day, cost)
+            )
+            conn.execute("COMMIT")
+        except AdmissionRejected:
+            raise
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.admitted += 1
+        return Admission(key, day, tokens, cost)
+
+    def settle(self, admission: Admission, tokens: int, cost_usd: float):
+        """Corrige la reserva con el uso real (devuelve o cobra la diferencia)"""
+        token_delta = admission.tokens - tokens
+        cost_delta = cost_usd - admission.cost_usd
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE token_buckets SET tokens = MIN(tokens + ?, ?) WHERE key = ?",
+                (token_delta, self.tokens_per_minute, admission.key)
+            )
+            conn.execute(
+                "UPDATE daily_spend SET cost_usd = MAX(cost_usd + ?, 0) WHERE key = ? AND day = ?",
+                (cost_delta, admission.key, admission.day)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def status(self, key: str) -> Dict[str, Any]:
+        """Estado del presupuesto de una clave"""
+        conn = self._connection()
+        now_dt = datetime.now()
+        row = conn.execute("SELECT cost_usd FROM daily_spend WHERE key = ? AND day = ?",
+                           (key, now_dt.date().isoformat())).fetchone()
+        return {
+            "tokens_available": self._refill(conn, key, now_dt.timestamp()),
+            "usd_spent_today": row[0] if row else 0.0
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuración y contadores para debug"""
+        return {
+            "enabled": True,
+            "tokens_per_minute": self.tokens_per_minute,
+            "usd_per_day": self.usd_per_day,
+            "admitted": self.admitted,
+            "rejected": self.rejected
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    """Valor del header Retry-After (segundos enteros, al menos 1)"""
+    return str(max(1, math.ceil(seconds)))
@@ -5,14 +5,33 @@ Servidor Flask local para el asistente de chat
 """
 
 import os
+import hmac
 import json
+import math
+import re
 import requests
 import time
-from flask import Flask, request, jsonify
+import uuid
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from dotenv import load_dotenv
 from debug_tracker import debug_tracker
+from usage_log import parse_timestamp
+from offer_engine import OfferTable
+from business_cache import BusinessSnapshotCache, CompiledBusiness, TenantRegistry, VersionConflict
+from catalog_delta import apply_catalog_delta, parse_catalog_delta
+from reply_cache import ReplyCache
+from singleflight import SingleFlight, flight_key
+from metrics import metrics, StageTimer, NULL_TIMER
+from admission import AdmissionController, AdmissionRejected, retry_after_header
+from sessions import SessionStore, compact_history, summarize, validate_history
+from token_estimator import TokenEstimator
+from locale_detector import locale_detector
+from cassette import CassetteStore, GROQ_MODES, split_reply
+from batch_runner import BatchRunner, BatchTotals, RateLimited, item_id
+from precompressed import PrecompressedBody
+from intent_router import IntentRouter, build_templates, template_language
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -23,7 +42,47 @@ CORS(app)
 # Configuración
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
 GROQ_MODEL = os.getenv('GROQ_MODEL', 'llama3-70b-8192')
+GROQ_API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1/chat/completions')
+GROQ_MODE = os.getenv('GROQ_MODE', 'live').lower()
+GROQ_CASSETTE_PATH = os.getenv('GROQ_CASSETTE_PATH', 'debug_data/groq_cassettes.db')
+GROQ_REPLAY_LATENCY_SCALE = float(os.getenv('GROQ_REPLAY_LATENCY_SCALE', '0'))
+GROQ_REPLAY_MISS = os.getenv('GROQ_REPLAY_MISS', 'error').lower()
 BUSINESS_JSON_PATH = 'data/business.json'
+BUSINESS_RELOAD_INTERVAL = float(os.getenv('BUSINESS_RELOAD_INTERVAL', '2'))
+BUSINESS_MAX_AGE = int(os.getenv('BUSINESS_MAX_AGE', '60'))
+BUSINESS_VERSIONED_MAX_AGE = int(os.getenv('BUSINESS_VERSIONED_MAX_AGE', '31536000'))
+CATALOG_ADMIN_TOKEN = os.getenv('CATALOG_ADMIN_TOKEN', '')
+TENANT_CACHE_SIZE = int(os.getenv('TENANT_CACHE_SIZE', '256'))
+CATALOG_FILTER = os.getenv('CATALOG_FILTER', 'true').lower() == 'true'
+CATALOG_TOP_N = int(os.getenv('CATALOG_TOP_N', '8'))
+REPLY_CACHE_ENABLED = os.getenv('REPLY_CACHE_ENABLED', 'false').lower() == 'true'
+REPLY_CACHE_SIZE = int(os.getenv('REPLY_CACHE_SIZE', '1024'))
+REPLY_CACHE_TTL = float(os.getenv('REPLY_CACHE_TTL', '3600'))
+REPLY_CACHE_PATH = os.getenv('REPLY_CACHE_PATH', '')
+USAGE_LOG_MAX_LIMIT = 1000
+GROQ_MAX_TOKENS = 700
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'false').lower() == 'true'
+ADMISSION_TOKENS_PER_MINUTE = float(os.getenv('ADMISSION_TOKENS_PER_MINUTE', '60000'))
+ADMISSION_USD_PER_DAY = float(os.getenv('ADMISSION_USD_PER_DAY', '5'))
+ADMISSION_PER_IP = os.getenv('ADMISSION_PER_IP', 'false').lower() == 'true'
+ADMISSION_DB_PATH = os.getenv('ADMISSION_DB_PATH', 'debug_data/admission.db')
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'debug_data/sessions.db')
+SESSION_MAX = int(os.getenv('SESSION_MAX', '10000'))
+SESSION_TTL = float(os.getenv('SESSION_TTL', '1800'))
+SESSION_MAX_MESSAGES = int(os.getenv('SESSION_MAX_MESSAGES', '40'))
+SESSION_MAX_MESSAGE_CHARS = int(os.getenv('SESSION_MAX_MESSAGE_CHARS', '4000'))
+SESSION_SUMMARY_CHARS = int(os.getenv('SESSION_SUMMARY_CHARS', '1200'))
+SESSION_HISTORY_TOKENS = int(os.getenv('SESSION_HISTORY_TOKENS', '1500'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+BATCH_MAX_CONCURRENCY = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+BATCH_MAX_RETRIES = int(os.getenv('BATCH_MAX_RETRIES', '5'))
+ROUTER_ENABLED = os.getenv('ROUTER_ENABLED', 'false').lower() == 'true'
+ROUTER_SMALL_MODEL = os.getenv('ROUTER_SMALL_MODEL', 'llama3-8b-8192')
+ROUTER_TEMPLATE_MIN_CONFIDENCE = float(os.getenv('ROUTER_TEMPLATE_MIN_CONFIDENCE', '0.75'))
+ROUTER_TEMPLATE_MAX_WORDS = int(os.getenv('ROUTER_TEMPLATE_MAX_WORDS', '8'))
+ROUTER_SMALL_MAX_WORDS = int(os.getenv('ROUTER_SMALL_MAX_WORDS', '20'))
+ROUTER_SMALL_MAX_PRODUCTS = int(os.getenv('ROUTER_SMALL_MAX_PRODUCTS', '2'))
+ROUTER_SMALL_MAX_HISTORY = int(os.getenv('ROUTER_SMALL_MAX_HISTORY', '6'))
 
 class BusinessProfile:
     """Clase para manejar el perfil del negocio"""
@@ -61,166 +120,754 @@ def format_money(amount: int, locale: str, currency: str) -> str:
     except:
         return str(amount)
 
+def build_offer_table(business: BusinessProfile, locale: str) -> OfferTable:
+    """Calcula las ofertas de todo el catálogo por lote, sin formatear"""
+    return OfferTable(business.catalog, business.payments, locale, business.currency, format_money)
+
 def compute_offers(business: BusinessProfile, locale: str) -> Dict[str, Any]:
     """Calcula las ofertas y descuentos"""
-    offers = {}
-    
-    for product in business.catalog:
-        base_price = product.get('price', 0)
-        
-        # Calcular descuentos
-        discounts = []
-        for discount in business.payments.get('discounts', []):
-            discount_value = int(base_price * (1 - discount['percent'] / 100))
-            discounts.append({
-                'key': discount['key'],
-                'label': discount['label'],
-                'value': discount_value,
-                'formatted': format_money(discount_value, locale, business.currency)
-            })
-        
-        # Calcular cuotas
-        installments = None
-        if business.payments.get('installments'):
-            inst_data = business.payments['installments']
-            count = inst_data.get('count')
-            if count and count > 0:
-                per_installment = int(base_price / count)
-                installments = {
-                    'label': inst_data.get('label', ''),
-                    'perInstallment': per_installment,
-                    'count': count,
-                    'formattedEach': format_money(per_installment, locale, business.currency)
-                }
-        
-        offers[product['sku']] = {
-            'sku': product['sku'],
-            'title': product['title'],
-            'base_price': base_price,
-            'formatted': {
-                'base': format_money(base_price, locale, business.currency),
-                'discounts': discounts,
-                'installments': installments
-            }
-        }
-    
-    return offers
+    return build_offer_table(business, locale).offers()
 
-def build_system_prompt(business: BusinessProfile, locale: str, offers: Dict[str, Any]) -> str:
-    """Construye el prompt del sistema para Groq"""
+def build_prompt_prefix(business: BusinessProfile) -> str:
+    """Construye la parte fija del prompt (reglas, tono y políticas)
+    
+    No depende del locale ni del mensaje: es idéntica byte a byte para todos los requests
+    de una versión del negocio y el proveedor puede cachearla.
+    """
     policies = ' '.join(filter(None, [
         business.policies.get('stock'),
         business.policies.get('disclaimer')
     ]))
     
-    prompt = f"""Eres un agente comercial del negocio "{business.name}". Habla en {locale}. Tono: {business.tone.get('style', 'amigable')}.
+    return f"""Eres un agente comercial del negocio "{business.name}". Tono: {business.tone.get('style', 'amigable')}.
 
 Reglas:
 - Usa EXCLUSIVAMENTE la información de catálogo y de ofertas calculadas que te paso. No inventes stock, precios ni tiempos.
 - Si falta información clave, pide SOLO un dato adicional de manera breve.
 - Formatea como chat amigable estilo WhatsApp, con bullets y emojis moderados. Evita párrafos largos.
 - Cuando menciones precios, utiliza los números ya FORMATEADOS provistos y NO recalcules.
-- Cierra con: "{business.tone.get('signoff', '¡Gracias!')}". Si hablaste de precios, añade: "{policies}".
+- Cierra con: "{business.tone.get('signoff', '¡Gracias!')}". Si hablaste de precios, añade: "{policies}"."""
 
-CATÁLOGO RELEVANTE (con ofertas):"""
+def build_locale_instruction(locale: str) -> str:
+    """Comienzo de la parte variable del prompt: el idioma de la respuesta"""
+    return f"\n\nHabla en {locale}."
+
+def render_offer(offer: Dict[str, Any]) -> str:
+    """Renderiza un producto con sus ofertas como fragmento del prompt"""
+    fragment = f"\n- {offer['sku']} · {offer['title']}"
+    fragment += f"\n  Precio base: {offer['formatted']['base']}"
+    
+    for discount in offer['formatted']['discounts']:
+        fragment += f"\n  • {discount['label']}: {discount['formatted']}"
+    
+    if offer['formatted']['installments']:
+        inst = offer['formatted']['installments']
+        fragment += f"\n  • {inst['label']}: {inst['count']} pagos de {inst['formattedEach']}"
+    
+    return fragment
+
+def render_category_summary(business: BusinessProfile, locale: str, categories: list) -> str:
+    """Renderiza el resumen por categoría usado cuando ningún producto coincide"""
+    summary = ""
+    for entry in categories:
+        summary += f"\n- {entry['category']}: {entry['count']} productos"
+        if entry['segments']:
+            summary += f" ({', '.join(entry['segments'])})"
+        if entry['min_price'] is not None:
+            summary += f", desde {format_money(entry['min_price'], locale, business.currency)}"
+    return summary
+
+def build_system_prompt(business: BusinessProfile, locale: str, offers: Dict[str, Any]) -> str:
+    """Construye el prompt del sistema para Groq"""
+    prompt = build_prompt_prefix(business) + build_locale_instruction(locale)
+    prompt += "\n\nCATÁLOGO RELEVANTE (con ofertas):"
     
     for offer in offers.values():
-        prompt += f"\n- {offer['sku']} · {offer['title']}"
-        prompt += f"\n  Precio base: {offer['formatted']['base']}"
-        
-        for discount in offer['formatted']['discounts']:
-            prompt += f"\n  • {discount['label']}: {discount['formatted']}"
-        
-        if offer['formatted']['installments']:
-            inst = offer['formatted']['installments']
-            prompt += f"\n  • {inst['label']}: {inst['count']} pagos de {inst['formattedEach']}"
+        prompt += render_offer(offer)
     
     return prompt
 
-def detect_locale(message: str, fallback: str = 'es-AR') -> str:
-    """Detecta el idioma del mensaje"""
-    if not message:
-        return fallback
+class CompiledLocale:
+    """Ofertas y fragmentos de prompt de un negocio para un locale, formateados bajo demanda
+    
+    Arma solo la cola variable del prompt; el prefijo fijo lo guarda el negocio compilado.
+    """
+    
+    # Por encima de este tamaño el largo del prompt completo se extrapola de una muestra
+    FULL_PROMPT_MEASURE_LIMIT = 2000
+    
+    def __init__(self, business: BusinessProfile, locale: str):
+        self.table = build_offer_table(business, locale)
+        self.header = build_locale_instruction(locale)
+        self._fragments: Dict[str, str] = {}
+        self._full_prompt = None
+        self._full_prompt_chars = None
+        self._summary = None
+        self._business = business
+        self._locale = locale
+    
+    def patched(self, business: BusinessProfile, changed_skus: set) -> 'CompiledLocale':
+        """Locale compilado del negocio modificado: reutiliza ofertas y fragmentos de los SKUs sin cambios"""
+        compiled = CompiledLocale.__new__(CompiledLocale)
+        compiled.table = self.table.patched(business.catalog, business.payments, changed_skus)
+        compiled.header = self.header
+        # Un fragmento sirve mientras la oferta de la que salió siga en la tabla nueva
+        # (si cambiaron descuentos o cuotas no queda ninguna)
+        fragments = self._fragments.copy()
+        compiled._fragments = {sku: fragment for sku, fragment in fragments.items()
+                               if compiled.table.is_formatted(sku)}
+        compiled._full_prompt = None
+        compiled._full_prompt_chars = None
+        compiled._summary = None
+        compiled._business = business
+        compiled._locale = self._locale
+        return compiled
+    
+    def fragment(self, sku: str) -> str:
+        """Fragmento del prompt de un producto"""
+        fragment = self._fragments.get(sku)
+        if fragment is None:
+            fragment = render_offer(self.table.offer(sku))
+            self._fragments[sku] = fragment
+        return fragment
+    
+    @property
+    def full_prompt(self) -> str:
+        """Cola del prompt con el catálogo completo"""
+        if self._full_prompt is None:
+            self._full_prompt = (self.header + "\n\nCATÁLOGO RELEVANTE (con ofertas):"
+                                 + ''.join(self.fragment(sku) for sku in self.table.skus))
+        return self._full_prompt
+    
+    @property
+    def full_prompt_chars(self) -> int:
+        """Largo de la cola con el catálogo completo (extrapolado en catálogos grandes)"""
+        if self._full_prompt_chars is None:
+            skus = self.table.skus
+            if self._full_prompt is not None or len(skus) <= self.FULL_PROMPT_MEASURE_LIMIT:
+                self._full_prompt_chars = len(self.full_prompt)
+            else:
+                step = len(skus) // self.FULL_PROMPT_MEASURE_LIMIT
+                sample = skus[::step]
+                sample_chars = sum(len(self.fragment(sku)) for sku in sample)
+                self._full_prompt_chars = (len(self.header + "\n\nCATÁLOGO RELEVANTE (con ofertas):")
+                                           + sample_chars * len(skus) // len(sample))
+        return self._full_prompt_chars
+    
+    def prompt_for(self, skus: list) -> str:
+        """Cola del prompt con solo los productos indicados"""
+        return (self.header + "\n\nCATÁLOGO RELEVANTE (con ofertas):"
+                + ''.join(self.fragment(sku) for sku in skus if sku in self.table))
+    
+    def summary_prompt(self, categories: list) -> str:
+        """Cola del prompt con el resumen por categoría en lugar del detalle de productos"""
+        if self._summary is None:
+            self._summary = (self.header + "\n\nCATÁLOGO (resumen por categoría, pide al cliente qué le interesa para darle precios):"
+                             + render_category_summary(self._business, self._locale, categories))
+        return self._summary
+
+def compile_business_locale(business: BusinessProfile, locale: str) -> CompiledLocale:
+    """Calcula las ofertas de un locale; los fragmentos de prompt se arman bajo demanda"""
+    return CompiledLocale(business, locale)
+
+def patch_business_locale(compiled_locale: CompiledLocale, business: BusinessProfile,
+                          changed_skus: set) -> CompiledLocale:
+    """Recalcula un locale ya compilado solo para los SKUs cambiados por un PATCH del catálogo"""
+    return compiled_locale.patched(business, changed_skus)
+
+def select_catalog(compiled, compiled_locale: CompiledLocale, message: str,
+                   top_n: int = None) -> tuple[str, Dict[str, Any]]:
+    """Elige el prompt según los productos relevantes al mensaje y reporta el ahorro
+
+    El prompt es el prefijo fijo del negocio seguido de la cola con el catálogo elegido.
+    Con top_n se filtra siempre (aunque CATALOG_FILTER esté apagado); top_n=0 deja solo el resumen.
+    """
+    total = len(compiled_locale.table)
+    if not CATALOG_FILTER and top_n is None:
+        tail = compiled_locale.full_prompt
+        included = total
+        fallback = False
+    else:
+        skus = compiled.index.search(message, CATALOG_TOP_N if top_n is None else top_n) if top_n != 0 else []
+        fallback = not skus
+        if fallback:
+            tail = compiled_locale.summary_prompt(compiled.index.categories())
+        else:
+            tail = compiled_locale.prompt_for(skus)
+        included = len(skus)
+    
+    prefix = compiled.prompt_prefix
+    system_prompt = prefix + tail
+    full_chars = len(prefix) + compiled_locale.full_prompt_chars
+    # El catálogo completo se estima con la relación tokens/caracteres del prompt elegido
+    prompt_tokens = token_estimator.count(system_prompt, GROQ_MODEL)
+    return system_prompt, {
+        "products_total": total,
+        "products_included": included,
+        "fallback_summary": fallback,
+        "prompt_chars": len(system_prompt),
+        "full_prompt_chars": full_chars,
+        "prefix_chars": len(prefix),
+        "prefix_hash": compiled.prefix_hash,
+        "estimated_tokens_saved": max(full_chars - len(system_prompt), 0) * prompt_tokens // max(len(system_prompt), 1)
+    }
+
+# Snapshot compilado de business.json (se recarga solo si cambia el archivo)
+business_cache = BusinessSnapshotCache(
+    BUSINESS_JSON_PATH,
+    profile_factory=BusinessProfile,
+    compile_locale=compile_business_locale,
+    compile_prefix=build_prompt_prefix,
+    patch_locale=patch_business_locale,
+    check_interval=BUSINESS_RELOAD_INTERVAL
+)
+
+# Negocios enviados inline por los frontends, compilados una vez por versión
+tenant_registry = TenantRegistry(
+    profile_factory=BusinessProfile,
+    compile_locale=compile_business_locale,
+    compile_prefix=build_prompt_prefix,
+    max_tenants=TENANT_CACHE_SIZE
+)
+
+# Llamadas idénticas en curso comparten un solo request a Groq
+groq_flights = SingleFlight()
+
+# Cache opcional de respuestas para preguntas repetidas
+reply_cache = ReplyCache(
+    max_entries=REPLY_CACHE_SIZE,
+    ttl=REPLY_CACHE_TTL,
+    path=REPLY_CACHE_PATH or None
+) if REPLY_CACHE_ENABLED else None
+
+# Presupuesto de tokens/minuto y USD/día por tenant, compartido entre workers
+admission = AdmissionController(
+    ADMISSION_DB_PATH,
+    tokens_per_minute=ADMISSION_TOKENS_PER_MINUTE,
+    usd_per_day=ADMISSION_USD_PER_DAY,
+    pricing=debug_tracker._get_model_pricing
+) if ADMISSION_ENABLED else None
+
+# Grabación/reproducción de llamadas a Groq (None en modo live)
+if GROQ_MODE not in GROQ_MODES:
+    raise ValueError(f"GROQ_MODE inválido: {GROQ_MODE} (opciones: {', '.join(GROQ_MODES)})")
+cassettes = CassetteStore(
+    GROQ_CASSETTE_PATH,
+    latency_scale=GROQ_REPLAY_LATENCY_SCALE
+) if GROQ_MODE != 'live' else None
+
+# Estimador local de tokens, calibrado con el uso real que reporta Groq
+token_estimator = TokenEstimator(
+    scales=debug_tracker.load_token_scales(),
+    persist=debug_tracker.save_token_scales
+)
+
+# Historial de conversación por sesión, compartido entre workers
+session_store = SessionStore(
+    SESSION_DB_PATH,
+    max_sessions=SESSION_MAX,
+    ttl=SESSION_TTL,
+    max_messages=SESSION_MAX_MESSAGES,
+    max_message_chars=SESSION_MAX_MESSAGE_CHARS,
+    summary_chars=SESSION_SUMMARY_CHARS
+)
+
+# Ruteo opcional por intención: respuesta fija, modelo chico o GROQ_MODEL
+router = IntentRouter(
+    large_model=GROQ_MODEL,
+    small_model=ROUTER_SMALL_MODEL,
+    template_min_confidence=ROUTER_TEMPLATE_MIN_CONFIDENCE,
+    template_max_words=ROUTER_TEMPLATE_MAX_WORDS,
+    small_max_words=ROUTER_SMALL_MAX_WORDS,
+    small_max_products=ROUTER_SMALL_MAX_PRODUCTS,
+    small_max_history=ROUTER_SMALL_MAX_HISTORY
+) if ROUTER_ENABLED else None
+
+def preload_state() -> CompiledBusiness:
+    """Compila business.json (índice, prefijo y prompts por locale) antes de forkear los workers
+
+    Con gunicorn --preload lo corre el proceso master: los workers heredan el snapshot copy-on-write
+    en lugar de compilarlo cada uno en su primer request.
+    """
+    snapshot = business_cache.get()
+    snapshot.index
+    snapshot.prompt_prefix
+    business_response(snapshot)
+    for locale in dict.fromkeys([snapshot.profile.defaultLocale, *locale_detector.locales]):
+        snapshot.for_locale(locale)
+    return snapshot
+
+def build_business_response(compiled: CompiledBusiness) -> PrecompressedBody:
+    """Serializa los datos públicos del negocio una vez por versión (identity, gzip y br)"""
+    business = compiled.profile
+    body = json.dumps({
+        "id": business.id,
+        "name": business.name,
+        "defaultLocale": business.defaultLocale,
+        "currency": business.currency,
+        "tone": business.tone,
+        "policies": business.policies,
+        "payments": business.payments,
+        "catalog": business.catalog,
+        "version": compiled.version
+    }, ensure_ascii=False, separators=(',', ':'))
+    return PrecompressedBody(body.encode('utf-8'), 'application/json')
+
+def business_response(compiled: CompiledBusiness) -> PrecompressedBody:
+    """Respuesta de /business precalculada para la versión del negocio"""
+    return compiled.derived('business_response', build_business_response)
+
+def business_cache_control(compiled: CompiledBusiness, requested_version: Optional[str]) -> str:
+    """Cache-Control de /business: largo e inmutable solo si la URL trae la versión vigente (?v=)
+
+    Una versión vieja o desconocida recibe el contenido actual con el cache corto, para que
+    una CDN no lo guarde para siempre bajo una URL que no le corresponde.
+    """
+    if requested_version == compiled.version:
+        return f"public, max-age={BUSINESS_VERSIONED_MAX_AGE}, immutable"
+    return f"public, max-age={BUSINESS_MAX_AGE}, must-revalidate"
+
+def catalog_admin_authorized(authorization: Optional[str]) -> bool:
+    """PATCH /business/catalog exige Authorization: Bearer CATALOG_ADMIN_TOKEN"""
+    if not CATALOG_ADMIN_TOKEN:
+        return False
+    scheme, _, token = (authorization or '').partition(' ')
+    return scheme.lower() == 'bearer' and hmac.compare_digest(token.strip(), CATALOG_ADMIN_TOKEN)
+
+def patch_business_catalog(delta: Dict[str, Any], base_version: Optional[str] = None) -> Dict[str, Any]:
+    """Aplica un delta del catálogo a business.json y publica el snapshot nuevo
+
+    Solo se recalculan las ofertas, fragmentos de prompt y entradas del índice de los SKUs tocados
+    (todas las ofertas si cambian los descuentos). Con base_version el cambio se rechaza (409)
+    si business.json cambió desde esa versión.
+    """
+    started = time.perf_counter()
+    summary: Dict[str, Any] = {}
+    
+    def transform(data: Dict[str, Any]):
+        new_data, upserts, deletes, info = apply_catalog_delta(data, delta)
+        summary.update(info)
+        return new_data, upserts, deletes
+    
+    previous, snapshot = business_cache.patch(transform, base_version)
+    return {
+        "version": snapshot.version,
+        "previous_version": previous.version,
+        "changed": snapshot is not previous,
+        **summary,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+def after_fork():
+    """Reinicia en cada worker el estado del master que no sobrevive a un fork"""
+    debug_tracker.after_fork()
+    if reply_cache is not None:
+        reply_cache.after_fork()
+
+def detect_locale(message: str, fallback: str = 'es-AR', accept_language: str = None) -> str:
+    """Detecta el idioma del mensaje (es-AR, en-US o pt-BR); el Accept-Language del cliente desempata"""
+    return locale_detector.detect(message, fallback, accept_language)
+
+GROQ_UNAVAILABLE_MESSAGE = "Lo siento, no tengo acceso a la API de Groq en este momento. Por favor, configura tu GROQ_API_KEY."
+GROQ_REPLAY_MISS_MESSAGE = "Error en la API de Groq: no hay una respuesta grabada para este request (GROQ_MODE=replay)"
+
+def chat_messages(system_prompt: str, user_message: str,
+                  history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+    """Mensajes del prompt: sistema, historial compactado y el mensaje del cliente"""
+    return [
+        {"role": "system", "content": system_prompt},
+        *(history or []),
+        {"role": "user", "content": user_message}
+    ]
+
+def build_groq_payload(system_prompt: str, user_message: str, stream: bool = False,
+                       history: List[Dict[str, str]] = None, model: str = GROQ_MODEL) -> Dict[str, Any]:
+    """Arma el payload de chat completions para Groq (con el historial compactado si hay)"""
+    payload = {
+        "model": model,
+        "messages": chat_messages(system_prompt, user_message, history),
+        "temperature": 0.6,
+        "max_tokens": GROQ_MAX_TOKENS
+    }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+def groq_headers() -> Dict[str, str]:
+    """Headers de autenticación para Groq"""
+    return {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+def track_groq_usage(usage: Dict[str, Any], latency_ms: float = None,
+                     prompt_estimate: Dict[str, Any] = None, model: str = GROQ_MODEL) -> Dict[str, Any]:
+    """Registra el uso reportado por Groq (y la latencia de la llamada) en el tracker y arma la info de debug
+
+    Con la estimación local del prompt se calibra el estimador y se registra su error.
+    Los tokens de prompt que el proveedor sirvió desde su cache se cobran con descuento.
+    """
+    input_tokens = usage.get('prompt_tokens', 0)
+    output_tokens = usage.get('completion_tokens', 0)
+    cached_input_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens') or 0
+    prefix_hash = prompt_estimate.get("prefix_hash") if prompt_estimate else None
     
-    message_lower = message.lower()
+    estimated = raw_estimated = None
+    if prompt_estimate and input_tokens:
+        estimated = prompt_estimate["tokens"]
+        raw_estimated = prompt_estimate["raw_tokens"]
+        token_estimator.observe(model, raw_estimated, input_tokens)
     
-    # Detectar español
-    if any(char in message_lower for char in 'áéíóúñ¡¿'):
-        return 'es-AR'
+    # Registrar en el tracker de debug
+    debug_tracker.track_request(
+        model=model,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        request_id=f"chat_{int(time.time())}",
+        latency_ms=latency_ms,
+        estimated_input_tokens=estimated,
+        raw_estimated_input_tokens=raw_estimated,
+        cached_input_tokens=cached_input_tokens,
+        prompt_prefix_hash=prefix_hash
+    )
     
-    # Palabras clave en español
-    spanish_keywords = ['hola', 'gracias', 'buenos', 'buenas', 'consulta', 'precio', 'envío']
-    if any(keyword in message_lower for keyword in spanish_keywords):
-        return 'es-AR'
+    cost, cache_savings = debug_tracker.calculate_cost(model, input_tokens, output_tokens, cached_input_tokens)
+    return {
+        "input_tokens": input_tokens,
+        "estimated_input_tokens": estimated,
+        "cached_input_tokens": cached_input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cost_usd": cost,
+        "cache_savings_usd": cache_savings,
+        "prefix_hash": prefix_hash,
+        "model": model
+    }
+
+def replay_groq(payload: Dict[str, Any], prompt_estimate: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+    """En modo replay busca la respuesta grabada del payload: {reply, delay, debug_info}
+
+    Retorna None si hay que ir a Groq (modo live/record, o replay sin grabación con
+    GROQ_REPLAY_MISS=record). Sin grabación y con GROQ_REPLAY_MISS=error, el reply es un error.
+    El que llama espera delay segundos (latencia grabada escalada) antes de responder.
+    """
+    if GROQ_MODE != 'replay':
+        return None
     
-    # Palabras clave en inglés
-    english_keywords = ['hello', 'hi', 'thanks', 'price', 'shipping', 'delivery']
-    if any(keyword in message_lower for keyword in english_keywords):
-        return 'en-US'
+    recorded = cassettes.get(payload)
+    if recorded is None:
+        if GROQ_REPLAY_MISS == 'record':
+            return None
+        metrics.groq_errors.inc(("replay_miss",))
+        return {"reply": GROQ_REPLAY_MISS_MESSAGE, "delay": 0.0, "debug_info": {}, "error": True}
     
-    return fallback
+    # Se registra la latencia simulada, que es la que vio el cliente
+    debug_info = track_groq_usage(recorded["usage"], recorded["delay"] * 1000, prompt_estimate, payload["model"])
+    debug_info["replayed"] = True
+    return {"reply": recorded["reply"], "delay": recorded["delay"], "debug_info": debug_info, "error": False}
 
-def call_groq(system_prompt: str, user_message: str) -> tuple[str, dict]:
-    """Llama a la API de Groq y retorna respuesta + info de debug"""
+def record_groq(payload: Dict[str, Any], reply: str, usage: Dict[str, Any], latency_ms: float):
+    """Graba la respuesta de Groq en modo record (o en replay con GROQ_REPLAY_MISS=record)"""
+    if cassettes is None:
+        return
+    try:
+        cassettes.put(payload, reply, usage, latency_ms)
+    except Exception as e:
+        print(f"⚠️ No se pudo grabar la respuesta de Groq: {e}")
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After de una respuesta 429 de Groq en segundos (None si no viene o no es numérico)"""
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+def call_groq(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None,
+              prompt_estimate: Dict[str, Any] = None, raise_on_rate_limit: bool = False,
+              model: str = GROQ_MODEL) -> tuple[str, dict]:
+    """Llama a la API de Groq y retorna respuesta + info de debug
+
+    Con raise_on_rate_limit un 429 se levanta como RateLimited (para que el lote reintente)
+    en lugar de devolverse como mensaje de error.
+    """
+    payload = build_groq_payload(system_prompt, user_message, history=history, model=model)
+    replayed = replay_groq(payload, prompt_estimate)
+    if replayed is not None:
+        time.sleep(replayed["delay"])
+        return replayed["reply"], replayed["debug_info"]
+    
     if not GROQ_API_KEY:
-        return "Lo siento, no tengo acceso a la API de Groq en este momento. Por favor, configura tu GROQ_API_KEY.", {}
+        return GROQ_UNAVAILABLE_MESSAGE, {}
     
     try:
-        payload = {
-            "model": GROQ_MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            "temperature": 0.6,
-            "max_tokens": 700
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
+        started = time.perf_counter()
         response = requests.post(
-            "https://api.groq.com/openai/v1/chat/completions",
+            GROQ_API_URL,
             json=payload,
-            headers=headers,
+            headers=groq_headers(),
             timeout=30
         )
         
         if response.status_code == 200:
             data = response.json()
+            reply = data['choices'][0]['message']['content']
             
             # Tracking de tokens y costos
-            usage = data.get('usage', {})
-            input_tokens = usage.get('prompt_tokens', 0)
-            output_tokens = usage.get('completion_tokens', 0)
-            
-            # Registrar en el tracker de debug
-            debug_tracker.track_request(
-                model=GROQ_MODEL,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                request_id=f"chat_{int(time.time())}"
-            )
+            latency_ms = (time.perf_counter() - started) * 1000
+            debug_info = track_groq_usage(data.get('usage', {}), latency_ms, prompt_estimate, model)
+            record_groq(payload, reply, data.get('usage', {}), latency_ms)
             
-            # Preparar info de debug
-            debug_info = {
-                "input_tokens": input_tokens,
-                "output_tokens": output_tokens,
-                "total_tokens": input_tokens + output_tokens,
-                "cost_usd": debug_tracker._get_model_pricing(GROQ_MODEL)["input"] * (input_tokens / 1_000_000) + 
-                           debug_tracker._get_model_pricing(GROQ_MODEL)["output"] * (output_tokens / 1_000_000),
-                "model": GROQ_MODEL
-            }
-            
-            return data['choices'][0]['message']['content'], debug_info
+            return reply, debug_info
         else:
+            metrics.groq_errors.inc((f"http_{response.status_code}",))
+            if response.status_code == 429 and raise_on_rate_limit:
+                raise RateLimited("Error en la API de Groq: 429", retry_after_seconds(response.headers))
             return f"Error en la API de Groq: {response.status_code}", {}
             
+    except RateLimited:
+        raise
     except Exception as e:
+        metrics.groq_errors.inc(("exception",))
         return f"Error comunicándose con Groq: {str(e)}", {}
 
+def parse_groq_stream_line(line: str) -> tuple[list, Optional[Dict[str, Any]], bool]:
+    """Parsea una línea SSE de Groq: retorna (deltas de texto, usage si viene, fin del stream)"""
+    if not line or not line.startswith('data:'):
+        return [], None, False
+    chunk = line[len('data:'):].strip()
+    if chunk == '[DONE]':
+        return [], None, True
+    
+    data = json.loads(chunk)
+    contents = []
+    for choice in data.get('choices', []):
+        content = (choice.get('delta') or {}).get('content')
+        if content:
+            contents.append(content)
+    
+    # Groq manda el uso en x_groq.usage del último chunk (formato OpenAI: usage)
+    usage = (data.get('x_groq') or {}).get('usage') or data.get('usage')
+    return contents, usage, False
+
+def stream_groq(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None,
+                prompt_estimate: Dict[str, Any] = None, model: str = GROQ_MODEL) -> Iterator[tuple[str, Any]]:
+    """Llama a Groq con stream: true y emite ('delta', texto), luego ('usage', debug_info) o ('error', mensaje)"""
+    payload = build_groq_payload(system_prompt, user_message, stream=True, history=history, model=model)
+    replayed = replay_groq(payload, prompt_estimate)
+    if replayed is not None:
+        if replayed["error"]:
+            yield 'error', replayed["reply"]
+            return
+        time.sleep(replayed["delay"])
+        for chunk in split_reply(replayed["reply"]):
+            yield 'delta', chunk
+        yield 'usage', replayed["debug_info"]
+        return
+    
+    if not GROQ_API_KEY:
+        yield 'delta', GROQ_UNAVAILABLE_MESSAGE
+        yield 'usage', {}
+        return
+    
+    try:
+        started = time.perf_counter()
+        response = requests.post(
+            GROQ_API_URL,
+            json=payload,
+            headers=groq_headers(),
+            timeout=30,
+            stream=True
+        )
+    except Exception as e:
+        metrics.groq_errors.inc(("exception",))
+        yield 'error', f"Error comunicándose con Groq: {str(e)}"
+        return
+    
+    # Si el cliente se desconecta, el generador se cierra y liberamos la conexión con Groq
+    try:
+        if response.status_code != 200:
+            metrics.groq_errors.inc((f"http_{response.status_code}",))
+            yield 'error', f"Error en la API de Groq: {response.status_code}"
+            return
+        
+        usage = {}
+        parts = []
+        for line in response.iter_lines(decode_unicode=True):
+            contents, chunk_usage, done = parse_groq_stream_line(line)
+            if done:
+                break
+            for content in contents:
+                parts.append(content)
+                yield 'delta', content
+            usage = chunk_usage or usage
+        
+        # Latencia hasta el último chunk del stream
+        latency_ms = (time.perf_counter() - started) * 1000
+        record_groq(payload, ''.join(parts), usage, latency_ms)
+        yield 'usage', track_groq_usage(usage, latency_ms, prompt_estimate, model) if usage else {}
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        metrics.groq_errors.inc(("exception",))
+        yield 'error', f"Error comunicándose con Groq: {str(e)}"
+    finally:
+        response.close()
+
+def lookup_cached_reply(context: Dict[str, Any]) -> Optional[tuple[str, dict]]:
+    """Busca una respuesta cacheada para el request; la registra como cache hit"""
+    # Con historial la respuesta depende de la conversación, no solo del mensaje
+    if reply_cache is None or context["history"]:
+        return None
+    
+    key = ReplyCache.make_key(context["system_prompt"], context["locale"], context["message"], context["model"])
+    context["reply_cache_key"] = key
+    entry = reply_cache.get(key)
+    if entry is None:
+        return None
+    
+    debug_tracker.track_cache_hit(model=entry['model'], request_id=f"chat_{int(time.time())}")
+    return entry['reply'], {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cost_usd": 0.0,
+        "model": entry['model'],
+        "cache_hit": True
+    }
+
+def store_cached_reply(context: Dict[str, Any], reply: str, debug_info: Dict[str, Any]):
+    """Guarda la respuesta si vino de Groq sin errores"""
+    if reply_cache is None or context["history"] or not debug_info or debug_info.get("cache_hit"):
+        return
+    reply_cache.set(context["reply_cache_key"], reply, debug_info["model"])
+
+def coalesced_result(reply: str, debug_info: Dict[str, Any], shared: bool) -> tuple[str, dict]:
+    """Marca la respuesta como compartida; el costo ya lo registró el líder"""
+    if shared and debug_info:
+        debug_info = {**debug_info, "coalesced": True}
+    return reply, debug_info
+
+def admit_request(context: Dict[str, Any]):
+    """Reserva el presupuesto estimado del tenant antes de mandar el prompt; 429 si no alcanza"""
+    if admission is None:
+        return None
+    
+    key = admission.make_key(context["business"].id, context["client_ip"] if ADMISSION_PER_IP else None)
+    # La entrada se reserva con la estimación local; la salida con el máximo pedido
+    try:
+        return admission.admit(key, context["model"], context["prompt_estimate"]["tokens"], GROQ_MAX_TOKENS)
+    except AdmissionRejected as e:
+        raise ChatRequestError({
+            "error": "Presupuesto de uso excedido, reintentá más tarde",
+            "reason": e.reason,
+            "retry_after": math.ceil(e.retry_after)
+        }, 429, {"Retry-After": retry_after_header(e.retry_after)})
+
+def settle_admission(ticket, debug_info: Dict[str, Any]):
+    """Ajusta la reserva con lo que realmente se consumió de Groq"""
+    if ticket is None:
+        return
+    # Respuestas compartidas, cacheadas o con error no consumieron tokens upstream
+    upstream = bool(debug_info) and not debug_info.get("coalesced") and not debug_info.get("cache_hit")
+    admission.settle(
+        ticket,
+        debug_info.get("total_tokens", 0) if upstream else 0,
+        debug_info.get("cost_usd", 0.0) if upstream else 0.0
+    )
+
+def settle_abandoned_stream(ticket, context: Dict[str, Any], partial_reply: str):
+    """Ajusta la reserva de un stream que el cliente cortó antes de que llegara el usage de Groq
+
+    Groq ya procesó el prompt y generó lo enviado: se cobra con el prompt estimado y los
+    tokens estimados de la respuesta parcial, en lugar de devolver la reserva.
+    """
+    if ticket is None:
+        return
+    model = context["model"]
+    input_tokens = context["prompt_estimate"]["tokens"]
+    output_tokens = token_estimator.count(partial_reply, model)
+    admission.settle(ticket, input_tokens + output_tokens,
+                     admission.estimate_cost(model, input_tokens, output_tokens))
+
+def template_reply(context: Dict[str, Any]) -> tuple[str, dict]:
+    """Respuesta fija elegida por el router, sin llamar a Groq"""
+    route = context["route"]
+    return route["reply"], {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "total_tokens": 0,
+        "cost_usd": 0.0,
+        "model": "template",
+        "template": route["intent"]
+    }
+
+def track_route(context: Dict[str, Any], reply: str, debug_info: Dict[str, Any], latency_ms: float):
+    """Registra el tier del request con su latencia, su costo y lo que ahorró contra GROQ_MODEL
+
+    El ahorro de una respuesta fija se estima con lo que hubiera costado el modelo grande
+    (prompt estimado más la respuesta); las cacheadas y compartidas no suman costo ni ahorro.
+    """
+    route = context["route"]
+    if route is None or not debug_info:
+        return
+    metrics.routes.inc((route["tier"], route["intent"]))
+    
+    cost = savings = 0.0
+    if debug_info.get("cache_hit") or debug_info.get("coalesced"):
+        pass
+    elif route["tier"] == 'template':
+        savings, _ = debug_tracker.calculate_cost(GROQ_MODEL, context["prompt_estimate"]["tokens"],
+                                                  token_estimator.count(reply, GROQ_MODEL))
+    else:
+        cost = debug_info.get("cost_usd", 0.0)
+        if context["model"] != GROQ_MODEL:
+            large_cost, _ = debug_tracker.calculate_cost(GROQ_MODEL, debug_info.get("input_tokens", 0),
+                                                         debug_info.get("output_tokens", 0),
+                                                         debug_info.get("cached_input_tokens", 0))
+            savings = max(large_cost - cost, 0.0)
+    debug_tracker.track_route(route["tier"], route["intent"], latency_ms, cost, savings)
+
+def call_groq_cached(context: Dict[str, Any], raise_on_rate_limit: bool = False) -> tuple[str, dict]:
+    """call_groq con el cache de respuestas, el control de admisión y el coalescing de requests idénticos adelante
+
+    Los mensajes que el router resuelve con una respuesta fija no pasan por nada de eso.
+    """
+    started = time.perf_counter()
+    if context["route"] and context["route"]["tier"] == 'template':
+        reply, debug_info = template_reply(context)
+        track_route(context, reply, debug_info, (time.perf_counter() - started) * 1000)
+        return reply, debug_info
+    
+    cached = lookup_cached_reply(context)
+    if cached:
+        track_route(context, *cached, (time.perf_counter() - started) * 1000)
+        return cached
+    
+    ticket = admit_request(context)
+    
+    def leader_call():
+        # El líder siempre levanta el 429: los que esperan su resultado pueden pedirlo distinto
+        reply, debug_info = call_groq(context["system_prompt"], context["message"], context["history"],
+                                      context["prompt_estimate"], True, context["model"])
+        store_cached_reply(context, reply, debug_info)
+        return reply, debug_info
+    
+    key = flight_key(context["system_prompt"], context["model"], context["message"], context["history"])
+    try:
+        (reply, debug_info), shared = groq_flights.do(key, leader_call)
+    except RateLimited as e:
+        if raise_on_rate_limit:
+            settle_admission(ticket, {})
+            raise
+        (reply, debug_info), shared = (str(e), {}), False
+    except Exception:
+        settle_admission(ticket, {})
+        raise
+    reply, debug_info = coalesced_result(reply, debug_info, shared)
+    settle_admission(ticket, debug_info)
+    track_route(context, reply, debug_info, (time.perf_counter() - started) * 1000)
+    return reply, debug_info
+
 @app.route('/')
 def health_check():
     """Endpoint de salud del servidor"""
@@ -230,76 +877,548 @@ def health_check():
         "groq_configured": bool(GROQ_API_KEY)
     })
 
+class ChatRequestError(Exception):
+    """Error de validación de un request de chat, con su status HTTP y headers extra"""
+    
+    def __init__(self, body: Dict[str, Any], status: int = 400, headers: Dict[str, str] = None):
+        super().__init__(body.get("error"))
+        self.body = body
+        self.status = status
+        self.headers = headers or {}
+
+def resolve_session(data: Dict[str, Any], business):
+    """Sesión del request: una nueva con "session": true, o la de un session_id emitido antes
+
+    Los ids los genera el servidor; uno desconocido o expirado es 404 y el cliente empieza otra sesión.
+    Las sesiones se separan por negocio.
+    """
+    session_id = data.get('session_id')
+    if session_id:
+        if not isinstance(session_id, str) or len(session_id) > 128:
+            raise ChatRequestError({"error": "session_id inválido"}, 400)
+        session = session_store.get(str(business.id), session_id)
+        if session is None:
+            raise ChatRequestError({
+                "error": "Sesión desconocida o expirada, iniciá una nueva con \"session\": true",
+                "session_id": session_id
+            }, 404)
+        return session
+    if data.get('session') is True:
+        return session_store.create(str(business.id))
+    return None
+
+def resolve_history(data: Dict[str, Any], business) -> tuple:
+    """Historial compactado del request: de la sesión del servidor o enviado por el cliente
+
+    Retorna (sesión o None, mensajes para el prompt, info de la compactación o None).
+    """
+    session = resolve_session(data, business)
+    client_history = data.get('history')
+    if session is None and not client_history:
+        return None, [], None
+    
+    if session is not None:
+        messages, summary = session_store.snapshot(session)
+    else:
+        messages = validate_history(client_history, SESSION_MAX_MESSAGE_CHARS)
+        if messages is None:
+            raise ChatRequestError({"error": "history debe ser una lista de {role: user|assistant, content}"}, 400)
+        summary = ''
+        if len(messages) > SESSION_MAX_MESSAGES:
+            summary = summarize('', messages[:-SESSION_MAX_MESSAGES], SESSION_SUMMARY_CHARS)
+            messages = messages[-SESSION_MAX_MESSAGES:]
+    
+    history, info = compact_history(messages, summary, SESSION_HISTORY_TOKENS, SESSION_SUMMARY_CHARS,
+                                    estimate=token_estimator.counter(GROQ_MODEL))
+    if session is not None:
+        info["session_id"] = session.id
+    return session, history, info
+
+def remember_turn(context: Dict[str, Any], reply: str, debug_info: Dict[str, Any]):
+    """Guarda el turno en la sesión si Groq respondió sin errores"""
+    if context["session"] is not None and debug_info:
+        session_store.append_turn(context["session"], context["message"], reply)
+
+def estimate_prompt(system_prompt: str, user_message: str, history: List[Dict[str, str]],
+                    model: str = GROQ_MODEL) -> Dict[str, Any]:
+    """Tokens de prompt estimados localmente (crudos y con la escala calibrada del modelo)"""
+    raw_tokens = token_estimator.raw_messages(chat_messages(system_prompt, user_message, history))
+    return {"raw_tokens": raw_tokens, "tokens": round(raw_tokens * token_estimator.scale(model))}
+
+def fit_context_window(context: Dict[str, Any], compiled_locale: CompiledLocale):
+    """Recorta el prompt si no entra en la ventana de contexto del modelo (dejando lugar a la respuesta)
+
+    Primero se descartan los turnos textuales del historial (queda el resumen), después se achica
+    el catálogo a la mitad de productos hasta el resumen por categoría; si aun así no entra, 413.
+    """
+    model = context["model"]
+    window = token_estimator.context_window(model)
+    limit = window - GROQ_MAX_TOKENS
+    trimmed = []
+    estimate = estimate_prompt(context["system_prompt"], context["message"], context["history"], model)
+    
+    if estimate["tokens"] > limit and context["history"]:
+        context["history"] = [message for message in context["history"] if message["role"] == "system"]
+        trimmed.append("history")
+        estimate = estimate_prompt(context["system_prompt"], context["message"], context["history"], model)
+    
+    top_n = context["catalog_info"]["products_included"]
+    while estimate["tokens"] > limit and not context["catalog_info"]["fallback_summary"]:
+        top_n //= 2
+        context["system_prompt"], context["catalog_info"] = select_catalog(
+            context["compiled"], compiled_locale, context["message"], top_n)
+        if "catalog" not in trimmed:
+            trimmed.append("catalog")
+        estimate = estimate_prompt(context["system_prompt"], context["message"], context["history"], model)
+    
+    if estimate["tokens"] > limit:
+        raise ChatRequestError({
+            "error": "El mensaje excede la ventana de contexto del modelo",
+            "estimated_tokens": estimate["tokens"],
+            "max_prompt_tokens": limit,
+            "context_window": window
+        }, 413)
+    
+    estimate["context_window"] = window
+    estimate["trimmed"] = trimmed
+    # Parte cacheable por el proveedor: el prefijo fijo del negocio
+    estimate["prefix_hash"] = context["compiled"].prefix_hash
+    estimate["prefix_tokens"] = token_estimator.count(context["compiled"].prompt_prefix, model)
+    context["prompt_estimate"] = estimate
+
+def resolve_business(data: Dict[str, Any]) -> CompiledBusiness:
+    """Negocio compilado del request: inline (business), por id y versión, o el business.json local"""
+    business_data = data.get('business')
+    business_id = data.get('business_id')
+    business_version = data.get('business_version')
+    
+    if business_data:
+        compiled = tenant_registry.resolve(business_data)
+    elif business_id:
+        compiled = tenant_registry.get(business_id, business_version)
+        if compiled is None:
+            snapshot = business_cache.get()
+            if snapshot.profile.id == business_id and business_version in (None, snapshot.version):
+                compiled = snapshot
+        if compiled is None:
+            raise ChatRequestError({
+                "error": "Versión de negocio desconocida, reenvía el campo business",
+                "business_id": business_id,
+                "business_version": business_version
+            }, 409)
+    else:
+        compiled = business_cache.get()
+    return compiled
+
+def business_templates(compiled: CompiledBusiness, locale: str) -> Dict[str, str]:
+    """Respuestas fijas del negocio para un locale, armadas una vez por versión e idioma
+
+    Se cachean por idioma (no por el locale que manda el cliente) para que el cache quede acotado.
+    """
+    language = template_language(locale)
+    if language is None:
+        return {}
+    return compiled.derived(f'templates:{language}', lambda snapshot: build_templates(snapshot.data, language))
+
+def route_message(context: Dict[str, Any]):
+    """Decide el tier del mensaje y el modelo a usar (context["route"] y context["model"])
+
+    Las respuestas fijas se estiman igual contra GROQ_MODEL, para calcular lo que ahorraron.
+    """
+    compiled = context["compiled"]
+    history_messages = sum(1 for message in context["history"] if message["role"] != "system")
+    route = router.route(
+        context["message"],
+        lambda text, limit: len(compiled.index.search(text, limit)),
+        history_messages,
+        business_templates(compiled, context["locale"]),
+        compiled.profile.tone.get('signoff', '')
+    )
+    context["route"] = route
+    if route["tier"] != 'template':
+        context["model"] = route["model"]
+
+# Código de idioma con región opcional (es, es-AR, pt-BR, zh-Hant-TW)
+LOCALE_RE = re.compile(r'^[A-Za-z]{2,3}(?:-[A-Za-z0-9]{2,8}){0,3}$')
+
+def validate_locale(locale: Any) -> Optional[str]:
+    """locale enviado por el cliente (None si no viene, y se detecta del mensaje)
+
+    Se valida antes de usarlo como clave de los caches por locale: un valor que no es un código
+    de idioma es un 400, no un 500 ni una entrada nueva en el cache.
+    """
+    if not locale:
+        return None
+    if not isinstance(locale, str) or not LOCALE_RE.match(locale):
+        raise ChatRequestError({"error": "locale debe ser un código de idioma como \"es-AR\""}, 400)
+    return locale
+
+def prepare_chat(data: Dict[str, Any], timer: StageTimer = NULL_TIMER,
+                 client_ip: str = None, accept_language: str = None,
+                 compiled: CompiledBusiness = None) -> Dict[str, Any]:
+    """Resuelve negocio, locale y prompt del sistema para un request de chat (midiendo cada etapa)
+
+    Un lote pasa el negocio ya compilado (compiled) para resolverlo una sola vez.
+    """
+    message = (data.get('message') or '').strip()
+    
+    if not message:
+        raise ChatRequestError({"error": "Mensaje requerido"}, 400)
+    locale = validate_locale(data.get('locale'))
+    
+    # Cargar datos del negocio
+    if compiled is None:
+        compiled = resolve_business(data)
+    business = compiled.profile
+    timer.lap('business')
+    
+    # Detectar idioma si no se especifica
+    if not locale:
+        locale = detect_locale(message, business.defaultLocale, accept_language)
+    timer.lap('locale')
+    
+    # Ofertas precalculadas y prompt con los productos relevantes al mensaje
+    compiled_locale = compiled.for_locale(locale)
+    timer.lap('offers')
+    system_prompt, catalog_info = select_catalog(compiled, compiled_locale, message)
+    timer.lap('prompt')
+    
+    # Historial de la conversación, compactado al presupuesto de tokens
+    session, history, history_info = resolve_history(data, business)
+    timer.lap('history')
+    
+    context = {
+        "message": message,
+        "locale": locale,
+        "compiled": compiled,
+        "business": business,
+        "system_prompt": system_prompt,
+        "catalog_info": catalog_info,
+        "timer": timer,
+        "client_ip": client_ip,
+        "session": session,
+        "history": history,
+        "history_info": history_info,
+        "route": None,
+        "model": GROQ_MODEL
+    }
+    
+    # Tier del mensaje: respuesta fija, modelo chico o GROQ_MODEL
+    if router is not None:
+        route_message(context)
+        timer.lap('route')
+    
+    # Tokens estimados sin red; recorta o rechaza prompts que no entran en el modelo
+    fit_context_window(context, compiled_locale)
+    timer.lap('tokens')
+    return context
+
+def build_chat_response(context: Dict[str, Any], reply: str, debug_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Arma el cuerpo de respuesta del chat con la información de costos"""
+    usage_info = {
+        "tokens": {
+            "input": debug_info.get("input_tokens", 0),
+            "cached_input": debug_info.get("cached_input_tokens", 0),
+            "output": debug_info.get("output_tokens", 0),
+            "total": debug_info.get("total_tokens", 0)
+        },
+        "cost": {
+            "usd": debug_info.get("cost_usd", 0),
+            "formatted": f"${debug_info.get('cost_usd', 0):.6f}",
+            "cache_savings_usd": debug_info.get("cache_savings_usd", 0)
+        },
+        "model": debug_info.get("model", context["model"]),
+        "cache": {"hit": debug_info.get("cache_hit", False)},
+        "coalesced": debug_info.get("coalesced", False),
+        "catalog": context["catalog_info"]
+    }
+    if context["history_info"]:
+        usage_info["history"] = context["history_info"]
+    usage_info["prompt_estimate"] = context["prompt_estimate"]
+    if context["route"]:
+        usage_info["route"] = {key: value for key, value in context["route"].items() if key != "reply"}
+    
+    # Tiempos por etapa hasta la respuesta de Groq (solo en modo debug)
+    if debug_tracker.debug_mode:
+        usage_info["timings_ms"] = context["timer"].as_ms()
+    
+    response = {
+        "reply": reply,
+        "locale": context["locale"],
+        "business": context["business"].id,
+        "business_version": context["compiled"].version,
+        "usage": usage_info
+    }
+    # El cliente reenvía este id en los turnos siguientes
+    if context["session"] is not None:
+        response["session_id"] = context["session"].id
+    return response
+
+def prepare_batch(data: Dict[str, Any], items: Any, max_items: Optional[int] = BATCH_MAX_ITEMS,
+                  max_concurrency: int = BATCH_MAX_CONCURRENCY, max_retries: int = BATCH_MAX_RETRIES,
+                  client_ip: str = None, accept_language: str = None) -> Dict[str, Any]:
+    """Valida un lote y compila su negocio una sola vez (ofertas y prompts por locale quedan cacheados)
+
+    items es una lista (HTTP, hasta max_items) o cualquier iterable (CLI, se consume de a poco).
+    """
+    if isinstance(items, list):
+        if not items:
+            raise ChatRequestError({"error": "messages debe ser una lista no vacía"}, 400)
+        if max_items is not None and len(items) > max_items:
+            raise ChatRequestError({"error": f"El lote admite hasta {max_items} mensajes", "max_items": max_items}, 413)
+    elif max_items is not None or not isinstance(items, Iterator):
+        # Solo el CLI (sin límite) pasa un iterador en lugar de una lista
+        raise ChatRequestError({"error": "messages debe ser una lista no vacía"}, 400)
+    
+    concurrency = data.get('concurrency') or max_concurrency
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise ChatRequestError({"error": "concurrency debe ser un entero positivo"}, 400)
+    
+    locale = validate_locale(data.get('locale'))
+    compiled = resolve_business(data)
+    return {
+        "id": f"batch_{uuid.uuid4().hex[:12]}",
+        "compiled": compiled,
+        "items": items,
+        "locale": locale,
+        "client_ip": client_ip,
+        "accept_language": accept_language,
+        "runner": BatchRunner(concurrency=min(concurrency, max_concurrency), max_retries=max_retries)
+    }
+
+def batch_item_context(batch: Dict[str, Any], item: Any) -> Dict[str, Any]:
+    """Contexto de chat de un ítem del lote: un string o {id, message, locale}"""
+    if isinstance(item, str):
+        item = {"message": item}
+    if not isinstance(item, dict) or not isinstance(item.get('message', ''), str):
+        raise ChatRequestError({"error": "Cada ítem debe ser un string o {id, message, locale}"}, 400)
+    
+    return prepare_chat(
+        {"message": item.get('message'), "locale": item.get('locale') or batch["locale"]},
+        client_ip=batch["client_ip"],
+        accept_language=batch["accept_language"],
+        compiled=batch["compiled"]
+    )
+
+def batch_item_result(item: Any, context: Dict[str, Any], reply: str, debug_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Línea de resultado de un ítem; sin debug_info la llamada a Groq falló (502)"""
+    if not debug_info:
+        return {"id": item_id(item), "status": 502, "error": reply}
+    return {"id": item_id(item), "status": 200, **build_chat_response(context, reply, debug_info)}
+
+def batch_item_error(item: Any, error: ChatRequestError) -> Dict[str, Any]:
+    """Línea de error de un ítem; los 429 del control de admisión se reintentan como los de Groq"""
+    if error.status == 429:
+        raise RateLimited(error.body.get("error"), error.body.get("retry_after"))
+    return {"id": item_id(item), "status": error.status, **error.body}
+
+def run_batch_item(batch: Dict[str, Any], item: Any) -> Dict[str, Any]:
+    """Procesa un ítem del lote (en un thread del BatchRunner)"""
+    try:
+        context = batch_item_context(batch, item)
+        reply, debug_info = call_groq_cached(context, raise_on_rate_limit=True)
+    except ChatRequestError as e:
+        return batch_item_error(item, e)
+    except RateLimited:
+        raise
+    except Exception as e:
+        return {"id": item_id(item), "status": 500, "error": str(e)}
+    return batch_item_result(item, context, reply, debug_info)
+
+def finish_batch(batch: Dict[str, Any], totals: BatchTotals, completed: bool) -> Dict[str, Any]:
+    """Registra los totales del lote en el tracker y arma la última línea de la respuesta"""
+    summary = {"id": batch["id"], "business": batch["compiled"].profile.id, "model": GROQ_MODEL,
+               **totals.as_dict(), "completed": completed}
+    debug_tracker.track_batch(summary)
+    return {"batch": summary}
+
+def run_chat_batch(batch: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Resultados del lote en orden de finalización y, al final, una línea {"batch": totales}
+
+    Si el consumidor corta (cliente desconectado) no se mandan más ítems y el lote se registra incompleto.
+    """
+    totals = BatchTotals()
+    completed = False
+    try:
+        for result in batch["runner"].run(batch["items"], lambda item: run_batch_item(batch, item)):
+            totals.add(result)
+            yield result
+        completed = True
+        yield finish_batch(batch, totals, completed)
+    finally:
+        if not completed:
+            finish_batch(batch, totals, completed)
+
+def sse_event(event: str, data: Any) -> str:
+    """Serializa un evento Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @app.route('/chat', methods=['POST'])
 def chat():
     """Endpoint principal del chat"""
     try:
+        timer = StageTimer()
         data = request.get_json()
-        message = data.get('message', '').strip()
-        locale = data.get('locale')
-        business_data = data.get('business')
-        
-        if not message:
-            return jsonify({"error": "Mensaje requerido"}), 400
-        
-        # Cargar datos del negocio
-        if business_data:
-            business = BusinessProfile(business_data)
-        else:
-            business = load_business_data()
-        
-        # Detectar idioma si no se especifica
-        if not locale:
-            locale = detect_locale(message, business.defaultLocale)
+        timer.lap('parse')
+        context = prepare_chat(data, timer, request.remote_addr, request.headers.get('Accept-Language'))
         
-        # Calcular ofertas
-        offers = compute_offers(business, locale)
+        # Llamar a Groq (o usar una respuesta cacheada)
+        reply, debug_info = call_groq_cached(context)
+        timer.lap('groq')
+        remember_turn(context, reply, debug_info)
         
-        # Construir prompt del sistema
-        system_prompt = build_system_prompt(business, locale, offers)
+        response = jsonify(build_chat_response(context, reply, debug_info))
+        timer.lap('serialize')
+        metrics.record_stages('chat', timer)
+        return response
         
-        # Llamar a Groq
-        reply, debug_info = call_groq(system_prompt, message)
-        
-        # Preparar información de costos para el cliente
-        usage_info = {
-            "tokens": {
-                "input": debug_info.get("input_tokens", 0),
-                "output": debug_info.get("output_tokens", 0),
-                "total": debug_info.get("total_tokens", 0)
-            },
-            "cost": {
-                "usd": debug_info.get("cost_usd", 0),
-                "formatted": f"${debug_info.get('cost_usd', 0):.6f}"
-            },
-            "model": debug_info.get("model", GROQ_MODEL)
-        }
-        
-        return jsonify({
-            "reply": reply,
-            "locale": locale,
-            "business": business.id,
-            "usage": usage_info
-        })
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Endpoint de chat que envía la respuesta de Groq como Server-Sent Events"""
+    try:
+        timer = StageTimer()
+        data = request.get_json()
+        timer.lap('parse')
+        context = prepare_chat(data, timer, request.remote_addr, request.headers.get('Accept-Language'))
+        started = time.perf_counter()
+        if context["route"] and context["route"]["tier"] == 'template':
+            cached = template_reply(context)
+        else:
+            cached = lookup_cached_reply(context)
+        ticket = None if cached else admit_request(context)
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        if cached:
+            reply, debug_info = cached
+            timer.lap('groq')
+            track_route(context, reply, debug_info, (time.perf_counter() - started) * 1000)
+            remember_turn(context, reply, debug_info)
+            yield sse_event('delta', {"content": reply})
+            yield sse_event('done', build_chat_response(context, reply, debug_info))
+            metrics.record_stages('chat_stream', timer)
+            return
         
+        parts = []
+        settled = False
+        upstream = stream_groq(context["system_prompt"], context["message"], context["history"],
+                               context["prompt_estimate"], context["model"])
+        try:
+            for kind, value in upstream:
+                if kind == 'delta':
+                    parts.append(value)
+                    yield sse_event('delta', {"content": value})
+                elif kind == 'usage':
+                    timer.lap('groq')
+                    settled = True
+                    settle_admission(ticket, value)
+                    track_route(context, ''.join(parts), value, (time.perf_counter() - started) * 1000)
+                    remember_turn(context, ''.join(parts), value)
+                    store_cached_reply(context, ''.join(parts), value)
+                    yield sse_event('done', build_chat_response(context, ''.join(parts), value))
+                    metrics.record_stages('chat_stream', timer)
+                else:
+                    settled = True
+                    settle_admission(ticket, {})
+                    yield sse_event('error', {"error": value})
+        finally:
+            # Cierra la conexión con Groq también si el cliente se desconectó,
+            # y en ese caso cobra lo que Groq alcanzó a generar
+            upstream.close()
+            if not settled:
+                settle_abandoned_stream(ticket, context, ''.join(parts))
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Lote de mensajes para un negocio: JSON Lines en orden de finalización y al final los totales"""
+    try:
+        data = request.get_json() or {}
+        batch = prepare_batch(data, data.get('messages'), client_ip=request.remote_addr,
+                              accept_language=request.headers.get('Accept-Language'))
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        for line in run_chat_batch(batch):
+            yield json.dumps(line, ensure_ascii=False) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "X-Batch-Id": batch["id"]
+    })
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def count_response(response):
+    """Cuenta respuestas por endpoint y status y mide la duración del request"""
+    endpoint = request.endpoint or 'unknown'
+    metrics.responses.inc((endpoint, str(response.status_code)))
+    started = g.get('request_started')
+    if started is not None:
+        metrics.request_seconds.observe(time.perf_counter() - started, (endpoint,))
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/business', methods=['GET'])
 def get_business():
-    """Endpoint para obtener los datos del negocio"""
+    """Endpoint para obtener los datos del negocio (precalculados por versión, con ETag y gzip/br)"""
     try:
-        business = load_business_data()
-        return jsonify({
-            "id": business.id,
-            "name": business.name,
-            "defaultLocale": business.defaultLocale,
-            "currency": business.currency,
-            "tone": business.tone,
-            "policies": business.policies,
-            "payments": business.payments,
-            "catalog": business.catalog
-        })
+        compiled = business_cache.get()
+        status, body, headers = business_response(compiled).respond(
+            request.headers.get('If-None-Match'),
+            request.headers.get('Accept-Encoding'),
+            business_cache_control(compiled, request.args.get('v'))
+        )
+        headers["X-Business-Version"] = compiled.version
+        return Response(body, status=status, headers=headers)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/business/catalog', methods=['PATCH'])
+def patch_catalog():
+    """Endpoint para agregar, modificar y borrar SKUs y descuentos sin reescribir business.json"""
+    try:
+        if not CATALOG_ADMIN_TOKEN:
+            return jsonify({"error": "Deshabilitado: configura CATALOG_ADMIN_TOKEN"}), 403
+        if not catalog_admin_authorized(request.headers.get('Authorization')):
+            return jsonify({"error": "No autorizado"}), 401
+        
+        data = request.get_json(silent=True)
+        try:
+            delta = parse_catalog_delta(data)
+            result = patch_business_catalog(delta, data.get('base_version'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "business_version": e.current}), 409
+        
+        response = jsonify(result)
+        response.headers["X-Business-Version"] = result["version"]
+        return response
+        
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -309,14 +1428,16 @@ def get_debug_stats():
     try:
         summary_type = request.args.get('type', 'today')
         
-        if summary_type == 'today':
+        if summary_type == 'hour':
+            data = debug_tracker.get_hourly_summary()
+        elif summary_type == 'today':
             data = debug_tracker.get_daily_summary()
         elif summary_type == 'month':
             data = debug_tracker.get_monthly_summary()
         elif summary_type == 'total':
             data = debug_tracker.get_total_summary()
         else:
-            return jsonify({"error": "Tipo de resumen inválido. Use: today, month, total"}), 400
+            return jsonify({"error": "Tipo de resumen inválido. Use: hour, today, month, total"}), 400
         
         return jsonify(data)
         
@@ -336,11 +1457,63 @@ def print_debug_summary():
 
 @app.route('/debug/usage_log', methods=['GET'])
 def get_usage_log():
-    """Endpoint para obtener el log detallado de uso"""
+    """Endpoint para obtener el log detallado de uso
+    
+    Parámetros: since/until (ISO o epoch), model, cursor y limit (máx. USAGE_LOG_MAX_LIMIT).
+    El cursor para la página siguiente viaja en el header X-Next-Cursor.
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), USAGE_LOG_MAX_LIMIT)
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+            if cursor is not None and cursor < 0:
+                raise ValueError("cursor debe ser mayor o igual a 0")
+            since = parse_timestamp(request.args.get('since'))
+            until = parse_timestamp(request.args.get('until'))
+        except ValueError as e:
+            return jsonify({"error": f"Parámetro inválido: {e}"}), 400
+        
+        entries, next_cursor = debug_tracker.query_usage_log(
+            since=since,
+            until=until,
+            model=request.args.get('model') or None,
+            cursor=cursor,
+            limit=limit
+        )
+        response = jsonify(entries)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/batches', methods=['GET'])
+def get_debug_batches():
+    """Endpoint con los totales de los últimos lotes de /chat/batch y batch_runner.py"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), USAGE_LOG_MAX_LIMIT)
+        return jsonify(debug_tracker.get_batches(limit))
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/debug/cache', methods=['GET'])
+def get_cache_stats():
+    """Endpoint para obtener contadores de los caches en memoria"""
     try:
-        # Obtener los últimos 100 registros
-        recent_logs = debug_tracker.usage_log[-100:] if debug_tracker.usage_log else []
-        return jsonify(recent_logs)
+        return jsonify({
+            "business_snapshot": business_cache.stats(),
+            "tenants": tenant_registry.stats(),
+            "replies": reply_cache.stats() if reply_cache else {"enabled": False},
+            "singleflight": groq_flights.stats(),
+            "admission": admission.stats() if admission else {"enabled": False},
+            "router": router.stats() if router else {"enabled": False},
+            "sessions": session_store.stats(),
+            "token_estimator": token_estimator.stats(),
+            "cassettes": {"mode": GROQ_MODE, **cassettes.stats()} if cassettes else {"mode": GROQ_MODE}
+        })
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -348,7 +1521,11 @@ def get_usage_log():
 if __name__ == '__main__':
     print("🚀 Iniciando Chat SaaS PoC Backend...")
     print(f"📊 Modelo Groq: {GROQ_MODEL}")
+    if router:
+        print(f"🧭 Router: respuestas fijas, {router.small_model or 'sin modelo chico'} y {GROQ_MODEL}")
     print(f"🔑 Groq API Key: {'✅ Configurada' if GROQ_API_KEY else '❌ No configurada'}")
+    if cassettes:
+        print(f"📼 Groq en modo {GROQ_MODE}: {GROQ_CASSETTE_PATH}")
     print(f"📁 Datos del negocio: {BUSINESS_JSON_PATH}")
     print("🌐 Servidor iniciando en http://localhost:5002")
     
@@ -356,9 +1533,17 @@ if __name__ == '__main__':
     if debug_tracker.debug_mode:
         print("🔍 DEBUG MODE: Activado - Tracking de tokens y costos habilitado")
         print("📊 Endpoints de debug disponibles:")
-        print("   • GET /debug/stats?type=today|month|total")
-        print("   • GET /debug/summary?type=today|month|total")
+        print("   • GET /debug/stats?type=hour|today|month|total")
+        print("   • GET /debug/summary?type=hour|today|month|total")
+        print("   • GET /debug/usage_log?since=&until=&model=&cursor=&limit=")
+        print("   • GET /debug/cache")
+        print("   • GET /debug/batches?limit=")
     else:
         print("🔍 DEBUG MODE: Desactivado - Para activar, set GROQ_DEBUG=true")
+    print("💬 Streaming: POST /chat/stream (Server-Sent Events)")
+    print("📦 Lotes: POST /chat/batch (JSON Lines)")
+    print("📈 Métricas: GET /metrics (formato Prometheus)")
+    
+    print("🏭 Producción: gunicorn -c gunicorn.conf.py app:app")
     
     app.run(host='0.0.0.0', port=5002, debug=True)
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Chat SaaS PoC Backend (asyncio)
+Variante ASGI del servidor: las llamadas a Groq esperan en el event loop
+en lugar de ocupar un thread cada una.
+
+Ejecutar con: hypercorn app_async:app --bind 0.0.0.0:5002
+"""
+
+import os
+import json
+import asyncio
+import time
+import httpx
+from quart import Quart, Response, g, request, jsonify
+from quart_cors import cors
+from typing import Any, AsyncIterator, Dict, List
+
+from debug_tracker import debug_tracker
+from singleflight import AsyncSingleFlight, flight_key
+from usage_log import parse_timestamp
+from metrics import metrics, StageTimer
+from app import (
+    GROQ_API_KEY,
+    GROQ_MODEL,
+    GROQ_API_URL,
+    GROQ_MODE,
+    USAGE_LOG_MAX_LIMIT,
+    CATALOG_ADMIN_TOKEN,
+    GROQ_UNAVAILABLE_MESSAGE,
+    ChatRequestError,
+    RateLimited,
+    BatchTotals,
+    business_cache,
+    tenant_registry,
+    reply_cache,
+    admission,
+    router,
+    admit_request,
+    settle_admission,
+    settle_abandoned_stream,
+    remember_turn,
+    session_store,
+    token_estimator,
+    cassettes,
+    lookup_cached_reply,
+    store_cached_reply,
+    coalesced_result,
+    template_reply,
+    track_route,
+    prepare_chat,
+    build_chat_response,
+    build_groq_payload,
+    groq_headers,
+    parse_groq_stream_line,
+    track_groq_usage,
+    replay_groq,
+    record_groq,
+    retry_after_seconds,
+    item_id,
+    prepare_batch,
+    batch_item_context,
+    batch_item_result,
+    batch_item_error,
+    finish_batch,
+    business_response,
+    business_cache_control,
+    catalog_admin_authorized,
+    patch_business_catalog,
+    sse_event
+)
+from business_cache import VersionConflict
+from catalog_delta import parse_catalog_delta
+from cassette import split_reply
+
+app = cors(Quart(__name__))
+
+# Máximo de llamadas simultáneas a Groq desde este proceso
+GROQ_MAX_CONCURRENCY = int(os.getenv('GROQ_MAX_CONCURRENCY', '256'))
+
+# Llamadas idénticas en curso comparten un solo request a Groq
+groq_flights = AsyncSingleFlight()
+
+_groq_client: httpx.AsyncClient = None
+_groq_semaphore: asyncio.Semaphore = None
+
+
+@app.before_serving
+async def startup():
+    """Crea el cliente HTTP compartido y el límite de concurrencia"""
+    global _groq_client, _groq_semaphore
+    _groq_semaphore = asyncio.Semaphore(GROQ_MAX_CONCURRENCY)
+    _groq_client = httpx.AsyncClient(
+        timeout=30,
+        limits=httpx.Limits(max_connections=GROQ_MAX_CONCURRENCY,
+                            max_keepalive_connections=GROQ_MAX_CONCURRENCY)
+    )
+
+
+@app.after_serving
+async def shutdown():
+    """Cierra las conexiones con Groq"""
+    if _groq_client is not None:
+        await _groq_client.aclose()
+
+
+async def call_groq_async(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None,
+                          prompt_estimate: Dict[str, Any] = None, raise_on_rate_limit: bool = False,
+                          model: str = GROQ_MODEL) -> tuple[str, dict]:
+    """Versión async de call_groq: misma respuesta + info de debug"""
+    payload = build_groq_payload(system_prompt, user_message, history=history, model=model)
+    replayed = await asyncio.to_thread(replay_groq, payload, prompt_estimate) if cassettes else None
+    if replayed is not None:
+        await asyncio.sleep(replayed["delay"])
+        return replayed["reply"], replayed["debug_info"]
+
+    if not GROQ_API_KEY:
+        return GROQ_UNAVAILABLE_MESSAGE, {}
+
+    try:
+        async with _groq_semaphore:
+            started = time.perf_counter()
+            response = await _groq_client.post(
+                GROQ_API_URL,
+                json=payload,
+                headers=groq_headers()
+            )
+
+        if response.status_code == 200:
+            data = response.json()
+            reply = data['choices'][0]['message']['content']
+
+            # El tracker escribe a disco, lo corremos fuera del event loop
+            latency_ms = (time.perf_counter() - started) * 1000
+            debug_info = await asyncio.to_thread(track_groq_usage, data.get('usage', {}), latency_ms,
+                                                prompt_estimate, model)
+            if cassettes:
+                await asyncio.to_thread(record_groq, payload, reply, data.get('usage', {}), latency_ms)
+
+            return reply, debug_info
+        else:
+            metrics.groq_errors.inc((f"http_{response.status_code}",))
+            if response.status_code == 429 and raise_on_rate_limit:
+                raise RateLimited("Error en la API de Groq: 429", retry_after_seconds(response.headers))
+            return f"Error en la API de Groq: {response.status_code}", {}
+
+    except RateLimited:
+        raise
+    except Exception as e:
+        metrics.groq_errors.inc(("exception",))
+        return f"Error comunicándose con Groq: {str(e)}", {}
+
+
+async def stream_groq_async(system_prompt: str, user_message: str, history: List[Dict[str, str]] = None,
+                            prompt_estimate: Dict[str, Any] = None,
+                            model: str = GROQ_MODEL) -> AsyncIterator[tuple[str, Any]]:
+    """Versión async de stream_groq"""
+    payload = build_groq_payload(system_prompt, user_message, stream=True, history=history, model=model)
+    replayed = await asyncio.to_thread(replay_groq, payload, prompt_estimate) if cassettes else None
+    if replayed is not None:
+        if replayed["error"]:
+            yield 'error', replayed["reply"]
+            return
+        await asyncio.sleep(replayed["delay"])
+        for chunk in split_reply(replayed["reply"]):
+            yield 'delta', chunk
+        yield 'usage', replayed["debug_info"]
+        return
+
+    if not GROQ_API_KEY:
+        yield 'delta', GROQ_UNAVAILABLE_MESSAGE
+        yield 'usage', {}
+        return
+
+    try:
+        async with _groq_semaphore:
+            # Al cancelarse la tarea (cliente desconectado) el context manager cierra la conexión
+            started = time.perf_counter()
+            async with _groq_client.stream(
+                'POST',
+                GROQ_API_URL,
+                json=payload,
+                headers=groq_headers()
+            ) as response:
+                if response.status_code != 200:
+                    metrics.groq_errors.inc((f"http_{response.status_code}",))
+                    yield 'error', f"Error en la API de Groq: {response.status_code}"
+                    return
+
+                usage = {}
+                parts = []
+                async for line in response.aiter_lines():
+                    contents, chunk_usage, done = parse_groq_stream_line(line)
+                    if done:
+                        break
+                    for content in contents:
+                        parts.append(content)
+                        yield 'delta', content
+                    usage = chunk_usage or usage
+                latency_ms = (time.perf_counter() - started) * 1000
+
+        if cassettes:
+            await asyncio.to_thread(record_groq, payload, ''.join(parts), usage, latency_ms)
+
+        debug_info = await asyncio.to_thread(track_groq_usage, usage, latency_ms,
+                                               prompt_estimate, model) if usage else {}
+        yield 'usage', debug_info
+    except Exception as e:
+        metrics.groq_errors.inc(("exception",))
+        yield 'error', f"Error comunicándose con Groq: {str(e)}"
+
+
+async def track_route_async(context: dict, reply: str, debug_info: dict, started: float):
+    """track_route fuera del event loop (el tracker escribe en SQLite)"""
+    if context["route"] is not None:
+        await asyncio.to_thread(track_route, context, reply, debug_info, (time.perf_counter() - started) * 1000)
+
+
+async def call_groq_cached_async(context: dict, raise_on_rate_limit: bool = False) -> tuple[str, dict]:
+    """call_groq_async con el cache de respuestas y el coalescing de requests idénticos adelante"""
+    started = time.perf_counter()
+    if context["route"] and context["route"]["tier"] == 'template':
+        reply, debug_info = template_reply(context)
+        await track_route_async(context, reply, debug_info, started)
+        return reply, debug_info
+
+    if reply_cache is not None:
+        # El nivel en disco del cache y el tracker hacen I/O
+        cached = await asyncio.to_thread(lookup_cached_reply, context)
+        if cached:
+            await track_route_async(context, *cached, started)
+            return cached
+
+    ticket = await asyncio.to_thread(admit_request, context) if admission else None
+
+    async def leader_call():
+        # El líder siempre levanta el 429: los que esperan su resultado pueden pedirlo distinto
+        reply, debug_info = await call_groq_async(context["system_prompt"], context["message"], context["history"],
+                                                  context["prompt_estimate"], True, context["model"])
+        if reply_cache is not None:
+            await asyncio.to_thread(store_cached_reply, context, reply, debug_info)
+        return reply, debug_info
+
+    key = flight_key(context["system_prompt"], context["model"], context["message"], context["history"])
+    try:
+        (reply, debug_info), shared = await groq_flights.do(key, leader_call)
+    except RateLimited as e:
+        if raise_on_rate_limit:
+            if ticket is not None:
+                await asyncio.to_thread(settle_admission, ticket, {})
+            raise
+        (reply, debug_info), shared = (str(e), {}), False
+    except Exception:
+        if ticket is not None:
+            await asyncio.to_thread(settle_admission, ticket, {})
+        raise
+    reply, debug_info = coalesced_result(reply, debug_info, shared)
+    if ticket is not None:
+        await asyncio.to_thread(settle_admission, ticket, debug_info)
+    await track_route_async(context, reply, debug_info, started)
+    return reply, debug_info
+
+
+@app.route('/')
+async def health_check():
+    """Endpoint de salud del servidor"""
+    return jsonify({
+        "status": "ok",
+        "message": "Chat SaaS PoC Backend (async) funcionando",
+        "groq_configured": bool(GROQ_API_KEY),
+        "groq_max_concurrency": GROQ_MAX_CONCURRENCY
+    })
+
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    """Endpoint principal del chat"""
+    try:
+        timer = StageTimer()
+        data = await request.get_json()
+        timer.lap('parse')
+
+        # La compilación del negocio puede leer disco, no debe frenar el event loop
+        context = await asyncio.to_thread(prepare_chat, data, timer, request.remote_addr,
+                                          request.headers.get('Accept-Language'))
+
+        reply, debug_info = await call_groq_cached_async(context)
+        timer.lap('groq')
+        # La sesión se guarda en SQLite: fuera del event loop
+        if context["session"] is not None:
+            await asyncio.to_thread(remember_turn, context, reply, debug_info)
+
+        response = jsonify(build_chat_response(context, reply, debug_info))
+        timer.lap('serialize')
+        metrics.record_stages('chat', timer)
+        return response
+
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """Endpoint de chat que envía la respuesta de Groq como Server-Sent Events"""
+    try:
+        timer = StageTimer()
+        data = await request.get_json()
+        timer.lap('parse')
+        context = await asyncio.to_thread(prepare_chat, data, timer, request.remote_addr,
+                                          request.headers.get('Accept-Language'))
+        started = time.perf_counter()
+        if context["route"] and context["route"]["tier"] == 'template':
+            cached = template_reply(context)
+        else:
+            cached = await asyncio.to_thread(lookup_cached_reply, context) if reply_cache else None
+        ticket = await asyncio.to_thread(admit_request, context) if admission and not cached else None
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    async def generate():
+        if cached:
+            reply, debug_info = cached
+            timer.lap('groq')
+            await track_route_async(context, reply, debug_info, started)
+            if context["session"] is not None:
+                await asyncio.to_thread(remember_turn, context, reply, debug_info)
+            yield sse_event('delta', {"content": reply})
+            yield sse_event('done', build_chat_response(context, reply, debug_info))
+            metrics.record_stages('chat_stream', timer)
+            return
+
+        parts = []
+        settled = False
+        upstream = stream_groq_async(context["system_prompt"], context["message"], context["history"],
+                                     context["prompt_estimate"], context["model"])
+        try:
+            async for kind, value in upstream:
+                if kind == 'delta':
+                    parts.append(value)
+                    yield sse_event('delta', {"content": value})
+                elif kind == 'usage':
+                    timer.lap('groq')
+                    settled = True
+                    if ticket is not None:
+                        await asyncio.to_thread(settle_admission, ticket, value)
+                    await track_route_async(context, ''.join(parts), value, started)
+                    if context["session"] is not None:
+                        await asyncio.to_thread(remember_turn, context, ''.join(parts), value)
+                    if reply_cache is not None:
+                        await asyncio.to_thread(store_cached_reply, context, ''.join(parts), value)
+                    yield sse_event('done', build_chat_response(context, ''.join(parts), value))
+                    metrics.record_stages('chat_stream', timer)
+                else:
+                    settled = True
+                    if ticket is not None:
+                        await asyncio.to_thread(settle_admission, ticket, {})
+                    yield sse_event('error', {"error": value})
+        finally:
+            # Si el cliente se desconectó: cierra ya el stream con Groq (y libera su lugar en el
+            # semáforo) en vez de esperar al GC, y cobra lo que Groq alcanzó a generar
+            await upstream.aclose()
+            if ticket is not None and not settled:
+                await asyncio.to_thread(settle_abandoned_stream, ticket, context, ''.join(parts))
+
+    return generate(), 200, {
+        "Content-Type": "text/event-stream; charset=utf-8",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    }
+
+
+async def run_batch_item_async(batch: dict, item: Any) -> dict:
+    """Versión async de run_batch_item"""
+    try:
+        # prepare_chat puede compilar el negocio (disco), igual que en /chat
+        context = await asyncio.to_thread(batch_item_context, batch, item)
+        reply, debug_info = await call_groq_cached_async(context, raise_on_rate_limit=True)
+    except ChatRequestError as e:
+        return batch_item_error(item, e)
+    except RateLimited:
+        raise
+    except Exception as e:
+        return {"id": item_id(item), "status": 500, "error": str(e)}
+    return batch_item_result(item, context, reply, debug_info)
+
+
+@app.route('/chat/batch', methods=['POST'])
+async def chat_batch():
+    """Lote de mensajes para un negocio: JSON Lines en orden de finalización y al final los totales"""
+    try:
+        data = await request.get_json() or {}
+        batch = await asyncio.to_thread(prepare_batch, data, data.get('messages'), client_ip=request.remote_addr,
+                                        accept_language=request.headers.get('Accept-Language'))
+    except ChatRequestError as e:
+        return jsonify(e.body), e.status, e.headers
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+    async def generate():
+        totals = BatchTotals()
+        completed = False
+        try:
+            async for result in batch["runner"].run_async(batch["items"],
+                                                          lambda item: run_batch_item_async(batch, item)):
+                totals.add(result)
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+            completed = True
+            summary = await asyncio.to_thread(finish_batch, batch, totals, completed)
+            yield json.dumps(summary, ensure_ascii=False) + '\n'
+        finally:
+            # Cliente desconectado: el lote queda registrado como incompleto. Acá la tarea puede
+            # estar cancelada, así que el registro (que escribe a disco) se manda a un thread sin esperarlo
+            if not completed:
+                asyncio.get_running_loop().run_in_executor(None, finish_batch, batch, totals, completed)
+
+    return generate(), 200, {
+        "Content-Type": "application/x-ndjson",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "X-Batch-Id": batch["id"]
+    }
+
+
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def count_response(response):
+    """Cuenta respuestas por endpoint y status y mide la duración del request"""
+    endpoint = request.endpoint or 'unknown'
+    metrics.responses.inc((endpoint, str(response.status_code)))
+    started = g.get('request_started')
+    if started is not None:
+        metrics.request_seconds.observe(time.perf_counter() - started, (endpoint,))
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Métricas del proceso en formato de texto de Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/business', methods=['GET'])
+async def get_business():
+    """Endpoint para obtener los datos del negocio (precalculados por versión, con ETag y gzip/br)"""
+    try:
+        compiled = await asyncio.to_thread(business_cache.get)
+        # Solo la primera vez por versión se serializa y comprime
+        response = await asyncio.to_thread(business_response, compiled)
+        status, body, headers = response.respond(
+            request.headers.get('If-None-Match'),
+            request.headers.get('Accept-Encoding'),
+            business_cache_control(compiled, request.args.get('v'))
+        )
+        headers["X-Business-Version"] = compiled.version
+        return Response(body, status=status, headers=headers)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/business/catalog', methods=['PATCH'])
+async def patch_catalog():
+    """Endpoint para agregar, modificar y borrar SKUs y descuentos sin reescribir business.json"""
+    try:
+        if not CATALOG_ADMIN_TOKEN:
+            return jsonify({"error": "Deshabilitado: configura CATALOG_ADMIN_TOKEN"}), 403
+        if not catalog_admin_authorized(request.headers.get('Authorization')):
+            return jsonify({"error": "No autorizado"}), 401
+
+        data = await request.get_json(silent=True)
+        try:
+            delta = parse_catalog_delta(data)
+            # Escribe y fsync-ea business.json: fuera del event loop
+            result = await asyncio.to_thread(patch_business_catalog, delta, data.get('base_version'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except VersionConflict as e:
+            return jsonify({"error": str(e), "business_version": e.current}), 409
+
+        response = jsonify(result)
+        response.headers["X-Business-Version"] = result["version"]
+        return response
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/debug/stats', methods=['GET'])
+async def get_debug_stats():
+    """Endpoint para obtener estadísticas de debug"""
+    try:
+        summary_type = request.args.get('type', 'today')
+        summaries = {
+            'hour': debug_tracker.get_hourly_summary,
+            'today': debug_tracker.get_daily_summary,
+            'month': debug_tracker.get_monthly_summary,
+            'total': debug_tracker.get_total_summary
+        }
+        if summary_type not in summaries:
+            return jsonify({"error": "Tipo de resumen inválido. Use: hour, today, month, total"}), 400
+
+        # Los resúmenes leen SQLite y esperan lo pendiente del writer: fuera del event loop
+        data = await asyncio.to_thread(summaries[summary_type])
+
+        return jsonify(data)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/debug/summary', methods=['GET'])
+async def print_debug_summary():
+    """Endpoint para imprimir resumen de debug en consola"""
+    try:
+        summary_type = request.args.get('type', 'today')
+        await asyncio.to_thread(debug_tracker.print_summary, summary_type)
+        return jsonify({"message": f"Resumen de {summary_type} impreso en consola"})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/debug/usage_log', methods=['GET'])
+async def get_usage_log():
+    """Endpoint para obtener el log detallado de uso
+
+    Mismos parámetros que en app.py; el cursor de la página siguiente viaja en X-Next-Cursor.
+    """
+    try:
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), USAGE_LOG_MAX_LIMIT)
+            cursor = request.args.get('cursor')
+            cursor = int(cursor) if cursor else None
+            if cursor is not None and cursor < 0:
+                raise ValueError("cursor debe ser mayor o igual a 0")
+            since = parse_timestamp(request.args.get('since'))
+            until = parse_timestamp(request.args.get('until'))
+        except ValueError as e:
+            return jsonify({"error": f"Parámetro inválido: {e}"}), 400
+
+        # Leer y filtrar el log toca disco: fuera del event loop
+        entries, next_cursor = await asyncio.to_thread(
+            debug_tracker.query_usage_log,
+            since=since,
+            until=until,
+            model=request.args.get('model') or None,
+            cursor=cursor,
+            limit=limit
+        )
+        response = jsonify(entries)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = str(next_cursor)
+        return response
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/debug/batches', methods=['GET'])
+async def get_debug_batches():
+    """Endpoint con los totales de los últimos lotes"""
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), USAGE_LOG_MAX_LIMIT)
+        return jsonify(await asyncio.to_thread(debug_tracker.get_batches, limit))
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/debug/cache', methods=['GET'])
+async def get_cache_stats():
+    """Endpoint para obtener contadores de los caches en memoria"""
+    try:
+        return jsonify({
+            "business_snapshot": business_cache.stats(),
+            "tenants": tenant_registry.stats(),
+            "replies": reply_cache.stats() if reply_cache else {"enabled": False},
+            "singleflight": groq_flights.stats(),
+            "admission": admission.stats() if admission else {"enabled": False},
+            "router": router.stats() if router else {"enabled": False},
+            "sessions": session_store.stats(),
+            "token_estimator": token_estimator.stats(),
+            "cassettes": {"mode": GROQ_MODE, **cassettes.stats()} if cassettes else {"mode": GROQ_MODE}
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+if __name__ == '__main__':
+    print("🚀 Iniciando Chat SaaS PoC Backend (async)...")
+    print(f"📊 Modelo Groq: {GROQ_MODEL}")
+    print(f"🔑 Groq API Key: {'✅ Configurada' if GROQ_API_KEY else '❌ No configurada'}")
+    print(f"🔀 Concurrencia máxima hacia Groq: {GROQ_MAX_CONCURRENCY}")
+    print("🌐 Servidor iniciando en http://localhost:5002")
+
+    app.run(host='0.0.0.0', port=5002)
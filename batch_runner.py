@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Ejecución de lotes de preguntas contra Groq
+Corre cada ítem con concurrencia acotada, reintenta los 429 con backoff (pausando todo el lote)
+y entrega los resultados en orden de finalización
+
+Uso: python batch_runner.py preguntas.jsonl [-o resultados.jsonl] [--concurrency 8] [--business negocio.json]
+Cada línea de entrada es un string JSON o {"id": ..., "message": ..., "locale": ...}
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Any, Awaitable, Callable, Iterable, Iterator, AsyncIterator, Optional
+
+
+class RateLimited(Exception):
+    """Groq (o el control de admisión) respondió 429; retry_after en segundos si se conoce"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def item_id(item: Any) -> Any:
+    """id de un ítem {id, message, ...}; None para ítems que son solo el mensaje"""
+    return item.get('id') if isinstance(item, dict) else None
+
+
+class BatchTotals:
+    """Totales de un lote a partir de las líneas de resultado"""
+
+    def __init__(self):
+        self.started = time.time()
+        self.items = 0
+        self.ok = 0
+        self.errors = 0
+        self.retries = 0
+        self.cache_hits = 0
+        self.input_tokens = 0
+        self.cached_input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+
+    def add(self, result: Dict[str, Any]):
+        self.items += 1
+        self.retries += result.get("attempts", 1) - 1
+        if result.get("status") != 200:
+            self.errors += 1
+            return
+        self.ok += 1
+        usage = result.get("usage", {})
+        tokens = usage.get("tokens", {})
+        self.cache_hits += bool(usage.get("cache", {}).get("hit"))
+        # Las respuestas compartidas (coalesced) ya las contó el ítem que llamó a Groq
+        if not usage.get("coalesced"):
+            self.input_tokens += tokens.get("input", 0)
+            self.cached_input_tokens += tokens.get("cached_input", 0)
+            self.output_tokens += tokens.get("output", 0)
+            self.cost_usd += usage.get("cost", {}).get("usd", 0.0)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "ok": self.ok,
+            "errors": self.errors,
+            "retries": self.retries,
+            "cache_hits": self.cache_hits,
+            "input_tokens": self.input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 8),
+            "duration_s": round(time.time() - self.started, 3)
+        }
+
+
+class BatchRunner:
+    """Concurrencia acotada con backoff exponencial ante RateLimited
+
+    Un 429 pausa a todo el lote (el límite de Groq es por cuenta, no por request) durante el
+    Retry-After informado o, si no hay, base * 2^intento con jitter, hasta max_backoff segundos.
+    Un Retry-After mayor a max_backoff (ej. presupuesto diario agotado) no se reintenta.
+    """
+
+    def __init__(self, concurrency: int = 8, max_retries: int = 5,
+                 backoff_base: float = 1.0, max_backoff: float = 60.0):
+        self.concurrency = max(concurrency, 1)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.max_backoff = max_backoff
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt: int, error: RateLimited) -> Optional[float]:
+        """Segundos de pausa antes del reintento; None si no hay que reintentar"""
+        if attempt > self.max_retries:
+            return None
+        if error.retry_after is not None:
+            if error.retry_after > self.max_backoff:
+                return None
+            delay = error.retry_after
+        else:
+            delay = min(self.backoff_base * 2 ** (attempt - 1), self.max_backoff)
+        delay *= random.uniform(1.0, 1.25)
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    def _pause_remaining(self) -> float:
+        return self._paused_until - time.monotonic()
+
+    def _attempts(self, index: int, item: Any, call: Callable[[Any], Dict[str, Any]]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            remaining = self._pause_remaining()
+            if remaining > 0:
+                time.sleep(remaining)
+            attempt += 1
+            try:
+                result = call(item)
+            except RateLimited as e:
+                if self._backoff(attempt, e) is None:
+                    return {"index": index, "id": item_id(item), "status": 429, "error": str(e),
+                            "attempts": attempt}
+                continue
+            return {"index": index, **result, "attempts": attempt}
+
+    def run(self, items: Iterable[Any], call: Callable[[Any], Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Ejecuta call(ítem) en threads; emite {"index", ...resultado, "attempts"} al terminar cada uno
+
+        Los ítems se leen a medida que hay lugar: un archivo enorme no se carga entero en memoria.
+        Si el consumidor deja de iterar (cliente desconectado) no se mandan más ítems.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch")
+        pending = set()
+        source = enumerate(items)
+        try:
+            for index, item in source:
+                pending.add(executor.submit(self._attempts, index, item, call))
+                if len(pending) >= self.concurrency:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    yield future.result()
+                    next_item = next(source, None)
+                    if next_item is not None:
+                        pending.add(executor.submit(self._attempts, *next_item, call))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _attempts_async(self, index: int, item: Any,
+                              call: Callable[[Any], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            remaining = self._pause_remaining()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            attempt += 1
+            try:
+                result = await call(item)
+            except RateLimited as e:
+                if self._backoff(attempt, e) is None:
+                    return {"index": index, "id": item_id(item), "status": 429, "error": str(e),
+                            "attempts": attempt}
+                continue
+            return {"index": index, **result, "attempts": attempt}
+
+    async def run_async(self, items: Iterable[Any],
+                        call: Callable[[Any], Awaitable[Dict[str, Any]]]) -> AsyncIterator[Dict[str, Any]]:
+        """Versión asyncio de run: como mucho concurrency tareas en curso"""
+        pending = set()
+        source = enumerate(items)
+        try:
+            for index, item in source:
+                pending.add(asyncio.ensure_future(self._attempts_async(index, item, call)))
+                if len(pending) >= self.concurrency:
+                    break
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+                    next_item = next(source, None)
+                    if next_item is not None:
+                        pending.add(asyncio.ensure_future(self._attempts_async(*next_item, call)))
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+def read_items(lines: Iterable[str]) -> Iterator[Any]:
+    """Ítems de un archivo JSON Lines (se ignoran las líneas vacías)"""
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Corre un lote de preguntas contra Groq y escribe JSON Lines")
+    parser.add_argument('input', help="Archivo JSON Lines ('-' para stdin)")
+    parser.add_argument('-o', '--output', help='Archivo de salida (por defecto stdout)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Llamadas simultáneas a Groq')
+    parser.add_argument('--max-retries', type=int, default=5, help='Reintentos por ítem ante un 429')
+    parser.add_argument('--business', help='business.json alternativo (ej. el catálogo a validar)')
+    parser.add_argument('--locale', help='Locale para todos los ítems (si no, se detecta por mensaje)')
+    args = parser.parse_args()
+
+    # La app lee .env y arma los caches al importarse
+    import app as chat_app
+
+    data: Dict[str, Any] = {"locale": args.locale, "concurrency": args.concurrency}
+    if args.business:
+        with open(args.business, 'r', encoding='utf-8') as f:
+            data["business"] = json.load(f)
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        batch = chat_app.prepare_batch(data, read_items(source), max_items=None,
+                                       max_concurrency=args.concurrency, max_retries=args.max_retries)
+        for line in chat_app.run_chat_batch(batch):
+            output.write(json.dumps(line, ensure_ascii=False) + '\n')
+            output.flush()
+            if "batch" in line:
+                totals = line["batch"]
+                print(f"📦 {totals['items']:,} ítems ({totals['errors']:,} errores, {totals['retries']:,} reintentos) "
+                      f"en {totals['duration_s']:.1f}s | {totals['input_tokens'] + totals['output_tokens']:,} tokens | "
+                      f"${totals['cost_usd']:.6f}", file=sys.stderr)
+    except chat_app.ChatRequestError as e:
+        print(f"❌ {e.body.get('error')}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark y precisión del detector de idioma
+Compara el detector compilado con el scan de palabras clave anterior sobre el corpus etiquetado
+y mide el tiempo por mensaje en mensajes cortos y largos
+
+Uso: python benchmarks/bench_locale.py [--json resultados.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Callable, Dict, Any, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from locale_detector import locale_detector  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locale_corpus.jsonl')
+FALLBACK = 'es-AR'
+
+
+def legacy_detect_locale(message: str, fallback: str = FALLBACK, accept_language: str = None) -> str:
+    """detect_locale anterior (substrings, sin pt-BR ni Accept-Language), como referencia"""
+    if not message:
+        return fallback
+    message_lower = message.lower()
+    if any(char in message_lower for char in 'áéíóúñ¡¿'):
+        return 'es-AR'
+    spanish_keywords = ['hola', 'gracias', 'buenos', 'buenas', 'consulta', 'precio', 'envío']
+    if any(keyword in message_lower for keyword in spanish_keywords):
+        return 'es-AR'
+    english_keywords = ['hello', 'hi', 'thanks', 'price', 'shipping', 'delivery']
+    if any(keyword in message_lower for keyword in english_keywords):
+        return 'en-US'
+    return fallback
+
+
+def load_corpus(path: str = CORPUS_PATH) -> List[Dict[str, Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def accuracy(detect: Callable[..., str], corpus: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aciertos por locale y errores (esperado, detectado, mensaje)"""
+    per_locale: Dict[str, List[int]] = {}
+    errors = []
+    for sample in corpus:
+        detected = detect(sample["message"], FALLBACK, sample.get("accept_language"))
+        hits = per_locale.setdefault(sample["locale"], [0, 0])
+        hits[1] += 1
+        if detected == sample["locale"]:
+            hits[0] += 1
+        else:
+            errors.append({"expected": sample["locale"], "detected": detected, "message": sample["message"]})
+    correct = sum(hit for hit, _ in per_locale.values())
+    return {
+        "accuracy": round(correct / len(corpus), 4),
+        "per_locale": {locale: round(hit / total, 4) for locale, (hit, total) in per_locale.items()},
+        "errors": errors
+    }
+
+
+def time_per_call(detect: Callable[..., str], message: str, min_seconds: float = 0.2) -> float:
+    """Microsegundos por llamada (repite hasta acumular min_seconds)"""
+    iterations = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_seconds:
+        for _ in range(100):
+            detect(message, FALLBACK, None)
+        iterations += 100
+        elapsed = time.perf_counter() - started
+    return elapsed / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--json', help='Archivo donde guardar los resultados')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    # Peor caso para el scan anterior: texto largo sin ninguna palabra clave
+    neutral = "Lorem ipsum dolor sit amet, consectetur adipiscing elit sed do eiusmod tempor. "
+    messages = {
+        "short": "Hola, ¿cuánto sale la remera negra?",
+        "long_1k": (neutral * 13)[:1000] + " hola",
+        "long_10k": (neutral * 125)[:10000] + " hola"
+    }
+
+    results: Dict[str, Any] = {"corpus_size": len(corpus)}
+    for name, detect in (("legacy", legacy_detect_locale), ("compiled", locale_detector.detect)):
+        results[name] = accuracy(detect, corpus)
+        results[name]["us_per_call"] = {
+            label: round(time_per_call(detect, message), 2) for label, message in messages.items()
+        }
+
+    for name in ("legacy", "compiled"):
+        print(f"📊 {name}: precisión {results[name]['accuracy']:.1%} {results[name]['per_locale']}")
+        print(f"   ⏱️ µs por mensaje: {results[name]['us_per_call']}")
+    for error in results["compiled"]["errors"]:
+        print(f"   ❌ {error['expected']} -> {error['detected']}: {error['message']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados guardados en {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Compara dos corridas de benchmarks guardadas en JSON
+Muestra cada métrica numérica de la base y de la corrida nueva con la diferencia en %
+
+Uso: python benchmarks/compare.py base.json nueva.json [--threshold 10]
+"""
+
+import json
+import argparse
+from typing import Dict, Any, Iterator, Tuple
+
+# Métricas donde un número más alto es mejor (en el resto, más bajo es mejor)
+HIGHER_IS_BETTER = ("throughput_rps", "ok", "requests", "count", "accuracy", "200")
+
+
+def flatten(data: Any, prefix: str = '') -> Iterator[Tuple[str, float]]:
+    """Pares (ruta.de.la.métrica, valor) de los valores numéricos de un JSON anidado"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from flatten(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        yield prefix, float(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos corridas de benchmarks")
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0, help='% de cambio que se marca como regresión')
+    args = parser.parse_args()
+
+    with open(args.base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+
+    print(f"📊 {base.get('kind')}: {base.get('git')} ({base.get('created')}) -> {new.get('git')} ({new.get('created')})")
+    base_metrics: Dict[str, float] = dict(flatten(base.get('results', {})))
+    regressions = 0
+    for name, value in flatten(new.get('results', {})):
+        if name not in base_metrics:
+            continue
+        before = base_metrics[name]
+        change = (value - before) / before * 100 if before else 0.0
+        worse = -change if name.rsplit('.', 1)[-1] in HIGHER_IS_BETTER else change
+        marker = '🔴' if worse > args.threshold else '🟢' if worse < -args.threshold else '  '
+        regressions += marker == '🔴'
+        print(f"{marker} {name:<70} {before:>14.4f} {value:>14.4f} {change:>+8.1f}%")
+
+    print(f"\n{'⚠️' if regressions else '✅'} {regressions} métricas empeoraron más de {args.threshold:.0f}%")
+
+
+if __name__ == '__main__':
+    main()
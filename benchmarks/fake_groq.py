@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Servidor falso de la API de Groq para benchmarks y pruebas locales
+Responde chat completions (con y sin stream) con latencia configurable y un usage
+aproximado (~4 caracteres por token) sin llamar a la red
+
+Uso: python benchmarks/fake_groq.py [--port 18431] [--latency 0.2] [--jitter 0.05] [--chunk-delay 0.05] [--rate-limit-first 0]
+GET /stats cuenta las llamadas recibidas y los streams empezados, completos y cortados por el cliente (para los tests)
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def fake_usage(messages: list, reply: str) -> dict:
+    """Usage con el formato de Groq: tokens de prompt, de respuesta y cacheados"""
+    prompt_tokens = sum(len(message.get('content', '')) for message in messages) // 4 + 4 * len(messages)
+    completion_tokens = max(len(reply) // 4, 1)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": 0}
+    }
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+    jitter = 0.0
+    chunk_delay = 0.0
+    rate_limit_first = 0
+    stream_counts = {"started": 0, "completed": 0, "aborted": 0}
+    completions = 0
+    _counts_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    @classmethod
+    def _count(cls, name: str):
+        with cls._counts_lock:
+            cls.stream_counts[name] += 1
+
+    def do_GET(self):
+        """Health check y contadores de llamadas y streams"""
+        if self.path == '/stats':
+            with self._counts_lock:
+                payload = json.dumps({"completions": FakeGroqHandler.completions,
+                                      "streams": self.stream_counts}).encode('utf-8')
+        else:
+            payload = b'{"status": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        messages = body.get('messages', [])
+        time.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+
+        with self._counts_lock:
+            FakeGroqHandler.completions += 1
+            rate_limited = FakeGroqHandler.completions <= self.rate_limit_first
+        if rate_limited:
+            payload = b'{"error": {"message": "Rate limit reached", "type": "tokens"}}'
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Retry-After', '0')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        reply = "¡Hola! Respuesta de prueba para: " + (messages[-1].get('content', '') if messages else '')[:200]
+        usage = fake_usage(messages, reply)
+
+        if body.get('stream'):
+            self._stream(reply, usage)
+            return
+
+        payload = json.dumps({
+            "choices": [{"message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": usage,
+            "model": body.get('model')
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, reply: str, usage: dict):
+        """Manda la respuesta de a 16 caracteres; si el cliente corta la conexión se cuenta como aborted"""
+        self._count("started")
+        try:
+            self._write_stream(reply, usage)
+        except (BrokenPipeError, ConnectionResetError):
+            self._count("aborted")
+            self.close_connection = True
+            return
+        self._count("completed")
+
+    def _write_stream(self, reply: str, usage: dict):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_chunk(text: str):
+            data = text.encode('utf-8')
+            self.wfile.write(b'%x\r\n' % len(data) + data + b'\r\n')
+            self.wfile.flush()
+
+        for start in range(0, len(reply), 16):
+            if start and self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            chunk = {"choices": [{"delta": {"content": reply[start:start + 16]}}]}
+            write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        write_chunk(f"data: {json.dumps({'choices': [{'delta': {}}], 'x_groq': {'usage': usage}})}\n\n")
+        write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b'0\r\n\r\n')
+
+
+class FakeGroqServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+def serve(port: int, latency: float = 0.0, jitter: float = 0.0, chunk_delay: float = 0.0,
+          rate_limit_first: int = 0):
+    FakeGroqHandler.latency = latency
+    FakeGroqHandler.jitter = jitter
+    FakeGroqHandler.chunk_delay = chunk_delay
+    FakeGroqHandler.rate_limit_first = rate_limit_first
+    server = FakeGroqServer(('127.0.0.1', port), FakeGroqHandler)
+    print(f"🤖 Groq falso en http://127.0.0.1:{port} (latencia {latency * 1000:.0f}±{jitter * 1000:.0f} ms)",
+          flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Servidor falso de la API de Groq")
+    parser.add_argument('--port', type=int, default=18431)
+    parser.add_argument('--latency', type=float, default=0.2, help='Segundos por respuesta')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Variación aleatoria de la latencia (segundos)')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='Segundos entre chunks de un stream')
+    parser.add_argument('--rate-limit-first', type=int, default=0, help='Responder 429 a los primeros N requests')
+    args = parser.parse_args()
+    serve(args.port, args.latency, args.jitter, args.chunk_delay, args.rate_limit_first)
+    sys.exit(0)
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Load test de punta a punta contra /chat
+Levanta el Groq falso y el backend (Flask o Quart) en un directorio temporal, o usa un --url
+existente, y reporta throughput y latencias p50/p90/p99
+
+Con el backend levantado acá también reporta el tiempo de arranque y la memoria (RSS y PSS)
+de cada proceso: con --app gunicorn, del master y de cada worker
+
+Uso: python benchmarks/load.py [--app flask|async|gunicorn] [--concurrency 16] [--duration 20] [--groq-latency 0.2]
+"""
+
+import os
+import sys
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from typing import Dict, Any, List, Optional
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import BENCH_DIR, REPO_DIR, save_results, summarize_samples  # noqa: E402
+from synthetic import messages as synthetic_messages  # noqa: E402
+
+APP_COMMANDS = {
+    "flask": [sys.executable, '-c', "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    "async": [sys.executable, '-c', "import app_async; app_async.app.run(host='127.0.0.1', port={port})"],
+    "gunicorn": [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+                 '--bind', '127.0.0.1:{port}', 'app:app']
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code < 500:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} no respondió en {timeout:.0f}s")
+
+
+def _proc_kb(path: str, field: str) -> Optional[int]:
+    """Valor en kB de un campo de /proc/<pid>/status o smaps_rollup"""
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid: int) -> List[int]:
+    """pid y sus hijos directos (los workers de gunicorn), leyendo /proc"""
+    children = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # El nombre del comando va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return [pid, *sorted(children)]
+
+
+def process_memory(pid: int) -> List[Dict[str, Any]]:
+    """RSS y PSS (MB) del proceso y sus hijos; PSS reparte las páginas compartidas copy-on-write"""
+    processes = []
+    for index, process_pid in enumerate(process_tree(pid)):
+        rss = _proc_kb(f'/proc/{process_pid}/status', 'VmRSS')
+        pss = _proc_kb(f'/proc/{process_pid}/smaps_rollup', 'Pss')
+        if rss is None:
+            continue
+        processes.append({
+            "pid": process_pid,
+            "role": "main" if index == 0 else "worker",
+            "rss_mb": round(rss / 1024, 1),
+            "pss_mb": round(pss / 1024, 1) if pss is not None else None
+        })
+    return processes
+
+
+class Stack:
+    """Groq falso + backend en subprocesos, con un directorio de trabajo descartable"""
+
+    def __init__(self, app_kind: str, groq_latency: float, groq_jitter: float, env: Dict[str, str],
+                 groq_chunk_delay: float = 0.0, groq_rate_limit_first: int = 0):
+        self.workdir = tempfile.mkdtemp(prefix='chat-load-')
+        shutil.copytree(os.path.join(REPO_DIR, 'data'), os.path.join(self.workdir, 'data'))
+        os.makedirs(os.path.join(self.workdir, 'debug_data'))
+        self.processes: List[subprocess.Popen] = []
+
+        groq_port = free_port()
+        self._spawn([sys.executable, os.path.join(BENCH_DIR, 'fake_groq.py'), '--port', str(groq_port),
+                     '--latency', str(groq_latency), '--jitter', str(groq_jitter),
+                     '--chunk-delay', str(groq_chunk_delay),
+                     '--rate-limit-first', str(groq_rate_limit_first)], os.environ.copy())
+        self.groq_url = f"http://127.0.0.1:{groq_port}"
+        wait_until_ready(self.groq_url + '/')
+
+        app_port = free_port()
+        app_env = {
+            **os.environ,
+            "PYTHONPATH": REPO_DIR,
+            "GROQ_API_KEY": "bench",
+            "GROQ_API_URL": f"http://127.0.0.1:{groq_port}/openai/v1/chat/completions",
+            "GROQ_DEBUG": "true",
+            **env
+        }
+        started = time.monotonic()
+        self.app_process = self._spawn([arg.format(port=app_port) for arg in APP_COMMANDS[app_kind]], app_env)
+        self.url = f"http://127.0.0.1:{app_port}"
+        wait_until_ready(self.url + '/')
+        self.startup_s = round(time.monotonic() - started, 3)
+
+    def server_stats(self) -> Dict[str, Any]:
+        """Arranque hasta el primer request atendido y memoria actual de cada proceso del backend"""
+        processes = process_memory(self.app_process.pid)
+        return {
+            "startup_s": self.startup_s,
+            "processes": processes,
+            "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+            "total_pss_mb": round(sum(p["pss_mb"] or 0 for p in processes), 1)
+        }
+
+    def _spawn(self, command: List[str], env: Dict[str, str]) -> subprocess.Popen:
+        process = subprocess.Popen(command, cwd=self.workdir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.processes.append(process)
+        return process
+
+    def close(self):
+        for process in reversed(self.processes):
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def run_load(url: str, concurrency: int, duration: float, warmup: float,
+             endpoint: str = '/chat') -> Dict[str, Any]:
+    """concurrency clientes con keep-alive mandando requests seguidos durante duration segundos"""
+    messages = synthetic_messages(512)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    measure_from = time.monotonic() + warmup
+    stop_at = measure_from + duration
+
+    def client(worker: int):
+        session = requests.Session()
+        local_latencies: List[float] = []
+        local_statuses: Dict[str, int] = {}
+        i = worker
+        while True:
+            started = time.monotonic()
+            if started >= stop_at:
+                break
+            try:
+                status = str(session.post(url + endpoint, json={"message": messages[i % len(messages)]},
+                                          timeout=60).status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            finished = time.monotonic()
+            i += concurrency
+            # Solo se cuentan los requests que empezaron después del calentamiento
+            if started >= measure_from:
+                local_latencies.append(finished - started)
+                local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(worker,)) for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    ok = statuses.get('200', 0)
+    return {
+        "requests": len(latencies),
+        "ok": ok,
+        "errors": len(latencies) - ok,
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "latency": summarize_samples(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test de /chat contra un Groq falso")
+    parser.add_argument('--url', help='Backend ya levantado (si no, se levanta uno con el Groq falso)')
+    parser.add_argument('--app', choices=sorted(APP_COMMANDS), default='flask')
+    parser.add_argument('--endpoint', default='/chat')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20.0, help='Segundos medidos')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Segundos iniciales descartados')
+    parser.add_argument('--groq-latency', type=float, default=0.2)
+    parser.add_argument('--groq-jitter', type=float, default=0.05)
+    parser.add_argument('--env', action='append', default=[], metavar='CLAVE=VALOR',
+                        help='Variables extra para el backend (ej. REPLY_CACHE_ENABLED=true)')
+    parser.add_argument('--out', help='Archivo JSON de salida (por defecto benchmarks/results/)')
+    args = parser.parse_args()
+
+    extra_env = dict(item.split('=', 1) for item in args.env)
+    stack: Optional[Stack] = None
+    url = args.url
+    if not url:
+        stack = Stack(args.app, args.groq_latency, args.groq_jitter, extra_env)
+        url = stack.url
+
+    try:
+        print(f"🚀 {args.concurrency} clientes contra {url}{args.endpoint} durante {args.duration:.0f}s")
+        results = run_load(url, args.concurrency, args.duration, args.warmup, args.endpoint)
+        if stack:
+            results["server"] = stack.server_stats()
+    finally:
+        if stack:
+            stack.close()
+
+    latency = results["latency"]
+    print(f"📊 {results['requests']:,} requests ({results['errors']:,} errores) | "
+          f"{results['throughput_rps']:.1f} req/s | p50 {latency.get('p50_ms', 0):.1f} ms | "
+          f"p99 {latency.get('p99_ms', 0):.1f} ms")
+    if "server" in results:
+        server = results["server"]
+        workers = [p for p in server["processes"] if p["role"] == "worker"]
+        print(f"🧠 Arranque {server['startup_s']:.2f}s | RSS total {server['total_rss_mb']:.1f} MB | "
+              f"PSS total {server['total_pss_mb']:.1f} MB"
+              + (f" | {len(workers)} workers, RSS promedio "
+                 f"{sum(p['rss_mb'] for p in workers) / len(workers):.1f} MB" if workers else ""))
+
+    path = save_results('load', {
+        "url": args.url,
+        "app": None if args.url else args.app,
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "groq_latency": None if args.url else args.groq_latency,
+        "groq_jitter": None if args.url else args.groq_jitter,
+        "env": extra_env
+    }, results, os.path.abspath(args.out) if args.out else None)
+    print(f"💾 Resultados guardados en {path}")
+
+
+if __name__ == '__main__':
+    main()
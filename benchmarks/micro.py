@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks del pipeline de prompt y del tracker
+Catálogos sintéticos de 10, 1k y 100k SKUs (compilados enteros y actualizados con un PATCH) y logs de uso de 10k a 1M filas;
+todo corre en un directorio temporal para no tocar debug_data/ del repo
+
+Uso: python benchmarks/micro.py [--quick] [--catalog-sizes 10,1000,100000] [--log-rows 10000,100000,1000000]
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from typing import Callable, Dict, Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from report import REPO_DIR, save_results, summarize_samples  # noqa: E402
+from synthetic import synthetic_business, write_business, usage_entries  # noqa: E402
+
+
+def measure(fn: Callable[[], Any], min_time: float = 0.5, min_iterations: int = 3,
+            max_iterations: int = 100000) -> Dict[str, float]:
+    """Tiempo de cada llamada hasta juntar min_time segundos (y al menos min_iterations llamadas)"""
+    samples: List[float] = []
+    started = time.perf_counter()
+    while len(samples) < max_iterations and (len(samples) < min_iterations
+                                            or time.perf_counter() - started < min_time):
+        call_started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - call_started)
+    return summarize_samples(samples)
+
+
+def bench_prompt_pipeline(app, workdir: str, sizes: List[int], min_time: float) -> Dict[str, Any]:
+    """load_business_data, compute_offers, build_system_prompt y select_catalog por tamaño de catálogo"""
+    results: Dict[str, Any] = {}
+    for skus in sizes:
+        path = os.path.join(workdir, f"business-{skus}.json")
+        write_business(path, skus)
+        app.BUSINESS_JSON_PATH = path
+
+        business = app.load_business_data()
+        offers = app.compute_offers(business, 'es-AR')
+        compiled = app.tenant_registry.resolve(synthetic_business(skus))
+        compiled_locale = compiled.for_locale('es-AR')
+        app.select_catalog(compiled, compiled_locale, "calentamos")
+
+        results[f"catalog_{skus}"] = {
+            "load_business_data": measure(app.load_business_data, min_time),
+            "compute_offers": measure(lambda: app.compute_offers(business, 'es-AR'), min_time),
+            "build_system_prompt": measure(lambda: app.build_system_prompt(business, 'es-AR', offers), min_time),
+            # Camino real de un request: catálogo compilado + productos relevantes al mensaje
+            "select_catalog": measure(
+                lambda: app.select_catalog(compiled, compiled_locale, "precio del pollo con calabaza"), min_time)
+        }
+        print(f"   📦 {skus:,} SKUs: " + ', '.join(
+            f"{name} p50 {stats['p50_ms']:.3f} ms" for name, stats in results[f"catalog_{skus}"].items()))
+    return results
+
+
+def bench_catalog_patch(app, workdir: str, sizes: List[int], min_time: float) -> Dict[str, Any]:
+    """PATCH de un SKU sobre un snapshot ya compilado contra recompilar business.json entero
+
+    Ambos casos dejan listo el prompt completo de es-AR (lo que arma un request sin filtro de catálogo).
+    """
+    from business_cache import BusinessSnapshotCache
+    from catalog_delta import parse_catalog_delta
+
+    results: Dict[str, Any] = {}
+    original_cache = app.business_cache
+    for skus in sizes:
+        path = os.path.join(workdir, f"business-{skus}.json")
+        write_business(path, skus)
+
+        def new_cache() -> BusinessSnapshotCache:
+            return BusinessSnapshotCache(path, app.BusinessProfile, app.compile_business_locale,
+                                         app.build_prompt_prefix, app.patch_business_locale, check_interval=3600)
+
+        def rebuild():
+            snapshot = new_cache().get()
+            snapshot.index
+            snapshot.for_locale('es-AR').full_prompt
+
+        cache = new_cache()
+        app.business_cache = cache
+        rebuild_stats = measure(rebuild, min_time)
+        snapshot = cache.get()
+        snapshot.index
+        snapshot.for_locale('es-AR').full_prompt
+        prices = iter(range(1000, 10 ** 9))
+
+        def patch_one():
+            delta = parse_catalog_delta({"upsert": [{"sku": "SKU-000000", "price": next(prices)}]})
+            app.patch_business_catalog(delta)
+            app.business_cache.get().for_locale('es-AR').full_prompt
+
+        results[f"catalog_{skus}"] = {"full_rebuild": rebuild_stats, "patch_one_sku": measure(patch_one, min_time)}
+        print(f"   🩹 {skus:,} SKUs: " + ', '.join(
+            f"{name} p50 {stats['p50_ms']:.3f} ms" for name, stats in results[f"catalog_{skus}"].items()))
+    app.business_cache = original_cache
+    return results
+
+
+def bench_detect_locale(app, min_time: float) -> Dict[str, Any]:
+    neutral = "Lorem ipsum dolor sit amet, consectetur adipiscing elit sed do eiusmod tempor. "
+    messages = {
+        "short": "Hola, ¿cuánto sale la remera negra?",
+        "long_1k": (neutral * 13)[:1000],
+        "long_10k": (neutral * 125)[:10000]
+    }
+    results = {name: measure(lambda: app.detect_locale(message), min_time) for name, message in messages.items()}
+    print("   🌐 detect_locale: " + ', '.join(f"{name} p50 {stats['p50_ms']:.4f} ms"
+                                              for name, stats in results.items()))
+    return results
+
+
+def bench_track_request(workdir: str, rows_list: List[int], min_time: float) -> Dict[str, Any]:
+    """track_request con logs de uso de distintos tamaños ya escritos en disco"""
+    from debug_tracker import GroqDebugTracker
+    from usage_log import UsageLog
+
+    results: Dict[str, Any] = {}
+    for rows in rows_list:
+        rows_dir = os.path.join(workdir, f"log-{rows}")
+        os.makedirs(os.path.join(rows_dir, 'debug_data'))
+        os.chdir(rows_dir)
+
+        log = UsageLog('debug_data/usage_log.jsonl', 'debug_data/usage_log.idx', 'debug_data/usage_log.models')
+        batch = []
+        for entry in usage_entries(rows):
+            batch.append(entry)
+            if len(batch) == 10000:
+                log.append_batch(batch)
+                batch = []
+        if batch:
+            log.append_batch(batch)
+        log.close()
+
+        # El tracker imprime cada request en modo debug: se descarta la salida
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            started = time.perf_counter()
+            tracker = GroqDebugTracker(debug_mode=True, save_to_file=True)
+            startup_ms = (time.perf_counter() - started) * 1000
+            stats = measure(lambda: tracker.track_request("llama3-70b-8192", 1200, 300, latency_ms=420.0),
+                            min_time)
+            tracker.close()
+
+        results[f"log_{rows}"] = {"startup_ms": round(startup_ms, 3), "track_request": stats}
+        print(f"   📝 log de {rows:,} filas: inicio {startup_ms:.1f} ms, "
+              f"track_request p50 {stats['p50_ms']:.3f} ms / p99 {stats['p99_ms']:.3f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks del pipeline de prompt y del tracker")
+    parser.add_argument('--quick', action='store_true', help='Tamaños chicos para una corrida rápida')
+    parser.add_argument('--catalog-sizes', default='10,1000,100000')
+    parser.add_argument('--log-rows', default='10000,100000,1000000')
+    parser.add_argument('--min-time', type=float, default=0.5, help='Segundos mínimos por benchmark')
+    parser.add_argument('--out', help='Archivo JSON de salida (por defecto benchmarks/results/)')
+    args = parser.parse_args()
+
+    catalog_sizes = [10, 1000] if args.quick else [int(size) for size in args.catalog_sizes.split(',')]
+    log_rows = [10000] if args.quick else [int(rows) for rows in args.log_rows.split(',')]
+    min_time = 0.2 if args.quick else args.min_time
+    out = os.path.abspath(args.out) if args.out else None
+
+    # Directorio de trabajo temporal con una copia de data/ (el tracker usa rutas relativas)
+    workdir = tempfile.mkdtemp(prefix='chat-bench-')
+    shutil.copytree(os.path.join(REPO_DIR, 'data'), os.path.join(workdir, 'data'))
+    os.makedirs(os.path.join(workdir, 'debug_data'))
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_DIR)
+    os.environ['GROQ_DEBUG'] = 'false'
+
+    try:
+        import app
+
+        print("⏱️ Pipeline de prompt")
+        results = {"prompt_pipeline": bench_prompt_pipeline(app, workdir, catalog_sizes, min_time)}
+        results["catalog_patch"] = bench_catalog_patch(app, workdir, catalog_sizes, min_time)
+        results["detect_locale"] = bench_detect_locale(app, min_time)
+        print("⏱️ Tracker")
+        results["track_request"] = bench_track_request(workdir, log_rows, min_time)
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    path = save_results('micro', {
+        "catalog_sizes": catalog_sizes,
+        "log_rows": log_rows,
+        "min_time": min_time
+    }, results, out)
+    print(f"💾 Resultados guardados en {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Resultados de benchmarks en JSON, con el contexto necesario para comparar corridas
+"""
+
+import os
+import sys
+import json
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def git_revision() -> Optional[str]:
+    """Commit actual (con '+dirty' si hay cambios sin commitear)"""
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                  capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+        return f"{revision}+dirty" if revision and dirty else revision or None
+    except Exception:
+        return None
+
+
+def summarize_samples(samples: List[float]) -> Dict[str, float]:
+    """Estadísticas de una lista de duraciones en segundos, expresadas en milisegundos"""
+    ordered = sorted(samples)
+    count = len(ordered)
+    if not count:
+        return {"count": 0}
+
+    def rank(pct: float) -> float:
+        return ordered[min(count - 1, max(0, int(round(pct / 100 * count + 0.5)) - 1))] * 1000
+
+    return {
+        "count": count,
+        "mean_ms": round(sum(ordered) / count * 1000, 4),
+        "min_ms": round(ordered[0] * 1000, 4),
+        "p50_ms": round(rank(50), 4),
+        "p90_ms": round(rank(90), 4),
+        "p99_ms": round(rank(99), 4),
+        "max_ms": round(ordered[-1] * 1000, 4)
+    }
+
+
+def save_results(kind: str, config: Dict[str, Any], results: Dict[str, Any], path: str = None) -> str:
+    """Guarda una corrida en benchmarks/results/<kind>-<fecha>.json (o en path) y retorna la ruta"""
+    if not path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+    document = {
+        "kind": kind,
+        "created": datetime.now().isoformat(timespec='seconds'),
+        "git": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": config,
+        "results": results
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return path
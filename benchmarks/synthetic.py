@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Datos sintéticos para benchmarks: catálogos de N SKUs y logs de uso de N filas
+Generados con una semilla fija para que dos corridas midan lo mismo
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List
+
+CATEGORIES = {
+    "Platos principales": ["Carnes", "Pastas", "Vegetariano"],
+    "Entradas": ["Frías", "Calientes"],
+    "Postres": ["Tortas", "Helados"],
+    "Bebidas": ["Sin alcohol", "Vinos"]
+}
+WORDS = ["pollo", "calabaza", "asado", "crema", "limón", "tomate", "queso", "cordero", "papa", "hongos",
+         "verdeo", "chocolate", "dulce", "leche", "malbec", "naranja", "ricota", "espinaca", "salmón", "arroz"]
+TAGS = ["sin tacc", "vegano", "picante", "nuevo", "para compartir"]
+MODELS = ["llama3-70b-8192", "llama3-8b-8192", "llama3.3-70b-versatile"]
+
+
+def synthetic_business(skus: int, seed: int = 42) -> Dict[str, Any]:
+    """Negocio con el formato de data/business.json y un catálogo de skus productos"""
+    rng = random.Random(seed)
+    catalog = []
+    categories = list(CATEGORIES)
+    for i in range(skus):
+        category = categories[i % len(categories)]
+        catalog.append({
+            "sku": f"SKU-{i:06d}",
+            "title": ' '.join(rng.sample(WORDS, 3)).capitalize(),
+            "price": rng.randrange(1500, 90000, 100),
+            "attrs": {
+                "category": category,
+                "segment": rng.choice(CATEGORIES[category]),
+                "tags": rng.sample(TAGS, rng.randint(0, 2))
+            }
+        })
+
+    return {
+        "id": f"bench-{skus}",
+        "name": "Negocio de Benchmark",
+        "defaultLocale": "es-AR",
+        "currency": "ARS",
+        "tone": {"style": "cálido, cercano", "signoff": "¡Gracias!"},
+        "policies": {
+            "delivery": "Envíos a CABA y Zona Norte.",
+            "disclaimer": "Precios sujetos a actualización.",
+            "stock": "Stock sujeto a confirmación."
+        },
+        "payments": {
+            "methods": ["Mercado Pago", "Transferencia bancaria", "Efectivo"],
+            "discounts": [
+                {"key": "cash", "label": "Efectivo", "percent": 10},
+                {"key": "transfer", "label": "Transferencia", "percent": 5}
+            ],
+            "installments": {"count": 3, "noInterest": True, "label": "3 cuotas sin interés"}
+        },
+        "catalog": catalog
+    }
+
+
+def write_business(path: str, skus: int, seed: int = 42):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(synthetic_business(skus, seed), f, ensure_ascii=False)
+
+
+def usage_entries(rows: int, seed: int = 42, end: datetime = None) -> Iterator[Dict[str, Any]]:
+    """Registros del log de uso, uno por minuto hasta end, en orden cronológico"""
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    start = end - timedelta(minutes=rows)
+    for i in range(rows):
+        input_tokens = rng.randint(200, 4000)
+        output_tokens = rng.randint(20, 700)
+        yield {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "cost_usd": (input_tokens * 0.59 + output_tokens * 0.79) / 1_000_000,
+            "timestamp": (start + timedelta(minutes=i)).isoformat(),
+            "model": MODELS[i % len(MODELS)],
+            "request_id": f"bench_{i}",
+            "cache_hit": False,
+            "latency_ms": rng.uniform(150, 900)
+        }
+
+
+def messages(count: int, seed: int = 42) -> List[str]:
+    """Mensajes de clientes variados para el load test"""
+    rng = random.Random(seed)
+    templates = [
+        "Hola, ¿cuánto sale el {w}?", "quiero pedir {w} con {v}, hacen envío?", "tenés algo con {w} sin tacc?",
+        "Hi, how much is the {w}?", "Olá, quanto custa o {w}?", "precio del {w} y del {v} en efectivo"
+    ]
+    return [rng.choice(templates).format(w=rng.choice(WORDS), v=rng.choice(WORDS)) for _ in range(count)]
@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Cache de snapshots compilados del negocio
+Mantiene en memoria el perfil, el prefijo fijo del prompt, las ofertas por locale y el índice del catálogo
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+from catalog_index import CatalogIndex
+
+
+def content_hash(raw: bytes) -> str:
+    """Hash corto del contenido, usado como versión del catálogo"""
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def serialize_business(data: Dict[str, Any]) -> bytes:
+    """JSON de business.json: una clave por línea y un producto del catálogo por línea
+
+    Con indent= json usa el encoder en Python puro (~2.8 s para 50k SKUs); cada producto
+    serializado compacto usa el encoder en C y el archivo sigue siendo legible en un diff.
+    """
+    fields = []
+    for key, value in data.items():
+        if key == 'catalog' and isinstance(value, list) and value:
+            encode = json.JSONEncoder(ensure_ascii=False).encode
+            rendered = '[\n' + ',\n'.join('    ' + encode(product) for product in value) + '\n  ]'
+        else:
+            rendered = json.dumps(value, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        fields.append(f'  {json.dumps(key, ensure_ascii=False)}: {rendered}')
+    return ('{\n' + ',\n'.join(fields) + '\n}\n').encode('utf-8')
+
+
+class VersionConflict(Exception):
+    """El cambio se pidió sobre una versión del negocio que ya no es la vigente"""
+
+    def __init__(self, expected: str, current: str):
+        super().__init__(f"Versión {expected} desactualizada, la vigente es {current}")
+        self.expected = expected
+        self.current = current
+
+
+class CompiledBusiness:
+    """Snapshot inmutable de un negocio con ofertas y prompts compilados por locale"""
+
+    def __init__(self, profile: Any, data: Dict[str, Any], version: str,
+                 compile_locale: Callable[[Any, str], Any],
+                 compile_prefix: Optional[Callable[[Any], str]] = None,
+                 max_locales: int = 8):
+        self.profile = profile
+        self.data = data
+        self.version = version
+        self.max_locales = max_locales
+        self._compile_locale = compile_locale
+        self._compile_prefix = compile_prefix
+        self._locales: Dict[str, Any] = {}
+        self._index: Optional[CatalogIndex] = None
+        self._prefix: Optional[Tuple[str, str]] = None
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.locale_builds = 0
+
+    @property
+    def index(self) -> CatalogIndex:
+        """Índice invertido del catálogo, construido una vez por versión"""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = CatalogIndex(self.profile.catalog)
+        return self._index
+
+    def _prompt_prefix(self) -> Tuple[str, str]:
+        """(prefijo, hash) construidos una vez por versión"""
+        if self._prefix is None:
+            with self._lock:
+                if self._prefix is None:
+                    prefix = self._compile_prefix(self.profile) if self._compile_prefix else ''
+                    self._prefix = (prefix, content_hash(prefix.encode('utf-8')))
+        return self._prefix
+
+    @property
+    def prompt_prefix(self) -> str:
+        """Parte del prompt idéntica byte a byte en todos los requests de esta versión del negocio"""
+        return self._prompt_prefix()[0]
+
+    @property
+    def prefix_hash(self) -> str:
+        """Hash del prefijo, para atribuir los tokens cacheados por el proveedor"""
+        return self._prompt_prefix()[1]
+
+    def derived(self, key: str, build: Callable[['CompiledBusiness'], Any]) -> Any:
+        """Artefacto derivado del snapshot (ej. la respuesta serializada de /business), una vez por versión"""
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = build(self)
+                    self._derived = {**self._derived, key: value}
+        return value
+
+    def for_locale(self, locale: str) -> Any:
+        """Retorna las ofertas y el prompt compilados para el locale, una sola vez"""
+        compiled = self._locales.get(locale)
+        if compiled is not None:
+            return compiled
+
+        with self._lock:
+            compiled = self._locales.get(locale)
+            if compiled is None:
+                compiled = self._compile_locale(self.profile, locale)
+                self.locale_builds += 1
+                # Locales arbitrarios del cliente no deben crecer el cache sin límite
+                if len(self._locales) < self.max_locales:
+                    self._locales = {**self._locales, locale: compiled}
+        return compiled
+
+    def locales(self) -> list:
+        """Locales compilados actualmente"""
+        return list(self._locales.keys())
+
+    def patched(self, profile: Any, data: Dict[str, Any], version: str,
+                upserts: List[Dict[str, Any]], deletes: Iterable[str],
+                patch_locale: Optional[Callable[[Any, Any, set], Any]] = None) -> 'CompiledBusiness':
+        """Snapshot nuevo tras un cambio parcial del catálogo, sin modificar este
+
+        El índice y los locales ya compilados se actualizan solo para los SKUs tocados
+        (patch_locale(locale compilado, perfil nuevo, SKUs cambiados)); lo demás se arma bajo demanda.
+        """
+        deletes = list(deletes)
+        compiled = CompiledBusiness(profile, data, version, self._compile_locale,
+                                    self._compile_prefix, self.max_locales)
+        index = self._index
+        if index is not None:
+            compiled._index = index.patched(upserts, deletes)
+        if patch_locale is not None:
+            changed = {product['sku'] for product in upserts} | set(deletes)
+            compiled._locales = {locale: patch_locale(compiled_locale, profile, changed)
+                                 for locale, compiled_locale in self._locales.items()}
+        return compiled
+
+
+class BusinessSnapshotCache:
+    """Carga business.json una vez y lo recompila solo cuando cambia el archivo"""
+
+    def __init__(self, path: str, profile_factory: Callable[[Dict[str, Any]], Any],
+                 compile_locale: Callable[[Any, str], Any],
+                 compile_prefix: Optional[Callable[[Any], str]] = None,
+                 patch_locale: Optional[Callable[[Any, Any, set], Any]] = None,
+                 check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._profile_factory = profile_factory
+        self._compile_locale = compile_locale
+        self._compile_prefix = compile_prefix
+        self._patch_locale = patch_locale
+        self._snapshot: Optional[CompiledBusiness] = None
+        self._file_signature: Optional[Tuple[int, int]] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._patch_lock = threading.Lock()
+
+        # Contadores expuestos en /debug
+        self.hits = 0
+        self.rebuilds = 0
+        self.errors = 0
+        self.patches = 0
+
+    def get(self) -> CompiledBusiness:
+        """Retorna el snapshot vigente, revisando el archivo como mucho cada check_interval"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_check < self.check_interval:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            snapshot = self._refresh()
+        return snapshot
+
+    def invalidate(self):
+        """Fuerza la revisión del archivo en el próximo acceso"""
+        self._last_check = 0.0
+        self._file_signature = None
+
+    def _refresh(self) -> CompiledBusiness:
+        """Revisa mtime/tamaño y recompila si el contenido cambió"""
+        snapshot = self._snapshot
+        self._last_check = time.monotonic()
+
+        try:
+            stat = os.stat(self.path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if snapshot is not None and signature == self._file_signature:
+                self.hits += 1
+                return snapshot
+
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            version = content_hash(raw)
+
+            # El archivo se tocó pero el contenido es el mismo
+            if snapshot is not None and version == snapshot.version:
+                self._file_signature = signature
+                self.hits += 1
+                return snapshot
+
+            data = json.loads(raw.decode('utf-8'))
+            new_snapshot = CompiledBusiness(
+                profile=self._profile_factory(data),
+                data=data,
+                version=version,
+                compile_locale=self._compile_locale,
+                compile_prefix=self._compile_prefix
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"Error cargando business.json: {e}")
+            if snapshot is None:
+                raise
+            # Seguimos sirviendo el último snapshot válido
+            return snapshot
+
+        # Swap atómico: los lectores ven el snapshot viejo o el nuevo, nunca uno a medias
+        self._snapshot = new_snapshot
+        self._file_signature = signature
+        self.rebuilds += 1
+        return new_snapshot
+
+    def patch(self, transform: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], List[Dict[str, Any]], List[str]]],
+              expected_version: Optional[str] = None) -> Tuple[CompiledBusiness, CompiledBusiness]:
+        """Aplica un cambio parcial, lo persiste en el archivo y publica el snapshot nuevo
+
+        transform(data) retorna (data nueva, productos reemplazados o agregados, SKUs borrados) sin
+        modificar la data recibida. Los cambios se serializan entre threads y entre procesos (flock),
+        y se aplican sobre el contenido vigente del archivo. Retorna (snapshot anterior, snapshot nuevo).
+        """
+        with self._patch_lock, self._file_lock():
+            # Otro worker pudo haber cambiado el archivo desde la última revisión
+            with self._lock:
+                current = self._refresh()
+            if expected_version is not None and expected_version != current.version:
+                raise VersionConflict(expected_version, current.version)
+
+            data, upserts, deletes = transform(current.data)
+            if data == current.data:
+                return current, current
+
+            # El snapshot nuevo se arma sin el lock de lectura: get() sigue sirviendo el vigente
+            raw = serialize_business(data)
+            snapshot = current.patched(self._profile_factory(data), data, content_hash(raw),
+                                       upserts, deletes, self._patch_locale)
+
+            with self._lock:
+                if self._snapshot is not current:
+                    # El archivo se editó por fuera mientras se armaba el cambio
+                    raise VersionConflict(current.version, self._snapshot.version)
+                signature = self._write(raw)
+                # Mismo swap atómico que en _refresh: los lectores nunca ven un snapshot a medias
+                self._snapshot = snapshot
+                self._file_signature = signature
+                self._last_check = time.monotonic()
+                self.patches += 1
+        return current, snapshot
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """flock exclusivo sobre <archivo>.lock (el archivo en sí se reemplaza en cada escritura)"""
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def _write(self, raw: bytes) -> Tuple[int, int]:
+        """Escritura atómica: archivo temporal en el mismo directorio, fsync y rename
+
+        Un lector (u otro worker) ve el archivo viejo o el nuevo completo, nunca uno truncado.
+        Retorna la firma (mtime, tamaño) del archivo escrito.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.business-', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(raw)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        # El rename es durable recién cuando se sincroniza el directorio
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del cache para debug"""
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "version": snapshot.version if snapshot else None,
+            "hits": self.hits,
+            "rebuilds": self.rebuilds,
+            "patches": self.patches,
+            "errors": self.errors,
+            "locales": snapshot.locales() if snapshot else [],
+            "locale_builds": snapshot.locale_builds if snapshot else 0,
+            "prefix_hash": snapshot.prefix_hash if snapshot else None,
+            "check_interval": self.check_interval
+        }
+
+
+class TenantRegistry:
+    """Registro LRU acotado de negocios enviados inline, indexado por id + hash del payload"""
+
+    def __init__(self, profile_factory: Callable[[Dict[str, Any]], Any],
+                 compile_locale: Callable[[Any, str], Any],
+                 compile_prefix: Optional[Callable[[Any], str]] = None,
+                 max_tenants: int = 256):
+        self.max_tenants = max_tenants
+        self._profile_factory = profile_factory
+        self._compile_locale = compile_locale
+        self._compile_prefix = compile_prefix
+        self._tenants: "OrderedDict[Tuple[Any, str], CompiledBusiness]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Contadores expuestos en /debug
+        self.hits = 0
+        self.misses = 0
+        self.compiles = 0
+        self.evictions = 0
+
+    @staticmethod
+    def payload_version(payload: Dict[str, Any]) -> str:
+        """Hash canónico del payload (independiente del orden de las claves)"""
+        raw = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return content_hash(raw.encode('utf-8'))
+
+    def resolve(self, payload: Dict[str, Any]) -> CompiledBusiness:
+        """Retorna el negocio compilado para el payload, compilándolo solo si cambió su hash"""
+        version = self.payload_version(payload)
+        key = (payload.get('id'), version)
+
+        with self._lock:
+            compiled = self._tenants.get(key)
+            if compiled is not None:
+                self._tenants.move_to_end(key)
+                self.hits += 1
+                return compiled
+
+        # Compilar fuera del lock para no frenar a otros tenants
+        compiled = CompiledBusiness(
+            profile=self._profile_factory(payload),
+            data=payload,
+            version=version,
+            compile_locale=self._compile_locale,
+            compile_prefix=self._compile_prefix
+        )
+
+        with self._lock:
+            existing = self._tenants.get(key)
+            if existing is not None:
+                self._tenants.move_to_end(key)
+                return existing
+            self._tenants[key] = compiled
+            self.compiles += 1
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def get(self, business_id: Any, version: Optional[str]) -> Optional[CompiledBusiness]:
+        """Busca un tenant ya registrado sin que el cliente reenvíe el catálogo"""
+        if not version:
+            return None
+
+        key = (business_id, version)
+        with self._lock:
+            compiled = self._tenants.get(key)
+            if compiled is None:
+                self.misses += 1
+                return None
+            self._tenants.move_to_end(key)
+            self.hits += 1
+            return compiled
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del registro para debug"""
+        return {
+            "tenants": len(self._tenants),
+            "max_tenants": self.max_tenants,
+            "hits": self.hits,
+            "misses": self.misses,
+            "compiles": self.compiles,
+            "evictions": self.evictions
+        }
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Grabación y reproducción de llamadas a Groq (cassettes)
+Cada request se identifica por un hash del payload y se guarda con su respuesta, uso y latencia
+en SQLite: la búsqueda es por clave primaria y no se carga el archivo entero al iniciar
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Any, List, Optional
+
+from sqlite_util import thread_connection
+
+GROQ_MODES = ("live", "record", "replay")
+
+# Caracteres por chunk al reproducir una respuesta con stream
+REPLAY_CHUNK_CHARS = 16
+
+# Campos del payload que no cambian la respuesta (stream y no stream comparten la grabación)
+_IGNORED_FIELDS = ("stream",)
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Hash canónico del payload de chat completions"""
+    relevant = {key: value for key, value in payload.items() if key not in _IGNORED_FIELDS}
+    raw = json.dumps(relevant, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def split_reply(reply: str, size: int = REPLAY_CHUNK_CHARS) -> List[str]:
+    """Parte una respuesta grabada en deltas para reproducirla como stream"""
+    return [reply[start:start + size] for start in range(0, len(reply), size)]
+
+
+class CassetteStore:
+    """Respuestas grabadas de Groq indexadas por fingerprint del request"""
+
+    def __init__(self, path: str, latency_scale: float = 0.0):
+        self.path = path
+        self.latency_scale = latency_scale
+        self._local = threading.local()
+
+        # Contadores expuestos en /debug (por proceso)
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+
+        self._keepalive = self._connection()
+        with self._keepalive as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cassettes ("
+                "fingerprint TEXT PRIMARY KEY, model TEXT NOT NULL, request TEXT NOT NULL, "
+                "reply TEXT NOT NULL, usage TEXT NOT NULL, latency_ms REAL, recorded REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def get(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Grabación del request: {reply, usage, latency_ms, delay}; None si no hay
+
+        delay es la latencia grabada multiplicada por latency_scale (0 = responder sin esperar).
+        """
+        row = self._connection().execute(
+            "SELECT reply, usage, latency_ms FROM cassettes WHERE fingerprint = ?", (fingerprint(payload),)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.replayed += 1
+        latency_ms = row[2]
+        return {
+            "reply": row[0],
+            "usage": json.loads(row[1]),
+            "latency_ms": latency_ms,
+            "delay": (latency_ms or 0.0) / 1000 * self.latency_scale
+        }
+
+    def put(self, payload: Dict[str, Any], reply: str, usage: Dict[str, Any], latency_ms: Optional[float]):
+        """Graba (o regraba) la respuesta de un request"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cassettes (fingerprint, model, request, reply, usage, latency_ms, recorded) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (fingerprint(payload), payload.get('model', ''),
+             json.dumps(payload.get('messages', []), ensure_ascii=False), reply,
+             json.dumps(usage), latency_ms, time.time())
+        )
+        self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para debug"""
+        return {
+            "path": self.path,
+            "latency_scale": self.latency_scale,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses
+        }
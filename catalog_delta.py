@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Cambios parciales del catálogo (PATCH /business/catalog)
+Valida el delta (SKUs a agregar o modificar, SKUs a borrar y descuentos de pago) y lo aplica
+sobre una copia de los datos del negocio, sin tocar los productos que no cambian
+
+Formato del delta:
+    {"upsert": [{"sku": "PP-1", "price": 13000}, ...],
+     "delete": ["PP-2", ...],
+     "discounts": {"upsert": [{"key": "cash", "label": "Efectivo", "percent": 10}], "delete": ["transfer"]}}
+"""
+
+from typing import Dict, Any, List, Tuple
+
+# Límite de operaciones por request: un cambio más grande se hace reemplazando business.json
+MAX_DELTA_OPERATIONS = 10000
+
+# Campos obligatorios al agregar un SKU o un descuento que no existían
+REQUIRED_PRODUCT_FIELDS = ('title', 'price')
+REQUIRED_DISCOUNT_FIELDS = ('label', 'percent')
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _list_field(body: Dict[str, Any], field: str) -> list:
+    value = body.get(field) or []
+    if not isinstance(value, list):
+        raise ValueError(f"'{field}' debe ser una lista")
+    return value
+
+
+def _validate_product(product: Any) -> Dict[str, Any]:
+    """Valida los campos presentes de un SKU (los que faltan se toman del producto existente)"""
+    if not isinstance(product, dict):
+        raise ValueError("Cada elemento de 'upsert' debe ser un objeto con 'sku'")
+    sku = product.get('sku')
+    if not isinstance(sku, str) or not sku.strip():
+        raise ValueError("Cada elemento de 'upsert' necesita un 'sku' no vacío")
+    if 'title' in product and (not isinstance(product['title'], str) or not product['title'].strip()):
+        raise ValueError(f"{sku}: 'title' debe ser un texto no vacío")
+    if 'price' in product and (not _is_number(product['price']) or product['price'] < 0):
+        raise ValueError(f"{sku}: 'price' debe ser un número mayor o igual a 0")
+    if 'attrs' in product and not isinstance(product['attrs'], dict):
+        raise ValueError(f"{sku}: 'attrs' debe ser un objeto")
+    return product
+
+
+def _validate_discount(discount: Any) -> Dict[str, Any]:
+    """Valida los campos presentes de un descuento (se identifican por key)"""
+    if not isinstance(discount, dict):
+        raise ValueError("Cada elemento de 'discounts.upsert' debe ser un objeto con 'key'")
+    key = discount.get('key')
+    if not isinstance(key, str) or not key.strip():
+        raise ValueError("Cada descuento necesita un 'key' no vacío")
+    if 'label' in discount and not isinstance(discount['label'], str):
+        raise ValueError(f"Descuento {key}: 'label' debe ser un texto")
+    if 'percent' in discount and (not _is_number(discount['percent'])
+                                  or not 0 <= discount['percent'] <= 100):
+        raise ValueError(f"Descuento {key}: 'percent' debe ser un número entre 0 y 100")
+    return discount
+
+
+def _check_keys(upserts: List[Dict[str, Any]], deletes: List[Any], field: str, what: str):
+    """Sin repetidos ni claves que se agregan y se borran en el mismo delta"""
+    keys = [item[field] for item in upserts]
+    if len(set(keys)) != len(keys):
+        raise ValueError(f"Hay {what} repetidos en 'upsert'")
+    if not all(isinstance(key, str) for key in deletes):
+        raise ValueError(f"Los {what} a borrar deben ser textos")
+    both = set(keys) & set(deletes)
+    if both:
+        raise ValueError(f"{what} en 'upsert' y en 'delete' a la vez: {', '.join(sorted(both))}")
+
+
+def parse_catalog_delta(body: Any) -> Dict[str, Any]:
+    """Valida la forma del delta; lanza ValueError con un mensaje para el cliente"""
+    if not isinstance(body, dict):
+        raise ValueError("Se esperaba un objeto JSON con upsert, delete y/o discounts")
+
+    upserts = [_validate_product(product) for product in _list_field(body, 'upsert')]
+    deletes = _list_field(body, 'delete')
+    _check_keys(upserts, deletes, 'sku', 'SKUs')
+
+    discounts = body.get('discounts') or {}
+    if not isinstance(discounts, dict):
+        raise ValueError("'discounts' debe ser un objeto con upsert y/o delete")
+    discount_upserts = [_validate_discount(discount) for discount in _list_field(discounts, 'upsert')]
+    discount_deletes = _list_field(discounts, 'delete')
+    _check_keys(discount_upserts, discount_deletes, 'key', 'descuentos')
+
+    operations = len(upserts) + len(deletes) + len(discount_upserts) + len(discount_deletes)
+    if operations == 0:
+        raise ValueError("El delta no tiene cambios")
+    if operations > MAX_DELTA_OPERATIONS:
+        raise ValueError(f"Máximo {MAX_DELTA_OPERATIONS} operaciones por request")
+
+    return {
+        "upsert": upserts,
+        "delete": deletes,
+        "discounts": {"upsert": discount_upserts, "delete": discount_deletes}
+    }
+
+
+def _merge(current: Dict[str, Any], patch: Dict[str, Any], required: Tuple[str, ...], name: str) -> Dict[str, Any]:
+    """Elemento existente con los campos del patch, o el patch si es nuevo (con los obligatorios)"""
+    if current is not None:
+        return {**current, **patch}
+    missing = [field for field in required if field not in patch]
+    if missing:
+        raise ValueError(f"{name} no existe: para agregarlo hacen falta {', '.join(missing)}")
+    return dict(patch)
+
+
+def apply_catalog_delta(data: Dict[str, Any], delta: Dict[str, Any]
+                        ) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[str], Dict[str, Any]]:
+    """Aplica un delta validado sin modificar data
+
+    Retorna (data nueva, productos agregados o modificados ya completos, SKUs borrados, resumen).
+    Los productos modificados conservan su lugar en el catálogo y los nuevos van al final.
+    Borrar un SKU o un descuento que no existe no es un error (el request se puede reintentar).
+    """
+    catalog = data.get('catalog', [])
+    positions = {product.get('sku'): i for i, product in enumerate(catalog)}
+
+    new_catalog = list(catalog)
+    upserts = []
+    added = 0
+    for patch in delta["upsert"]:
+        i = positions.get(patch['sku'])
+        product = _merge(catalog[i] if i is not None else None, patch, REQUIRED_PRODUCT_FIELDS,
+                         f"SKU {patch['sku']}")
+        if i is None:
+            new_catalog.append(product)
+            added += 1
+        else:
+            new_catalog[i] = product
+        upserts.append(product)
+
+    deletes = [sku for sku in delta["delete"] if sku in positions]
+    if deletes:
+        deleted = set(deletes)
+        new_catalog = [product for product in new_catalog if product.get('sku') not in deleted]
+
+    new_data = {**data, 'catalog': new_catalog}
+
+    discounts_delta = delta["discounts"]
+    discount_changes = 0
+    if discounts_delta["upsert"] or discounts_delta["delete"]:
+        payments = data.get('payments') or {}
+        discounts = list(payments.get('discounts', []))
+        by_key = {discount.get('key'): i for i, discount in enumerate(discounts)}
+        for patch in discounts_delta["upsert"]:
+            i = by_key.get(patch['key'])
+            discount = _merge(discounts[i] if i is not None else None, patch, REQUIRED_DISCOUNT_FIELDS,
+                              f"El descuento {patch['key']}")
+            if i is None:
+                by_key[patch['key']] = len(discounts)
+                discounts.append(discount)
+            else:
+                discounts[i] = discount
+            discount_changes += 1
+        removed = set(discounts_delta["delete"]) & set(by_key)
+        discounts = [discount for discount in discounts if discount.get('key') not in removed]
+        discount_changes += len(removed)
+        new_data['payments'] = {**payments, 'discounts': discounts}
+
+    summary = {
+        "updated": len(upserts) - added,
+        "added": added,
+        "deleted": len(deletes),
+        "discounts_changed": discount_changes,
+        "products": len(new_catalog)
+    }
+    return new_data, upserts, deletes, summary
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Índice invertido del catálogo
+Selecciona los productos relevantes para cada mensaje del cliente
+"""
+
+import re
+import math
+import unicodedata
+from typing import Dict, Any, Iterable, List, Optional
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Palabras sin valor para la búsqueda (español e inglés)
+STOPWORDS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los', 'me', 'mi',
+    'o', 'para', 'por', 'que', 'se', 'su', 'te', 'tu', 'un', 'una', 'uno', 'y', 'hay',
+    'tienen', 'tenes', 'tiene', 'quiero', 'quisiera', 'cuanto', 'cuesta', 'sale', 'precio',
+    'hola', 'buenas', 'buenos', 'dias', 'gracias', 'favor',
+    'an', 'and', 'any', 'do', 'for', 'have', 'how', 'i', 'is', 'it', 'much', 'of', 'on',
+    'or', 'the', 'to', 'want', 'what', 'with', 'you', 'your', 'price', 'hello', 'hi', 'thanks'
+}
+
+# Grupos de sinónimos: todas las palabras de un grupo se indexan con el mismo término
+SYNONYM_GROUPS = [
+    ['pollo', 'chicken', 'pata', 'muslo'],
+    ['carne', 'meat', 'beef', 'vacuna'],
+    ['cordero', 'lamb'],
+    ['pescado', 'fish', 'marisco', 'seafood'],
+    ['langostino', 'shrimp', 'prawn', 'gamba'],
+    ['salmon'],
+    ['vegetariano', 'vegetarian', 'veggie', 'verdura', 'vegetable'],
+    ['vegano', 'vegan'],
+    ['tacc', 'celiaco', 'celiac', 'gluten', 'glutenfree'],
+    ['postre', 'dessert', 'dulce', 'sweet'],
+    ['guarnicion', 'side', 'acompanamiento'],
+    ['principal', 'main', 'plato', 'dish', 'dishes'],
+    ['pasta', 'sorrentino', 'ravioli'],
+    ['arroz', 'arroces', 'rice'],
+    ['papa', 'potato', 'papine'],
+    ['pure', 'mashed'],
+    ['hongo', 'mushroom', 'champinon'],
+    ['torta', 'cake', 'pie'],
+    ['guiso', 'stew', 'cuchara', 'soup', 'sopa'],
+    ['calabaza', 'pumpkin', 'squash'],
+    ['limon', 'lemon', 'lime'],
+    ['chocolate', 'choco', 'chocotorta'],
+]
+
+# Peso de cada campo del producto en el score
+FIELD_WEIGHTS = {
+    'sku': 3.0,
+    'title': 2.0,
+    'tags': 1.5,
+    'segment': 1.5,
+    'category': 1.0
+}
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas sin acentos (insensible a tildes y ñ)"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _stem(token: str) -> str:
+    """Stemming mínimo de plurales en español e inglés"""
+    if len(token) > 5 and token.endswith('ones'):
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+_SYNONYMS: Dict[str, str] = {}
+for _group in SYNONYM_GROUPS:
+    for _word in _group:
+        _SYNONYMS[_stem(_word)] = _group[0]
+
+
+def tokenize(text: str) -> List[str]:
+    """Convierte un texto en términos canónicos (sin acentos, stemmed, con sinónimos)"""
+    terms = []
+    for token in TOKEN_RE.findall(normalize_text(text)):
+        if token in STOPWORDS or len(token) < 2:
+            continue
+        stemmed = _stem(token)
+        terms.append(_SYNONYMS.get(stemmed, stemmed))
+    return terms
+
+
+def product_terms(product: Dict[str, Any]) -> Dict[str, float]:
+    """Términos de un producto con el peso del campo más importante donde aparecen"""
+    attrs = product.get('attrs') or {}
+    fields = {
+        'sku': product.get('sku') or '',
+        'title': product.get('title') or '',
+        'category': attrs.get('category') or '',
+        'segment': attrs.get('segment') or '',
+        'tags': ' '.join(attrs.get('tags') or [])
+    }
+    terms: Dict[str, float] = {}
+    for field, text in fields.items():
+        for term in set(tokenize(text.replace('-', ' '))):
+            terms[term] = max(terms.get(term, 0.0), FIELD_WEIGHTS[field])
+    return terms
+
+
+class CatalogIndex:
+    """Índice invertido sobre sku, título, categoría, segmento y tags
+
+    Cada producto ocupa un slot; patched() arma un índice nuevo tocando solo los productos
+    cambiados (los borrados dejan el slot vacío) y comparte el resto con el índice original.
+    """
+
+    # Con más slots vacíos que productos, patched() reconstruye el índice compacto
+    MAX_EMPTY_RATIO = 1.0
+
+    def __init__(self, catalog: List[Dict[str, Any]]):
+        self.products: List[Optional[Dict[str, Any]]] = list(catalog)
+        self.skus: List[Optional[str]] = [product.get('sku') for product in catalog]
+        self.live = len(catalog)
+        self._positions = {sku: i for i, sku in enumerate(self.skus) if sku}
+        self._sku_lookup = {normalize_text(sku): i for i, sku in enumerate(self.skus) if sku}
+        # Pesos por campo sin idf: el idf depende del total de productos y se aplica al buscar
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._categories: Optional[List[Dict[str, Any]]] = None
+
+        for i, product in enumerate(catalog):
+            for term, weight in product_terms(product).items():
+                self._postings.setdefault(term, {})[i] = weight
+
+    def patched(self, upserts: List[Dict[str, Any]], deletes: Iterable[str]) -> 'CatalogIndex':
+        """Índice nuevo con los productos reemplazados/agregados y los SKUs borrados
+
+        No modifica este índice (lo pueden estar usando requests en curso): copia solo los
+        diccionarios de los términos afectados. Los productos nuevos van al final, como en el catálogo.
+        """
+        index = CatalogIndex.__new__(CatalogIndex)
+        index.products = list(self.products)
+        index.skus = list(self.skus)
+        index.live = self.live
+        index._positions = dict(self._positions)
+        index._sku_lookup = dict(self._sku_lookup)
+        index._postings = dict(self._postings)
+        index._categories = None
+        copied = set()
+
+        def postings_for(term: str) -> Dict[int, float]:
+            if term not in copied:
+                copied.add(term)
+                index._postings[term] = dict(index._postings.get(term, {}))
+            return index._postings[term]
+
+        def remove(i: int):
+            for term in product_terms(index.products[i]):
+                weights = postings_for(term)
+                weights.pop(i, None)
+                if not weights:
+                    del index._postings[term]
+                    copied.discard(term)
+
+        for sku in deletes:
+            i = index._positions.pop(sku, None)
+            if i is None:
+                continue
+            remove(i)
+            key = normalize_text(sku)
+            if index._sku_lookup.get(key) == i:
+                del index._sku_lookup[key]
+            index.products[i] = None
+            index.skus[i] = None
+            index.live -= 1
+
+        for product in upserts:
+            sku = product['sku']
+            i = index._positions.get(sku)
+            if i is None:
+                i = len(index.products)
+                index.products.append(product)
+                index.skus.append(sku)
+                index._positions[sku] = i
+                index._sku_lookup.setdefault(normalize_text(sku), i)
+                index.live += 1
+            else:
+                remove(i)
+                index.products[i] = product
+            for term, weight in product_terms(product).items():
+                postings_for(term)[i] = weight
+
+        if len(index.products) - index.live > index.live * self.MAX_EMPTY_RATIO:
+            return CatalogIndex([product for product in index.products if product is not None])
+        return index
+
+    def search(self, message: str, top_n: int = 8, min_ratio: float = 0.35) -> List[str]:
+        """Retorna los SKUs más relevantes para el mensaje (vacío si nada coincide)
+
+        Se descartan los productos cuyo score sea menor a min_ratio del mejor resultado.
+        """
+        if not message:
+            return []
+
+        scores: Dict[int, float] = {}
+
+        # Coincidencia exacta de SKU
+        for word in normalize_text(message).split():
+            i = self._sku_lookup.get(word.strip('.,;:!?¿¡()'))
+            if i is not None:
+                scores[i] = scores.get(i, 0.0) + 100.0
+
+        # Ponderar por rareza del término (idf) para que "plato" pese menos que "salmon"
+        total = max(self.live, 1)
+        for term in set(tokenize(message)):
+            weights = self._postings.get(term)
+            if not weights:
+                continue
+            idf = math.log(1 + total / len(weights))
+            for i, weight in weights.items():
+                scores[i] = scores.get(i, 0.0) + weight * idf
+
+        if not scores:
+            return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        threshold = ranked[0][1] * min_ratio
+        return [self.skus[i] for i, score in ranked[:top_n] if score >= threshold]
+
+    def categories(self) -> List[Dict[str, Any]]:
+        """Resumen por categoría: cantidad, segmentos y precio mínimo (calculado una vez por índice)"""
+        if self._categories is None:
+            self._categories = self._summarize_categories()
+        return self._categories
+
+    def _summarize_categories(self) -> List[Dict[str, Any]]:
+        summary: Dict[str, Dict[str, Any]] = {}
+        for product in self.products:
+            if product is None:
+                continue
+            attrs = product.get('attrs') or {}
+            category = attrs.get('category') or 'Otros'
+            entry = summary.setdefault(category, {
+                'category': category,
+                'count': 0,
+                'segments': [],
+                'min_price': None
+            })
+            entry['count'] += 1
+            segment = attrs.get('segment')
+            if segment and segment not in entry['segments']:
+                entry['segments'].append(segment)
+            price = product.get('price')
+            if price is not None and (entry['min_price'] is None or price < entry['min_price']):
+                entry['min_price'] = price
+        return list(summary.values())
@@ -7,10 +7,19 @@ Monitorea tokens, costos y uso acumulado
 import os
 import json
 import time
+import atexit
+import threading
+from collections import deque
 from datetime import datetime, date
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
+from usage_writer import BatchedUsageWriter, migrate_json_log
+from usage_store import UsageStore, GRANULARITIES
+from usage_log import UsageLog
+
+# Descuento del proveedor sobre los tokens de prompt servidos desde su cache de prefijos
+CACHED_INPUT_DISCOUNT = 0.5
 
 @dataclass
 class TokenUsage:
@@ -22,6 +31,12 @@ class TokenUsage:
     timestamp: str = ""
     model: str = ""
     request_id: str = ""
+    cache_hit: bool = False
+    latency_ms: Optional[float] = None
+    estimated_input_tokens: Optional[int] = None
+    raw_estimated_input_tokens: Optional[int] = None
+    cached_input_tokens: int = 0
+    prompt_prefix_hash: Optional[str] = None
 
 @dataclass
 class DailyStats:
@@ -32,15 +47,23 @@ class DailyStats:
     total_output_tokens: int = 0
     total_cost_usd: float = 0.0
     models_used: Dict[str, int] = None
+    cache_hits: int = 0
+    cached_input_tokens: int = 0
+    cache_savings_usd: float = 0.0
 
 class GroqDebugTracker:
     """Tracker principal para debug de Groq API"""
     
-    def __init__(self, debug_mode: bool = False, save_to_file: bool = True):
+    def __init__(self, debug_mode: bool = False, save_to_file: bool = True,
+                 batch_size: int = 100, flush_interval: float = 1.0, recent_size: int = 1000):
         self.debug_mode = debug_mode
         self.save_to_file = save_to_file
         self.daily_stats_file = "debug_data/daily_stats.json"
-        self.usage_log_file = "debug_data/usage_log.json"
+        self.usage_log_file = "debug_data/usage_log.jsonl"
+        self.usage_index_file = "debug_data/usage_log.idx"
+        self.usage_models_file = "debug_data/usage_log.models"
+        self.legacy_usage_log_file = "debug_data/usage_log.json"
+        self.usage_db_file = "debug_data/usage.db"
         
         # Precios por millón de tokens (USD) - basado en Groq pricing
         self.pricing = {
@@ -64,60 +87,175 @@ class GroqDebugTracker:
         # Crear directorio de debug si no existe
         Path("debug_data").mkdir(exist_ok=True)
         
-        # Cargar estadísticas existentes
-        self.daily_stats = self._load_daily_stats()
-        self.usage_log = self._load_usage_log()
+        # Migrar el log en formato JSON (lista) a JSON Lines
+        self._migrate_usage_log()
+        
+        # Contadores compartidos entre threads y procesos (en memoria si no se guarda a disco)
+        self.store = UsageStore(
+            self.usage_db_file if self.save_to_file else f"file:groq_debug_{id(self)}?mode=memory&cache=shared"
+        )
+        self._import_daily_stats()
+        
+        # Log completo en disco con índice; en memoria solo los últimos registros
+        self.log = self._open_usage_log()
+        self.usage_log = deque(maxlen=recent_size)
+        if self.log is not None:
+            self.usage_log.extend(self.log.query(limit=recent_size)[0])
+        self._lock = threading.Lock()
+        
+        # El log de uso y los rollups se escriben por lotes en un thread aparte
+        self.writer = None
+        if self.debug_mode:
+            self.writer = BatchedUsageWriter(
+                usage_log=self.log,
+                store=self.store,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                on_error=lambda e: print(f"⚠️ Error guardando datos de debug: {e}")
+            )
+            atexit.register(self.close)
         
         if self.debug_mode:
             print("🔍 DEBUG MODE ACTIVADO - GroqDebugTracker iniciado")
     
-    def _load_daily_stats(self) -> Dict[str, DailyStats]:
-        """Carga estadísticas diarias desde archivo"""
+    def _migrate_usage_log(self):
+        """Convierte un usage_log.json existente al formato append-only"""
+        if not self.save_to_file:
+            return
         try:
-            if os.path.exists(self.daily_stats_file):
-                with open(self.daily_stats_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    return {date: DailyStats(**stats) for date, stats in data.items()}
+            migrated = migrate_json_log(self.legacy_usage_log_file, self.usage_log_file)
+            if migrated and self.debug_mode:
+                print(f"🔍 Usage log migrado a JSON Lines: {migrated:,} registros")
         except Exception as e:
             if self.debug_mode:
-                print(f"⚠️ Error cargando daily stats: {e}")
-        return {}
+                print(f"⚠️ Error migrando usage log: {e}")
     
-    def _load_usage_log(self) -> list:
-        """Carga log de uso desde archivo"""
+    def _import_daily_stats(self):
+        """Importa una sola vez el daily_stats.json histórico a la base de contadores"""
+        if not self.save_to_file or not os.path.exists(self.daily_stats_file):
+            return
+        
         try:
-            if os.path.exists(self.usage_log_file):
-                with open(self.usage_log_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            with open(self.daily_stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            rows = []
+            for day, stats in data.items():
+                daily = DailyStats(**stats)
+                models = daily.models_used or {"unknown": daily.total_requests}
+                total_requests = max(sum(models.values()), 1)
+                remaining = {"input": daily.total_input_tokens, "output": daily.total_output_tokens}
+                
+                # El formato viejo no separa tokens por modelo: se reparten según los requests
+                for i, (model, count) in enumerate(models.items()):
+                    last = i == len(models) - 1
+                    share = count / total_requests
+                    input_tokens = remaining["input"] if last else int(daily.total_input_tokens * share)
+                    output_tokens = remaining["output"] if last else int(daily.total_output_tokens * share)
+                    remaining["input"] -= input_tokens
+                    remaining["output"] -= output_tokens
+                    rows.append({
+                        "period": day,
+                        "model": model,
+                        "requests": count,
+                        "input_tokens": input_tokens,
+                        "output_tokens": output_tokens,
+                        "cost_usd": daily.total_cost_usd * share,
+                        "cache_hits": daily.cache_hits if last else 0
+                    })
+            
+            if self.store.import_once("daily_stats_json", rows) and self.debug_mode:
+                print(f"🔍 Daily stats importadas a {self.usage_db_file}: {len(data)} días")
         except Exception as e:
             if self.debug_mode:
-                print(f"⚠️ Error cargando usage log: {e}")
-        return []
+                print(f"⚠️ Error importando daily stats: {e}")
     
-    def _save_daily_stats(self):
-        """Guarda estadísticas diarias a archivo"""
+    def _open_usage_log(self) -> Optional[UsageLog]:
+        """Abre el log de uso e indexa los registros que falten (ej. un log recién migrado)"""
         if not self.save_to_file:
-            return
-            
+            return None
         try:
-            with open(self.daily_stats_file, 'w', encoding='utf-8') as f:
-                json.dump({date: asdict(stats) for date, stats in self.daily_stats.items()}, 
-                         f, indent=2, ensure_ascii=False)
+            return UsageLog(self.usage_log_file, self.usage_index_file, self.usage_models_file)
         except Exception as e:
             if self.debug_mode:
-                print(f"⚠️ Error guardando daily stats: {e}")
+                print(f"⚠️ Error abriendo usage log: {e}")
+        return None
     
-    def _save_usage_log(self):
-        """Guarda log de uso a archivo"""
-        if not self.save_to_file:
-            return
-            
+    def _persist(self, entry: Dict[str, Any]):
+        """Encola el registro de uso para el writer en segundo plano"""
+        if self.writer is not None and self.log is not None:
+            self.writer.append(entry)
+    
+    def _flush(self):
+        """Espera lo que este proceso tiene encolado antes de leer los rollups
+        
+        Lo de otros workers puede llegar hasta flush_interval más tarde.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+    
+    def close(self):
+        """Vacía la cola de escritura y hace fsync de los archivos"""
+        if self.writer is not None:
+            self.writer.close()
+    
+    def after_fork(self):
+        """Reinicia en un worker lo que no sobrevive a un fork: locks, descriptores del log y el writer
+        
+        Los contadores viven en SQLite (conexiones por PID) y los registros recientes en memoria
+        se heredan tal cual.
+        """
+        self._lock = threading.Lock()
+        if self.log is not None:
+            self.log.reopen()
+        if self.writer is not None:
+            self.writer.after_fork()
+    
+    def query_usage_log(self, since: float = None, until: float = None, model: str = None,
+                        cursor: int = None, limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Consulta el log de uso por rango de fechas (epoch), modelo y cursor
+        
+        Retorna (registros, próximo cursor). Sin log en disco se filtran los registros recientes.
+        """
+        if self.log is not None:
+            self._flush()
+            return self.log.query(since=since, until=until, model=model, cursor=cursor, limit=limit)
+        
+        with self._lock:
+            recent = list(self.usage_log)
+        
+        def matches(entry: Dict[str, Any]) -> bool:
+            ts = datetime.fromisoformat(entry["timestamp"]).timestamp()
+            return not ((model and entry.get("model") != model) or (since is not None and ts < since)
+                        or (until is not None and ts > until))
+        
+        if cursor is None and since is None:
+            return [entry for entry in recent if matches(entry)][-limit:], None
+        
+        entries = []
+        position = cursor or 0
+        while position < len(recent) and len(entries) < limit:
+            if matches(recent[position]):
+                entries.append(recent[position])
+            position += 1
+        return entries, position if position < len(recent) else None
+    
+    def load_token_scales(self) -> Dict[str, float]:
+        """Escalas de calibración del estimador de tokens guardadas en la base compartida"""
+        try:
+            return json.loads(self.store.get_meta("token_scales") or '{}')
+        except Exception as e:
+            if self.debug_mode:
+                print(f"⚠️ Error leyendo calibración de tokens: {e}")
+            return {}
+    
+    def save_token_scales(self, scales: Dict[str, float]):
+        """Guarda las escalas de calibración del estimador de tokens"""
         try:
-            with open(self.usage_log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.usage_log, f, indent=2, ensure_ascii=False)
+            self.store.set_meta("token_scales", json.dumps(scales))
         except Exception as e:
             if self.debug_mode:
-                print(f"⚠️ Error guardando usage log: {e}")
+                print(f"⚠️ Error guardando calibración de tokens: {e}")
     
     def _get_model_pricing(self, model: str) -> Dict[str, float]:
         """Obtiene precios para un modelo específico"""
@@ -131,83 +269,215 @@ class GroqDebugTracker:
         # Default pricing si no se encuentra
         return {"input": 0.50, "output": 0.50}
     
+    def calculate_cost(self, model: str, input_tokens: int, output_tokens: int,
+                       cached_input_tokens: int = 0) -> Tuple[float, float]:
+        """Costo en USD de una llamada y lo ahorrado por los tokens de prompt cacheados"""
+        pricing = self._get_model_pricing(model)
+        cached_price = pricing.get("cached_input", pricing["input"] * (1 - CACHED_INPUT_DISCOUNT))
+        cached_input_tokens = min(cached_input_tokens, input_tokens)
+        cost = ((input_tokens - cached_input_tokens) * pricing["input"]
+                + cached_input_tokens * cached_price
+                + output_tokens * pricing["output"]) / 1_000_000
+        savings = cached_input_tokens * (pricing["input"] - cached_price) / 1_000_000
+        return cost, savings
+    
     def track_request(self, model: str, input_tokens: int, output_tokens: int, 
-                     request_id: str = None) -> TokenUsage:
+                     request_id: str = None, latency_ms: float = None,
+                     estimated_input_tokens: int = None, raw_estimated_input_tokens: int = None,
+                     cached_input_tokens: int = 0, prompt_prefix_hash: str = None) -> TokenUsage:
         """Registra una nueva solicitud a Groq"""
         if not self.debug_mode:
             return TokenUsage()
         
-        # Calcular costo
-        pricing = self._get_model_pricing(model)
-        input_cost = (input_tokens / 1_000_000) * pricing["input"]
-        output_cost = (output_tokens / 1_000_000) * pricing["output"]
-        total_cost = input_cost + output_cost
+        # Calcular costo (con descuento para los tokens de prompt cacheados)
+        total_cost, cache_savings = self.calculate_cost(model, input_tokens, output_tokens, cached_input_tokens)
         
         # Crear registro de uso
+        now = datetime.now()
         usage = TokenUsage(
             input_tokens=input_tokens,
             output_tokens=output_tokens,
             total_tokens=input_tokens + output_tokens,
             cost_usd=total_cost,
-            timestamp=datetime.now().isoformat(),
+            timestamp=now.isoformat(),
             model=model,
-            request_id=request_id or f"req_{int(time.time())}"
+            request_id=request_id or f"req_{int(time.time())}",
+            latency_ms=latency_ms,
+            estimated_input_tokens=estimated_input_tokens,
+            raw_estimated_input_tokens=raw_estimated_input_tokens,
+            cached_input_tokens=cached_input_tokens,
+            prompt_prefix_hash=prompt_prefix_hash
         )
         
-        # Actualizar estadísticas diarias
-        today = date.today().isoformat()
-        if today not in self.daily_stats:
-            self.daily_stats[today] = DailyStats(
-                date=today,
-                models_used={}
-            )
-        
-        daily = self.daily_stats[today]
-        daily.total_requests += 1
-        daily.total_input_tokens += input_tokens
-        daily.total_output_tokens += output_tokens
-        daily.total_cost_usd += total_cost
+        entry = asdict(usage)
         
-        if model not in daily.models_used:
-            daily.models_used[model] = 0
-        daily.models_used[model] += 1
+        # Rollups por hora/día/mes e histogramas: el writer los suma en una transacción por lote
+        self.writer.record(
+            when=now,
+            model=model,
+            requests=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost_usd=total_cost,
+            cached_input_tokens=cached_input_tokens,
+            cache_savings_usd=cache_savings,
+            latency_ms=latency_ms,
+            # Error de la estimación local de tokens de prompt contra lo que reportó Groq
+            estimate_error_pct=abs(estimated_input_tokens - input_tokens) / input_tokens * 100
+            if estimated_input_tokens is not None and input_tokens else None
+        )
         
         # Agregar al log
-        self.usage_log.append(asdict(usage))
+        with self._lock:
+            self.usage_log.append(entry)
         
-        # Guardar datos
-        self._save_daily_stats()
-        self._save_usage_log()
+        # Guardar datos (en segundo plano)
+        self._persist(entry)
         
         if self.debug_mode:
             print(f"🔍 TRACKED: {model} | Input: {input_tokens:,} | Output: {output_tokens:,} | Cost: ${total_cost:.6f}")
         
         return usage
     
-    def get_daily_summary(self, target_date: str = None) -> Dict[str, Any]:
-        """Obtiene resumen de un día específico"""
-        if not target_date:
-            target_date = date.today().isoformat()
+    def track_cache_hit(self, model: str, request_id: str = None) -> TokenUsage:
+        """Registra una respuesta servida desde el cache (sin tokens ni costo)"""
+        if not self.debug_mode:
+            return TokenUsage()
         
-        if target_date not in self.daily_stats:
-            return {"error": "No hay datos para esa fecha"}
+        now = datetime.now()
+        usage = TokenUsage(
+            timestamp=now.isoformat(),
+            model=model,
+            request_id=request_id or f"req_{int(time.time())}",
+            cache_hit=True
+        )
+        
+        entry = asdict(usage)
+        
+        self.writer.record(when=now, model=model, cache_hits=1)
+        
+        with self._lock:
+            self.usage_log.append(entry)
+        
+        self._persist(entry)
+        
+        print(f"🔍 CACHE HIT: {model} | Tokens: 0 | Cost: $0.000000")
+        
+        return usage
+    
+    def track_batch(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra los totales de un lote de /chat/batch o batch_runner.py
+        
+        Cada request del lote ya se registró con track_request; acá queda el agregado del lote.
+        """
+        if not self.debug_mode:
+            return batch
         
-        daily = self.daily_stats[target_date]
+        batch = {**batch, "created": time.time()}
+        self.store.add_batch(batch)
+        
+        print(f"🔍 BATCH: {batch['id']} | {batch['items']:,} ítems ({batch['errors']:,} errores) | "
+              f"Tokens: {batch['input_tokens'] + batch['output_tokens']:,} | Cost: ${batch['cost_usd']:.6f}")
+        
+        return batch
+    
+    def track_route(self, tier: str, intent: str, latency_ms: float, cost_usd: float = 0.0,
+                    savings_usd: float = 0.0):
+        """Registra el tier elegido por el router para un request, su latencia y el ahorro contra el modelo grande
+        
+        Los tokens y el costo de la llamada a Groq ya se registraron con track_request.
+        """
+        if not self.debug_mode:
+            return
+        
+        # Se suma en la misma transacción por lote que los rollups de uso
+        self.writer.record_route(when=datetime.now(), tier=tier, latency_ms=latency_ms, cost_usd=cost_usd,
+                                 savings_usd=savings_usd)
+        
+        print(f"🔍 ROUTE: {tier} ({intent}) | {latency_ms:.1f} ms | Cost: ${cost_usd:.6f} | Ahorro: ${savings_usd:.6f}")
+    
+    def get_batches(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Totales de los últimos lotes"""
+        return self.store.batches(limit)
+    
+    def _period_stats(self, granularity: str, period_prefix: str = None) -> Dict[str, DailyStats]:
+        """Estadísticas por período leídas de los rollups compartidos (todos los workers)"""
+        period_stats: Dict[str, DailyStats] = {}
+        for row in self.store.rows(granularity, period_prefix):
+            stats = period_stats.get(row["period"])
+            if stats is None:
+                stats = period_stats[row["period"]] = DailyStats(date=row["period"], models_used={})
+            stats.total_requests += row["requests"]
+            stats.total_input_tokens += row["input_tokens"]
+            stats.total_output_tokens += row["output_tokens"]
+            stats.total_cost_usd += row["cost_usd"]
+            stats.cache_hits += row["cache_hits"]
+            stats.cached_input_tokens += row["cached_input_tokens"]
+            stats.cache_savings_usd += row["cache_savings_usd"]
+            if row["requests"]:
+                stats.models_used[row["model"]] = stats.models_used.get(row["model"], 0) + row["requests"]
+        return period_stats
+    
+    def _daily_stats(self, period_prefix: str = None) -> Dict[str, DailyStats]:
+        """Estadísticas por día"""
+        return self._period_stats('day', period_prefix)
+    
+    @property
+    def daily_stats(self) -> Dict[str, DailyStats]:
+        """Estadísticas de todos los días"""
+        self._flush()
+        return self._daily_stats()
+    
+    @staticmethod
+    def _format_totals(data: Dict[str, Any]) -> Dict[str, str]:
         return {
-            "date": daily.date,
-            "total_requests": daily.total_requests,
-            "total_input_tokens": daily.total_input_tokens,
-            "total_output_tokens": daily.total_output_tokens,
-            "total_cost_usd": daily.total_cost_usd,
-            "models_used": daily.models_used,
-            "formatted": {
-                "input_tokens": f"{daily.total_input_tokens:,}",
-                "output_tokens": f"{daily.total_output_tokens:,}",
-                "total_tokens": f"{daily.total_input_tokens + daily.total_output_tokens:,}",
-                "cost_usd": f"${daily.total_cost_usd:.6f}"
-            }
+            "input_tokens": f"{data['total_input_tokens']:,}",
+            "output_tokens": f"{data['total_output_tokens']:,}",
+            "total_tokens": f"{data['total_input_tokens'] + data['total_output_tokens']:,}",
+            "cost_usd": f"${data['total_cost_usd']:.6f}",
+            "cached_input_tokens": f"{data['cached_input_tokens']:,}",
+            "cache_savings_usd": f"${data['cache_savings_usd']:.6f}"
         }
     
+    def _period_summary(self, granularity: str, period: str, label: str) -> Dict[str, Any]:
+        """Resumen de un período leyendo una fila de rollup por modelo"""
+        self._flush()
+        stats = self._period_stats(granularity, period).get(period)
+        routing = self.store.routes(granularity, period)
+        if stats is None:
+            # Un período con solo respuestas fijas no tiene filas de uso de Groq
+            if not routing:
+                return {"error": "No hay datos para esa fecha"}
+            stats = DailyStats(date=period, models_used={})
+        
+        data = {
+            label: stats.date,
+            "total_requests": stats.total_requests,
+            "total_input_tokens": stats.total_input_tokens,
+            "total_output_tokens": stats.total_output_tokens,
+            "total_cost_usd": stats.total_cost_usd,
+            "models_used": stats.models_used,
+            "cache_hits": stats.cache_hits,
+            "cached_input_tokens": stats.cached_input_tokens,
+            "cache_savings_usd": stats.cache_savings_usd,
+            "percentiles": self.store.percentiles(granularity, period),
+            "routing": routing
+        }
+        data["formatted"] = self._format_totals(data)
+        return data
+    
+    def get_hourly_summary(self, target_hour: str = None) -> Dict[str, Any]:
+        """Obtiene resumen de una hora (formato YYYY-MM-DDTHH)"""
+        if not target_hour:
+            target_hour = datetime.now().strftime(GRANULARITIES['hour'])
+        return self._period_summary('hour', target_hour, 'hour')
+    
+    def get_daily_summary(self, target_date: str = None) -> Dict[str, Any]:
+        """Obtiene resumen de un día específico"""
+        if not target_date:
+            target_date = date.today().isoformat()
+        return self._period_summary('day', target_date, 'date')
+    
     def get_monthly_summary(self, year: int = None, month: int = None) -> Dict[str, Any]:
         """Obtiene resumen mensual"""
         if not year:
@@ -216,77 +486,69 @@ class GroqDebugTracker:
             month = date.today().month
         
         month_str = f"{year:04d}-{month:02d}"
+        self._flush()
+        stats = self._period_stats('month', month_str).get(month_str) or DailyStats(models_used={})
         
         monthly_data = {
             "year": year,
             "month": month,
-            "total_requests": 0,
-            "total_input_tokens": 0,
-            "total_output_tokens": 0,
-            "total_cost_usd": 0.0,
-            "models_used": {},
-            "daily_breakdown": {}
-        }
-        
-        for date_str, daily in self.daily_stats.items():
-            if date_str.startswith(month_str):
-                monthly_data["total_requests"] += daily.total_requests
-                monthly_data["total_input_tokens"] += daily.total_input_tokens
-                monthly_data["total_output_tokens"] += daily.total_output_tokens
-                monthly_data["total_cost_usd"] += daily.total_cost_usd
-                monthly_data["daily_breakdown"][date_str] = asdict(daily)
-                
-                for model, count in daily.models_used.items():
-                    if model not in monthly_data["models_used"]:
-                        monthly_data["models_used"][model] = 0
-                    monthly_data["models_used"][model] += count
-        
-        # Agregar formato
-        monthly_data["formatted"] = {
-            "input_tokens": f"{monthly_data['total_input_tokens']:,}",
-            "output_tokens": f"{monthly_data['total_output_tokens']:,}",
-            "total_tokens": f"{monthly_data['total_input_tokens'] + monthly_data['total_output_tokens']:,}",
-            "cost_usd": f"${monthly_data['total_cost_usd']:.6f}"
+            "total_requests": stats.total_requests,
+            "total_input_tokens": stats.total_input_tokens,
+            "total_output_tokens": stats.total_output_tokens,
+            "total_cost_usd": stats.total_cost_usd,
+            "models_used": stats.models_used,
+            "cache_hits": stats.cache_hits,
+            "cached_input_tokens": stats.cached_input_tokens,
+            "cache_savings_usd": stats.cache_savings_usd,
+            "percentiles": self.store.percentiles('month', month_str),
+            "routing": self.store.routes('month', month_str),
+            "daily_breakdown": {
+                date_str: asdict(daily) for date_str, daily in self._daily_stats(month_str).items()
+            }
         }
+        monthly_data["formatted"] = self._format_totals(monthly_data)
         
         return monthly_data
     
     def get_total_summary(self) -> Dict[str, Any]:
-        """Obtiene resumen total de todo el tiempo"""
+        """Obtiene resumen total de todo el tiempo (suma de los rollups mensuales)"""
+        self._flush()
         total_data = {
             "total_requests": 0,
             "total_input_tokens": 0,
             "total_output_tokens": 0,
             "total_cost_usd": 0.0,
             "models_used": {},
-            "days_active": len(self.daily_stats),
+            "cache_hits": 0,
+            "cached_input_tokens": 0,
+            "cache_savings_usd": 0.0,
+            "days_active": 0,
             "first_request": None,
-            "last_request": None
+            "last_request": None,
+            "percentiles": self.store.percentiles('month'),
+            "routing": self.store.routes('month')
         }
         
-        dates = sorted(self.daily_stats.keys())
-        if dates:
-            total_data["first_request"] = dates[0]
-            total_data["last_request"] = dates[-1]
-        
-        for daily in self.daily_stats.values():
-            total_data["total_requests"] += daily.total_requests
-            total_data["total_input_tokens"] += daily.total_input_tokens
-            total_data["total_output_tokens"] += daily.total_output_tokens
-            total_data["total_cost_usd"] += daily.total_cost_usd
+        days_active, first_day, last_day = self.store.day_span()
+        total_data["days_active"] = days_active
+        total_data["first_request"] = first_day
+        total_data["last_request"] = last_day
+        
+        for monthly in self._period_stats('month').values():
+            total_data["total_requests"] += monthly.total_requests
+            total_data["total_input_tokens"] += monthly.total_input_tokens
+            total_data["total_output_tokens"] += monthly.total_output_tokens
+            total_data["total_cost_usd"] += monthly.total_cost_usd
+            total_data["cache_hits"] += monthly.cache_hits
+            total_data["cached_input_tokens"] += monthly.cached_input_tokens
+            total_data["cache_savings_usd"] += monthly.cache_savings_usd
             
-            for model, count in daily.models_used.items():
+            for model, count in monthly.models_used.items():
                 if model not in total_data["models_used"]:
                     total_data["models_used"][model] = 0
                 total_data["models_used"][model] += count
         
-        # Agregar formato
-        total_data["formatted"] = {
-            "input_tokens": f"{total_data['total_input_tokens']:,}",
-            "output_tokens": f"{total_data['total_output_tokens']:,}",
-            "total_tokens": f"{total_data['total_input_tokens'] + total_data['total_output_tokens']:,}",
-            "cost_usd": f"${total_data['total_cost_usd']:.6f}"
-        }
+        total_data["formatted"] = self._format_totals(total_data)
         
         return total_data
     
@@ -299,7 +561,10 @@ class GroqDebugTracker:
         print("🔍 GROQ DEBUG TRACKER - RESUMEN")
         print("="*60)
         
-        if summary_type == "today":
+        if summary_type == "hour":
+            data = self.get_hourly_summary()
+            print(f"📅 Hora: {data.get('hour', 'Actual')}")
+        elif summary_type == "today":
             data = self.get_daily_summary()
             print(f"📅 Fecha: {data.get('date', 'Hoy')}")
         elif summary_type == "month":
@@ -318,16 +583,34 @@ class GroqDebugTracker:
         print(f"📝 Output Tokens: {data['formatted']['output_tokens']}")
         print(f"💎 Total Tokens: {data['formatted']['total_tokens']}")
         print(f"💰 Costo Total: {data['formatted']['cost_usd']}")
+        print(f"♻️ Cache Hits: {data.get('cache_hits', 0):,}")
+        print(f"🧊 Tokens de prompt cacheados: {data['formatted']['cached_input_tokens']} "
+              f"(ahorro {data['formatted']['cache_savings_usd']})")
         
         if data.get('models_used'):
             print("\n🤖 Modelos utilizados:")
             for model, count in data['models_used'].items():
                 print(f"   • {model}: {count} requests")
+                latency = data.get('percentiles', {}).get(model, {}).get('latency_ms')
+                if latency and latency['count']:
+                    print(f"     ⏱️ Latencia p50/p95/p99: {latency['p50']:.0f} / {latency['p95']:.0f} / {latency['p99']:.0f} ms")
+                estimate_error = data.get('percentiles', {}).get(model, {}).get('estimate_error_pct')
+                if estimate_error and estimate_error['count']:
+                    print(f"     📐 Error de estimación de tokens p50/p95: {estimate_error['p50']:.1f}% / {estimate_error['p95']:.1f}%")
+        
+        if data.get('routing'):
+            print("\n🧭 Ruteo por tier:")
+            for tier, route in data['routing'].items():
+                print(f"   • {tier}: {route['requests']:,} requests | {route['avg_latency_ms']:.1f} ms promedio | "
+                      f"${route['cost_usd']:.6f} (ahorro ${route['savings_usd']:.6f})")
         
         print("="*60 + "\n")
 
 # Instancia global del tracker
 debug_tracker = GroqDebugTracker(
     debug_mode=os.getenv('GROQ_DEBUG', 'false').lower() == 'true',
-    save_to_file=os.getenv('GROQ_SAVE_DEBUG', 'true').lower() == 'true'
+    save_to_file=os.getenv('GROQ_SAVE_DEBUG', 'true').lower() == 'true',
+    batch_size=int(os.getenv('GROQ_DEBUG_BATCH_SIZE', '100')),
+    flush_interval=float(os.getenv('GROQ_DEBUG_FLUSH_INTERVAL', '1.0')),
+    recent_size=int(os.getenv('GROQ_DEBUG_RECENT_SIZE', '1000'))
 )
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Configuración de gunicorn para producción
+Un master precarga la app y business.json y forkea N workers con M threads cada uno:
+los workers comparten ese estado copy-on-write y el master los reemplaza sin cortar tráfico
+
+Ejecutar con: gunicorn -c gunicorn.conf.py app:app
+Recargar (business.json, config y workers nuevos sin downtime): kill -HUP <pid del master>
+"""
+
+import gc
+import os
+import time
+import multiprocessing
+
+_started = time.monotonic()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5002')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+# Threads por worker: cada request espera a Groq (o un stream SSE) ocupando uno
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+
+
+def _preload(server, reason: str):
+    """Compila el snapshot del negocio en el master y congela el heap antes de forkear"""
+    import app as chat_app
+    snapshot = chat_app.preload_state()
+    # Objetos fuera del GC: sus refcounts no se tocan en las recolecciones y las páginas
+    # siguen compartidas con los workers
+    gc.freeze()
+    server.log.info(f"📦 {reason}: {snapshot.profile.name} ({snapshot.version}) precargado en "
+                    f"{time.monotonic() - _started:.2f}s | {workers} workers x {threads} threads")
+
+
+def when_ready(server):
+    """Master listo (la app ya está importada con preload_app): precarga antes del primer fork"""
+    _preload(server, "Inicio")
+
+
+def on_reload(server):
+    """SIGHUP: recompila business.json antes de que gunicorn forkee los workers nuevos
+
+    Gunicorn levanta los workers nuevos y después termina los viejos de forma ordenada
+    (terminan los requests en curso), así que no hay corte de tráfico. El código Python
+    no se recarga con preload_app: para un deploy de código usar USR2 + QUIT al master viejo.
+    """
+    import app as chat_app
+    chat_app.business_cache.invalidate()
+    _preload(server, "Reload")
+
+
+def post_fork(server, worker):
+    """En cada worker: threads, locks y descriptores propios"""
+    import app as chat_app
+    chat_app.after_fork()
+
+
+def worker_exit(server, worker):
+    """Vacía el log de uso pendiente del worker antes de salir"""
+    import app as chat_app
+    chat_app.debug_tracker.close()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Histogramas logarítmicos mergeables (estilo HDR)
+Cada valor cae en un bucket de ancho relativo fijo; dos histogramas se combinan sumando conteos
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Error relativo máximo de un percentil: 1%
+RELATIVE_ERROR = 0.01
+_GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Bucket reservado para ceros (tokens o costo 0 en un cache hit)
+ZERO_BUCKET = -(2 ** 31)
+
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_for(value: float) -> int:
+    """Bucket de un valor >= 0"""
+    if value <= 0:
+        return ZERO_BUCKET
+    return math.ceil(math.log(value) / _LOG_GAMMA)
+
+
+def bucket_value(bucket: int) -> float:
+    """Valor representativo de un bucket (error relativo <= RELATIVE_ERROR)"""
+    if bucket == ZERO_BUCKET:
+        return 0.0
+    return 2 * _GAMMA ** bucket / (_GAMMA + 1)
+
+
+def percentiles(buckets: Iterable[Tuple[int, int]],
+                ranks: Iterable[int] = PERCENTILES) -> Dict[str, Optional[float]]:
+    """Percentiles a partir de pares (bucket, conteo); la cantidad de buckets no depende del historial"""
+    ordered: List[Tuple[int, int]] = sorted(buckets)
+    total = sum(count for _, count in ordered)
+    result: Dict[str, Optional[float]] = {"count": total}
+    for rank in ranks:
+        key = f"p{rank}"
+        if not total:
+            result[key] = None
+            continue
+        # Rank más cercano: el valor en la posición ceil(rank% * total)
+        target = max(1, math.ceil(rank / 100 * total))
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen >= target:
+                result[key] = bucket_value(bucket)
+                break
+    return result
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Ruteo de mensajes por intención y complejidad
+Un clasificador local de palabras clave decide, antes de llamar a Groq, si el mensaje se responde
+con un texto armado desde business.json (saludos, envíos, pagos, devoluciones, contacto), con el
+modelo chico o con el modelo grande
+"""
+
+import re
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+from catalog_index import normalize_text
+
+TIERS = ("template", "small", "large")
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Palabras sin contenido: no suman ni restan a la confianza de una intención
+FILLER_WORDS = {
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'es', 'la', 'las', 'lo', 'los', 'me', 'mi', 'o', 'para',
+    'por', 'que', 'se', 'su', 'sus', 'te', 'tu', 'un', 'una', 'y', 'e', 'si', 'no', 'hay', 'tienen', 'tenes',
+    'hacen', 'haces', 'puedo', 'pueden', 'se', 'como', 'donde', 'cuando', 'cual', 'cuales', 'quien', 'ustedes',
+    'vos', 'che', 'consulta', 'consulto', 'pregunta', 'queria', 'quiero', 'quisiera', 'saber', 'info',
+    'informacion', 'sobre', 'estan', 'esta', 'son', 'hola',
+    'an', 'and', 'are', 'can', 'do', 'does', 'for', 'have', 'how', 'i', 'is', 'it', 'my', 'of', 'on', 'or',
+    'the', 'to', 'want', 'what', 'when', 'where', 'which', 'who', 'you', 'your', 'we', 'there', 'any',
+    'um', 'uma', 'os', 'as', 'do', 'da', 'dos', 'das', 'em', 'no', 'na', 'voces', 'voce', 'vc', 'tem',
+    'fazem', 'onde', 'quando', 'qual', 'quero', 'gostaria', 'posso', 'pedido', 'pedidos', 'compra', 'compras',
+    'order', 'orders', 'tudo', 'bem'
+}
+
+# Intenciones que se pueden responder con un texto fijo; las palabras terminadas en '*' son prefijos
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "greeting": [
+        "hola", "holis", "buenas", "buenos", "buen", "dia", "dias", "tardes", "noches", "saludos",
+        "hello", "hi", "hey", "good", "morning", "afternoon", "evening",
+        "oi", "ola", "bom", "boa", "tarde", "noite"
+    ],
+    "thanks": [
+        "gracias", "muchas", "mil", "genial", "perfecto", "buenisimo", "excelente", "dale", "ok", "okay",
+        "listo", "joya", "barbaro", "chau", "adios", "nos", "vemos",
+        "thanks", "thank", "thx", "great", "perfect", "bye", "cool",
+        "obrigado", "obrigada", "valeu", "tchau", "otimo", "beleza"
+    ],
+    "delivery": [
+        "envio*", "envia*", "enviar", "mandan", "entreg*", "delivery", "deliver*", "ship*", "frete",
+        "retir*", "pickup", "pick", "buscar", "busco", "llega*", "zona*", "domicilio", "gratis", "free",
+        "cadete", "cobertura"
+    ],
+    "returns": [
+        "devol*", "devuelv*", "cambio*", "cambiar", "arrepent*", "cancel*", "reembols*", "garantia",
+        "return*", "refund*", "exchange", "troca*", "trocar", "reembolso"
+    ],
+    "payments": [
+        "pago*", "pagar", "pagas", "abonar", "medio*", "metodo*", "tarjeta*", "efectivo", "transferencia*",
+        "mercadopago", "mercado", "cuota*", "descuento*", "debito", "credito", "sin", "interes",
+        "payment*", "pay", "card*", "cash", "transfer", "installment*", "discount*",
+        "pagamento*", "cartao", "parcela*", "desconto*", "pix"
+    ],
+    "contact": [
+        "telefono", "tel", "celular", "whatsapp", "wsp", "wpp", "mail", "email", "correo", "contacto",
+        "contactar*", "comunic*", "instagram", "ig", "llamar", "numero", "direccion", "ubicacion", "ubicados",
+        "local", "phone", "contact", "call", "address", "location", "endereco", "contato", "ligar"
+    ]
+}
+
+# Intenciones sociales: se responden solas o acompañan a una informativa
+SOCIAL_INTENTS = ("greeting", "thanks")
+
+# Consultas de productos o precios: necesitan el catálogo y un modelo
+CATALOG_KEYWORDS = [
+    "precio*", "cuanto", "cuesta*", "sale", "salen", "valor", "stock", "menu", "carta", "plato*",
+    "comida*", "producto*", "vianda*", "price*", "cost*", "much", "available", "food", "dish*",
+    "preco*", "quanto", "custa*", "cardapio", "prato*"
+]
+
+# Pedidos que requieren razonar (comparar, recomendar, armar un pedido): van al modelo grande
+REASONING_KEYWORDS = [
+    "recomend*", "recomiend*", "compar*", "diferencia*", "mejor*", "convien*", "combin*", "armar*",
+    "presupuesto", "personas", "suger*", "elegir", "evento", "porque", "explica*",
+    "recommend*", "compare*", "difference", "better", "best", "suggest*", "budget", "people", "why",
+    "explain*", "recomenda*", "melhor*", "diferenca", "sugest*", "pessoas", "orcamento"
+]
+
+
+class Lexicon:
+    """Palabras exactas y prefijos ('envio*') normalizados para buscar de a una palabra"""
+
+    def __init__(self, entries: Iterable[str]):
+        self.words = set()
+        prefixes = []
+        for entry in entries:
+            entry = normalize_text(entry)
+            if entry.endswith('*'):
+                prefixes.append(entry[:-1])
+            else:
+                self.words.add(entry)
+        self.prefixes = tuple(prefixes)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words or (bool(self.prefixes) and word.startswith(self.prefixes))
+
+
+INTENT_LEXICONS = {intent: Lexicon(words) for intent, words in INTENT_KEYWORDS.items()}
+CATALOG_LEXICON = Lexicon(CATALOG_KEYWORDS)
+REASONING_LEXICON = Lexicon(REASONING_KEYWORDS)
+
+# Textos fijos por idioma (los de envíos, pagos, etc. salen de business.json, en su idioma)
+TEMPLATE_STRINGS: Dict[str, Dict[str, str]] = {
+    "es": {
+        "hello": "¡Hola! 👋",
+        "greeting": "¡Hola! 👋 Soy el asistente de {name}. ¿En qué te puedo ayudar?",
+        "thanks": "¡De nada! 😊",
+        "methods": "💳 Medios de pago: {methods}.",
+        "discount": "• {label}: {percent}% de descuento",
+        "phone": "📞 {value}",
+        "email": "✉️ {value}",
+        "address": "📍 {value}",
+        "instagram": "📷 {value}"
+    },
+    "en": {
+        "hello": "Hi! 👋",
+        "greeting": "Hi! 👋 I'm the {name} assistant. How can I help you?",
+        "thanks": "You're welcome! 😊",
+        "methods": "💳 Payment methods: {methods}.",
+        "discount": "• {label}: {percent}% off",
+        "phone": "📞 {value}",
+        "email": "✉️ {value}",
+        "address": "📍 {value}",
+        "instagram": "📷 {value}"
+    },
+    "pt": {
+        "hello": "Olá! 👋",
+        "greeting": "Olá! 👋 Sou o assistente de {name}. Como posso ajudar?",
+        "thanks": "De nada! 😊",
+        "methods": "💳 Formas de pagamento: {methods}.",
+        "discount": "• {label}: {percent}% de desconto",
+        "phone": "📞 {value}",
+        "email": "✉️ {value}",
+        "address": "📍 {value}",
+        "instagram": "📷 {value}"
+    }
+}
+
+
+def _language(locale: Optional[str]) -> str:
+    return (locale or '').split('-')[0].lower()
+
+
+def template_language(locale: Optional[str]) -> Optional[str]:
+    """Idioma del locale si tiene textos fijos (None si no: no hay respuestas fijas para ese locale)"""
+    language = _language(locale)
+    return language if language in TEMPLATE_STRINGS else None
+
+
+def build_templates(data: Dict[str, Any], locale: str) -> Dict[str, str]:
+    """Respuestas fijas del negocio para un locale, por intención
+
+    Saludo y agradecimiento están traducidos; envíos, devoluciones, pagos y contacto se arman con
+    los textos de business.json, así que solo se ofrecen si el locale habla el idioma del negocio.
+    """
+    strings = TEMPLATE_STRINGS.get(_language(locale))
+    if strings is None:
+        return {}
+
+    templates = {
+        "hello": strings["hello"],
+        "greeting": strings["greeting"].format(name=data.get('name') or ''),
+        "thanks": strings["thanks"]
+    }
+    if _language(locale) != _language(data.get('defaultLocale', 'es-AR')):
+        return templates
+
+    policies = data.get('policies') or {}
+    if policies.get('delivery'):
+        templates["delivery"] = f"🚚 {policies['delivery']}"
+    if policies.get('returns'):
+        templates["returns"] = f"↩️ {policies['returns']}"
+
+    payments = data.get('payments') or {}
+    lines = []
+    if payments.get('methods'):
+        lines.append(strings["methods"].format(methods=', '.join(payments['methods'])))
+    for discount in payments.get('discounts') or []:
+        lines.append(strings["discount"].format(label=discount.get('label', ''), percent=discount.get('percent', 0)))
+    installments = payments.get('installments') or {}
+    if installments.get('label'):
+        lines.append(f"• {installments['label']}")
+    if lines:
+        templates["payments"] = '\n'.join(lines)
+
+    contact = data.get('contact') or {}
+    lines = [strings[field].format(value=contact[field])
+             for field in ("address", "phone", "email", "instagram") if contact.get(field)]
+    if lines:
+        templates["contact"] = '\n'.join(lines)
+    return templates
+
+
+def classify(message: str) -> Dict[str, Any]:
+    """Intenciones del mensaje y qué parte de sus palabras explican
+
+    confidence es la fracción de palabras con contenido que pertenecen a alguna intención con
+    respuesta fija; las de catálogo o desconocidas la bajan y quedan en rest (para buscar productos).
+    """
+    words = 0
+    explained = 0
+    rest = []
+    catalog = 0
+    reasoning = False
+    scores: Dict[str, int] = {}
+
+    for word in TOKEN_RE.findall(normalize_text(message)):
+        matched = [intent for intent, lexicon in INTENT_LEXICONS.items() if word in lexicon]
+        if word in FILLER_WORDS and not matched:
+            continue
+        words += 1
+        if word in REASONING_LEXICON:
+            reasoning = True
+        if word in CATALOG_LEXICON:
+            catalog += 1
+            rest.append(word)
+        elif matched:
+            explained += 1
+            for intent in matched:
+                scores[intent] = scores.get(intent, 0) + 1
+        else:
+            rest.append(word)
+
+    intents = [intent for intent in INTENT_KEYWORDS if intent in scores]
+    informative = sorted((intent for intent in intents if intent not in SOCIAL_INTENTS),
+                         key=lambda intent: -scores[intent])
+    primary = informative[0] if informative else (intents[0] if intents else ("catalog" if catalog else "other"))
+    return {
+        "intent": primary,
+        "intents": intents,
+        "confidence": explained / words if words else 0.0,
+        "words": words,
+        "catalog_words": catalog,
+        "reasoning": reasoning,
+        "rest": ' '.join(rest)
+    }
+
+
+class IntentRouter:
+    """Elige el tier de cada mensaje: respuesta fija, modelo chico o modelo grande"""
+
+    def __init__(self, large_model: str, small_model: Optional[str] = None,
+                 template_min_confidence: float = 0.75, template_max_words: int = 8,
+                 small_max_words: int = 20, small_max_products: int = 2, small_max_history: int = 6):
+        self.large_model = large_model
+        self.small_model = small_model or None
+        self.template_min_confidence = template_min_confidence
+        self.template_max_words = template_max_words
+        self.small_max_words = small_max_words
+        self.small_max_products = small_max_products
+        self.small_max_history = small_max_history
+
+        # Contadores expuestos en /debug/cache (por proceso)
+        self.counts: Dict[str, int] = {tier: 0 for tier in TIERS}
+
+    def _template(self, intents: List[str], templates: Dict[str, str], signoff: str) -> Optional[str]:
+        """Respuesta fija que cubre todas las intenciones del mensaje (None si falta alguna)"""
+        if not intents or any(intent not in templates for intent in intents):
+            return None
+        informative = [templates[intent] for intent in INTENT_KEYWORDS
+                       if intent in intents and intent not in SOCIAL_INTENTS]
+        parts = []
+        if "greeting" in intents:
+            parts.append(templates["hello"] if informative else templates["greeting"])
+        if "thanks" in intents and not informative:
+            parts.append(templates["thanks"])
+        parts.extend(informative)
+        if informative and signoff:
+            parts.append(signoff)
+        return '\n\n'.join(parts)
+
+    def route(self, message: str, count_products: Callable[[str, int], int], history_messages: int,
+              templates: Dict[str, str], signoff: str = '') -> Dict[str, Any]:
+        """Decisión para un mensaje: {tier, model, intent, confidence, reason} y el texto si es fijo
+
+        count_products(texto, límite) cuenta los productos del catálogo que coinciden con las palabras
+        que ninguna intención explica (así "envío gratis" no cuenta los productos "sin TACC");
+        history_messages son los mensajes de historial del prompt.
+        """
+        info = classify(message)
+        matched_products = count_products(info["rest"], self.small_max_products + 1) if info["rest"] else 0
+        if matched_products and info["intent"] == "other":
+            info["intent"] = "catalog"
+        route = {
+            "tier": "large",
+            "model": self.large_model,
+            "intent": info["intent"],
+            "confidence": round(info["confidence"], 3),
+            "reason": None
+        }
+
+        if (not matched_products and not info["catalog_words"] and not info["reasoning"]
+                and info["words"] <= self.template_max_words
+                and info["confidence"] >= self.template_min_confidence):
+            reply = self._template(info["intents"], templates, signoff)
+            if reply is not None:
+                route.update(tier="template", model="template", reason="intent", reply=reply)
+                self.counts["template"] += 1
+                return route
+
+        if info["reasoning"]:
+            route["reason"] = "reasoning"
+        elif info["words"] > self.small_max_words:
+            route["reason"] = "long_message"
+        elif matched_products > self.small_max_products:
+            route["reason"] = "many_products"
+        elif history_messages > self.small_max_history:
+            route["reason"] = "long_history"
+        elif self.small_model is None:
+            route["reason"] = "no_small_model"
+        else:
+            route.update(tier="small", model=self.small_model, reason="simple")
+        self.counts[route["tier"]] += 1
+        return route
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuración y conteo por tier de este proceso"""
+        return {
+            "large_model": self.large_model,
+            "small_model": self.small_model,
+            "template_min_confidence": self.template_min_confidence,
+            "template_max_words": self.template_max_words,
+            "small_max_words": self.small_max_words,
+            "small_max_products": self.small_max_products,
+            "small_max_history": self.small_max_history,
+            "counts": dict(self.counts)
+        }
+
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Detección del idioma del mensaje (es-AR, en-US, pt-BR)
+El mensaje se parte en palabras completas (tabla de traducción armada una vez) y cada palabra
+distinta suma su peso por idioma con un lookup en un diccionario; un regex compilado suma los
+caracteres característicos y el Accept-Language del cliente desempata
+"""
+
+import re
+import string
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# Palabras características de cada idioma y su peso (una palabra de varios idiomas suma en todos)
+LOCALE_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "es-AR": {
+        "hola": 3, "gracias": 3, "buenos": 2, "buenas": 2, "buen": 1, "consulta": 2, "consulto": 2,
+        "precio": 2, "precios": 2, "envío": 3, "envio": 2, "envíos": 3, "envios": 2, "quiero": 2,
+        "quería": 3, "queria": 2, "quisiera": 3, "cuánto": 3, "cuanto": 2, "cuánta": 3, "cuesta": 2,
+        "cuestan": 2, "tienen": 2, "tenés": 3, "tenes": 2, "querés": 3, "podés": 3, "vos": 3, "che": 2,
+        "dónde": 3, "donde": 2, "cómo": 2, "necesito": 2, "cuotas": 3, "talle": 3, "talles": 3,
+        "zapatillas": 3, "remera": 3, "remeras": 3, "también": 3, "tambien": 2, "los": 2, "las": 1,
+        "el": 1, "es": 1, "una": 1, "y": 1, "hay": 2, "pero": 2, "muy": 2, "llega": 2, "mañana": 3,
+        "manana": 1, "hoy": 2, "puedo": 2, "tarjeta": 2, "efectivo": 2, "descuento": 2, "descuentos": 2, "sí": 1,
+        "qué": 2, "cuál": 3, "cual": 1, "envían": 3, "envian": 2, "comprar": 1, "saber": 1
+    },
+    "pt-BR": {
+        "olá": 3, "oi": 3, "obrigado": 3, "obrigada": 3, "bom": 2, "boa": 2, "preço": 3, "preços": 3,
+        "frete": 3, "quanto": 3, "quanta": 2, "custa": 3, "custam": 3, "vocês": 3, "você": 3, "voce": 2,
+        "vc": 2, "tem": 2, "não": 3, "nao": 2, "sim": 2, "muito": 2, "também": 3, "tambem": 2,
+        "quero": 3, "gostaria": 3, "pagamento": 3, "parcelas": 3, "cartão": 3, "desconto": 3,
+        "tamanho": 3, "tênis": 3, "onde": 2, "posso": 2, "uma": 2, "um": 1, "com": 2, "os": 1,
+        "isso": 2, "esse": 2, "essa": 2, "é": 2, "até": 2, "hoje": 2, "amanhã": 3, "ainda": 2,
+        "mas": 1, "entrega": 1, "queria": 1, "saber": 1, "comprar": 1, "fazem": 2,
+        "enviam": 2, "qual": 2, "quando": 2, "chega": 2, "meu": 2, "minha": 2, "camisetas": 1, "na": 2, "do": 1, "da": 1
+    },
+    "en-US": {
+        "hello": 3, "hi": 2, "hey": 2, "thanks": 3, "thank": 3, "you": 2, "price": 2, "prices": 2,
+        "shipping": 3, "delivery": 2, "how": 2, "much": 2, "what": 2, "the": 2, "is": 1, "are": 1,
+        "do": 1, "does": 2, "have": 1, "want": 2, "would": 2, "could": 2, "please": 3, "buy": 1,
+        "size": 2, "shoes": 2, "sneakers": 3, "shirt": 2, "payment": 2, "card": 1, "discount": 2,
+        "where": 2, "when": 2, "today": 2, "tomorrow": 2, "and": 2, "for": 1, "with": 2, "my": 1,
+        "i": 1, "can": 1, "it": 1, "this": 1, "that": 1, "any": 1, "cost": 2, "available": 2,
+        "order": 2, "ship": 2, "installments": 3, "stock": 1, "of": 1, "to": 1
+    }
+}
+
+# Caracteres que delatan el idioma aunque la palabra no esté en la lista
+LOCALE_CHARS: Dict[str, Dict[str, float]] = {
+    "es-AR": {"ñ": 2, "¿": 3, "¡": 3, "á": 0.5, "é": 0.5, "í": 0.5, "ó": 0.5, "ú": 0.5},
+    "pt-BR": {"ã": 3, "õ": 3, "ç": 2, "ê": 2, "ô": 2, "â": 1, "à": 1, "á": 0.5, "é": 0.5, "í": 0.5,
+              "ó": 0.5, "ú": 0.5}
+}
+
+# Idioma primario del Accept-Language -> locale soportado
+LANGUAGE_LOCALES = {"es": "es-AR", "en": "en-US", "pt": "pt-BR"}
+
+# El hint del cliente pesa menos que una palabra clara del mensaje (multiplicado por su q)
+HINT_WEIGHT = 1.5
+
+# Más allá de este largo el idioma ya está decidido; acota el costo en mensajes largos
+MAX_SCAN_CHARS = 1000
+
+# Puntuación -> espacio, para separar palabras con str.split (más rápido que un regex \w+)
+_SEPARATORS = str.maketrans({char: ' ' for char in string.punctuation + '¿¡«»“”‘’…'})
+
+
+@lru_cache(maxsize=256)
+def parse_accept_language(header: str) -> Tuple[Tuple[str, float], ...]:
+    """Locales soportados del header Accept-Language con su q, en orden de preferencia"""
+    preferences: Dict[str, float] = {}
+    for part in header.split(','):
+        fields = part.strip().split(';')
+        language = fields[0].strip().lower().split('-')[0]
+        quality = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        locale = LANGUAGE_LOCALES.get(language)
+        if locale and quality > preferences.get(locale, 0.0):
+            preferences[locale] = quality
+    return tuple(sorted(preferences.items(), key=lambda item: -item[1]))
+
+
+class LocaleDetector:
+    """Puntaje por idioma con palabras completas y caracteres característicos"""
+
+    def __init__(self, keywords: Dict[str, Dict[str, float]] = LOCALE_KEYWORDS,
+                 chars: Dict[str, Dict[str, float]] = LOCALE_CHARS, max_scan_chars: int = MAX_SCAN_CHARS):
+        self.locales: List[str] = list(keywords)
+        self.max_scan_chars = max_scan_chars
+
+        # palabra o caracter -> [(índice del locale, peso)]
+        self._word_weights: Dict[str, List[Tuple[int, float]]] = {}
+        for index, locale in enumerate(self.locales):
+            for word, weight in keywords[locale].items():
+                self._word_weights.setdefault(word, []).append((index, weight))
+        self._char_weights: Dict[str, List[Tuple[int, float]]] = {}
+        for locale, weights in chars.items():
+            for char, weight in weights.items():
+                self._char_weights.setdefault(char, []).append((self.locales.index(locale), weight))
+        self._char_re = re.compile('[' + re.escape(''.join(self._char_weights)) + ']')
+
+    def scores(self, message: str, accept_language: Optional[str] = None) -> Dict[str, float]:
+        """Puntaje de cada locale para el mensaje (y el hint del cliente si hay)"""
+        totals = [0.0] * len(self.locales)
+        text = message[:self.max_scan_chars].lower()
+
+        # Cada palabra distinta cuenta una vez: la intersección de sets corre en C
+        word_weights = self._word_weights
+        for word in word_weights.keys() & set(text.translate(_SEPARATORS).split()):
+            for index, weight in word_weights[word]:
+                totals[index] += weight
+        char_weights = self._char_weights
+        for char in self._char_re.findall(text):
+            for index, weight in char_weights[char]:
+                totals[index] += weight
+
+        if accept_language:
+            for locale, quality in parse_accept_language(accept_language):
+                if locale in self.locales:
+                    totals[self.locales.index(locale)] += HINT_WEIGHT * quality
+
+        return dict(zip(self.locales, totals))
+
+    def detect(self, message: str, fallback: str = 'es-AR', accept_language: Optional[str] = None) -> str:
+        """Locale con mayor puntaje; el fallback si no hay señales o hay empate"""
+        if not message and not accept_language:
+            return fallback
+
+        ranked = sorted(self.scores(message or '', accept_language).items(), key=lambda item: -item[1])
+        best, best_score = ranked[0]
+        if best_score <= 0 or (len(ranked) > 1 and ranked[1][1] == best_score):
+            return fallback
+        return best
+
+
+# Instancia global
+locale_detector = LocaleDetector()
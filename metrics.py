@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Métricas en memoria con exposición en formato de texto de Prometheus
+Timers por etapa del request, contadores de status HTTP y errores de Groq
+Las métricas son por proceso: con varios workers cada uno expone las suyas
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, List, Tuple
+
+# Límites de los buckets en segundos (desde 50µs para las etapas locales hasta 30s de Groq)
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+# Requests con tiempos por etapa pendientes de volcar a los histogramas
+MAX_PENDING_STAGES = 10000
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monótono con labels"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_values: Tuple[str, ...] = (), amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for label_values, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Histograma de buckets fijos con labels (se guardan conteos no acumulados)"""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # Por label: [conteo por bucket..., +Inf, suma]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self, label_values: Tuple[str, ...]) -> List[float]:
+        series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        return series
+
+    def observe(self, value: float, label_values: Tuple[str, ...] = ()):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values) or self._new_series(label_values)
+            series[index] += 1
+            series[-1] += value
+
+    def observe_prefixed(self, prefix: str, observations: List[Tuple[str, float]]):
+        """Registra varias observaciones con labels (prefix, nombre) tomando el lock una sola vez"""
+        buckets = self.buckets
+        all_series = self._series
+        with self._lock:
+            for name, value in observations:
+                series = all_series.get((prefix, name)) or self._new_series((prefix, name))
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class StageTimer:
+    """Cronómetro de un request: cada lap() registra el tiempo desde la marca anterior"""
+
+    __slots__ = ('_last', 'stages')
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def skip(self):
+        """Descarta el tiempo desde la última marca (ej. esperas que no son de ninguna etapa)"""
+        self._last = time.perf_counter()
+
+    def as_ms(self) -> Dict[str, float]:
+        """Tiempos por etapa en milisegundos para el bloque usage"""
+        timings: Dict[str, float] = {}
+        for stage, seconds in self.stages:
+            timings[stage] = round(timings.get(stage, 0) + seconds * 1000, 3)
+        return timings
+
+
+class _NullTimer:
+    """Timer que no mide nada, para llamadas fuera de un request instrumentado"""
+
+    stages: List[Tuple[str, float]] = []
+
+    def lap(self, stage: str):
+        pass
+
+    def skip(self):
+        pass
+
+    def as_ms(self) -> Dict[str, float]:
+        return {}
+
+
+NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """Métricas del backend y su render en formato Prometheus"""
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "chat_stage_seconds", "Duración de cada etapa de un request de chat", ("endpoint", "stage"))
+        self.request_seconds = Histogram(
+            "http_request_seconds", "Duración de los requests HTTP", ("endpoint",))
+        self.responses = Counter(
+            "http_responses_total", "Respuestas HTTP por endpoint y status", ("endpoint", "status"))
+        self.groq_errors = Counter(
+            "groq_errors_total", "Errores de la API de Groq por tipo", ("kind",))
+        self.routes = Counter(
+            "chat_routes_total", "Mensajes por tier del router (template, small, large) e intención", ("tier", "intent"))
+        self._metrics = [self.stage_seconds, self.request_seconds, self.responses, self.groq_errors, self.routes]
+        self._pending: deque = deque()
+
+    def record_stages(self, endpoint: str, timer: StageTimer):
+        """Encola los tiempos de un request; se vuelcan a los histogramas al exponer las métricas
+
+        En el request solo se hace un append (atómico), los buckets se calculan en el scrape.
+        """
+        self._pending.append((endpoint, timer.stages))
+        if len(self._pending) > MAX_PENDING_STAGES:
+            self._fold_pending()
+
+    def _fold_pending(self):
+        pending = self._pending
+        while True:
+            try:
+                endpoint, stages = pending.popleft()
+            except IndexError:
+                return
+            self.stage_seconds.observe_prefixed(endpoint, stages)
+
+    def render(self) -> str:
+        self._fold_pending()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Instancia global
+metrics = MetricsRegistry()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Motor de ofertas por lote
+Calcula descuentos y cuotas de todo el catálogo como operaciones sobre arrays
+"""
+
+from typing import Dict, Any, Iterable, List, Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional, sin él se usa el cálculo en Python puro
+    np = None
+
+
+def unique_products(catalog: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Un producto por SKU: si se repite queda el último, en la posición del primero (como un dict)"""
+    products: Dict[str, Dict[str, Any]] = {}
+    for product in catalog:
+        products[product['sku']] = product
+    return list(products.values())
+
+
+class OfferTable:
+    """Ofertas de un catálogo para un locale, con strings formateados bajo demanda"""
+
+    def __init__(self, catalog: List[Dict[str, Any]], payments: Dict[str, Any],
+                 locale: str, currency: str,
+                 formatter: Callable[[int, str, str], str]):
+        self.locale = locale
+        self.currency = currency
+        self._formatter = formatter
+
+        catalog = unique_products(catalog)
+        self.skus = [product['sku'] for product in catalog]
+        self.titles = [product['title'] for product in catalog]
+        self.base_prices = [product.get('price', 0) for product in catalog]
+        self._positions = {sku: i for i, sku in enumerate(self.skus)}
+
+        self.discounts = list(payments.get('discounts', []))
+        inst_data = payments.get('installments') or {}
+        count = inst_data.get('count')
+        self.installments = inst_data if count and count > 0 else None
+
+        self.discount_values = self._compute_discounts(self.base_prices)
+        self.installment_values = self._compute_installments(self.base_prices)
+        self._formatted: Dict[str, Dict[str, Any]] = {}
+
+    def _compute_discounts(self, base_prices: List[int]):
+        """Matriz productos x descuentos con el precio final truncado a entero"""
+        if not self.discounts:
+            return None
+
+        if np is not None:
+            prices = np.asarray(base_prices, dtype=np.float64)
+            factors = 1 - np.asarray([d['percent'] for d in self.discounts], dtype=np.float64) / 100
+            # Mismo orden de operaciones que int(price * (1 - percent / 100))
+            return np.trunc(prices[:, None] * factors[None, :]).astype(np.int64)
+
+        factors = [1 - d['percent'] / 100 for d in self.discounts]
+        return [[int(price * factor) for factor in factors] for price in base_prices]
+
+    def _compute_installments(self, base_prices: List[int]):
+        """Valor de cada cuota por producto, truncado a entero"""
+        if not self.installments:
+            return None
+
+        count = self.installments['count']
+        if np is not None:
+            prices = np.asarray(base_prices, dtype=np.float64)
+            return np.trunc(prices / count).astype(np.int64)
+
+        return [int(price / count) for price in base_prices]
+
+    def patched(self, catalog: List[Dict[str, Any]], payments: Dict[str, Any],
+                changed_skus: Iterable[str]) -> 'OfferTable':
+        """Tabla nueva para el catálogo modificado, recalculando solo lo que cambió
+
+        Las filas de los SKUs no cambiados se copian de esta tabla (junto con sus ofertas ya
+        formateadas) mientras descuentos y cuotas sigan iguales; si cambian, se recalcula la
+        columna correspondiente para todo el catálogo. Esta tabla no se modifica.
+        """
+        table = OfferTable.__new__(OfferTable)
+        table.locale = self.locale
+        table.currency = self.currency
+        table._formatter = self._formatter
+
+        catalog = unique_products(catalog)
+        table.skus = [product['sku'] for product in catalog]
+        table.titles = [product['title'] for product in catalog]
+        table.base_prices = [product.get('price', 0) for product in catalog]
+        table._positions = {sku: i for i, sku in enumerate(table.skus)}
+
+        table.discounts = list(payments.get('discounts', []))
+        inst_data = payments.get('installments') or {}
+        count = inst_data.get('count')
+        table.installments = inst_data if count and count > 0 else None
+
+        changed = set(changed_skus)
+        # Filas que se reutilizan: posición en esta tabla o -1 si hay que calcularla
+        sources = [-1 if sku in changed else self._positions.get(sku, -1) for sku in table.skus]
+        same_discounts = table.discounts == self.discounts
+        same_installments = table.installments == self.installments
+
+        if same_discounts and self.discount_values is not None:
+            table.discount_values = table._reuse_rows(self.discount_values, sources, table._compute_discounts)
+        else:
+            table.discount_values = table._compute_discounts(table.base_prices)
+        if same_installments and self.installment_values is not None:
+            table.installment_values = table._reuse_rows(self.installment_values, sources,
+                                                         table._compute_installments)
+        else:
+            table.installment_values = table._compute_installments(table.base_prices)
+
+        if same_discounts and same_installments:
+            formatted = self._formatted.copy()
+            table._formatted = {sku: formatted[sku] for sku, source in zip(table.skus, sources)
+                                if source >= 0 and sku in formatted}
+        else:
+            table._formatted = {}
+        return table
+
+    def _reuse_rows(self, values, sources: List[int], compute: Callable[[List[int]], Any]):
+        """Copia las filas existentes y calcula solo las marcadas con -1"""
+        missing = [i for i, source in enumerate(sources) if source < 0]
+        if len(missing) * 2 > len(sources):
+            return compute(self.base_prices)
+
+        # Mismo cálculo que para la tabla entera, sobre los precios nuevos o cambiados
+        fresh = compute([self.base_prices[i] for i in missing])
+
+        if np is not None:
+            rows = np.asarray(values)[np.asarray([max(source, 0) for source in sources], dtype=np.int64)]
+            if missing:
+                rows[np.asarray(missing, dtype=np.int64)] = fresh
+            return rows
+
+        rows = [values[source] if source >= 0 else None for source in sources]
+        for i, value in zip(missing, fresh):
+            rows[i] = value
+        return rows
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    def __contains__(self, sku: str) -> bool:
+        return sku in self._positions
+
+    def is_formatted(self, sku: str) -> bool:
+        """True si la oferta del SKU ya está formateada (y se reutilizó o se armó en esta tabla)"""
+        return sku in self._formatted
+
+    def offer(self, sku: str) -> Dict[str, Any]:
+        """Oferta formateada de un SKU (se formatea la primera vez que se pide)"""
+        offer = self._formatted.get(sku)
+        if offer is not None:
+            return offer
+
+        i = self._positions[sku]
+        base_price = self.base_prices[i]
+
+        discounts = []
+        for j, discount in enumerate(self.discounts):
+            discount_value = int(self.discount_values[i][j])
+            discounts.append({
+                'key': discount['key'],
+                'label': discount['label'],
+                'value': discount_value,
+                'formatted': self._formatter(discount_value, self.locale, self.currency)
+            })
+
+        installments = None
+        if self.installments:
+            per_installment = int(self.installment_values[i])
+            installments = {
+                'label': self.installments.get('label', ''),
+                'perInstallment': per_installment,
+                'count': self.installments['count'],
+                'formattedEach': self._formatter(per_installment, self.locale, self.currency)
+            }
+
+        offer = {
+            'sku': sku,
+            'title': self.titles[i],
+            'base_price': base_price,
+            'formatted': {
+                'base': self._formatter(base_price, self.locale, self.currency),
+                'discounts': discounts,
+                'installments': installments
+            }
+        }
+        self._formatted[sku] = offer
+        return offer
+
+    def offers(self, skus: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Ofertas formateadas de los SKUs indicados (todo el catálogo si no se indican)"""
+        if skus is None:
+            skus = self.skus
+        return {sku: self.offer(sku) for sku in skus if sku in self._positions}
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Cache de respuestas de Groq
+Evita repetir llamadas para la misma pregunta sobre el mismo prompt del sistema
+"""
+
+import re
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from catalog_index import normalize_text
+from sqlite_util import connect
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Normaliza mayúsculas, acentos, puntuación y espacios de un mensaje"""
+    text = _PUNCTUATION_RE.sub(' ', normalize_text(message))
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+class ReplyCache:
+    """LRU en memoria con TTL y un nivel opcional en disco (SQLite)
+
+    Los dos niveles guardan a lo sumo max_entries respuestas; en disco se descartan las que vencen
+    antes y las vencidas se borran cada purge_interval segundos.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, path: Optional[str] = None,
+                 purge_interval: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        # Contadores expuestos en /debug
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_expired = 0
+
+        if path:
+            self._db = self._open_db()
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS replies ("
+                "key TEXT PRIMARY KEY, reply TEXT NOT NULL, model TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS replies_expires ON replies (expires)")
+            self._purge_expired(time.time())
+
+    def _open_db(self) -> sqlite3.Connection:
+        """Una conexión para todos los threads del proceso (se usa siempre con el lock tomado)"""
+        return connect(self.path, check_same_thread=False)
+
+    def after_fork(self):
+        """En un proceso hijo: lock y conexión propios (una conexión SQLite no se comparte entre procesos)"""
+        self._lock = threading.Lock()
+        if self._db is not None:
+            self._db = self._open_db()
+
+    @staticmethod
+    def make_key(system_prompt: str, locale: str, message: str, model: str) -> str:
+        """Clave del cache: hash del prompt del sistema + modelo + locale + mensaje normalizado"""
+        prompt_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()
+        raw = '\x1f'.join([prompt_hash, model, locale or '', normalize_message(message)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna {reply, model} si hay una respuesta vigente para la clave"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry['expires'] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT reply, model, expires FROM replies WHERE key = ? AND expires > ?",
+                    (key, now)
+                ).fetchone()
+                if row:
+                    entry = {'reply': row[0], 'model': row[1], 'expires': row[2]}
+                    self._remember(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, reply: str, model: str):
+        """Guarda una respuesta exitosa de Groq"""
+        now = time.time()
+        entry = {'reply': reply, 'model': model, 'expires': now + self.ttl}
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO replies (key, reply, model, expires) VALUES (?, ?, ?, ?)",
+                    (key, reply, model, entry['expires'])
+                )
+                # Con el TTL fijo, las que vencen antes son las más viejas
+                self.disk_evictions += self._db.execute(
+                    "DELETE FROM replies WHERE key IN ("
+                    "SELECT key FROM replies ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+                if now >= self._next_purge:
+                    self._purge_expired(now)
+
+    def _purge_expired(self, now: float):
+        """Borra del disco las respuestas vencidas (las de otros workers también)"""
+        self.disk_expired += self._db.execute("DELETE FROM replies WHERE expires <= ?", (now,)).rowcount
+        self._next_purge = now + self.purge_interval
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        """Inserta en el LRU en memoria desalojando los más viejos"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del cache para debug"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk": self.path,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_evictions": self.disk_evictions,
+            "disk_expired": self.disk_expired
+        }
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Sesiones de conversación del lado del servidor
+Historial acotado por sesión con TTL y compactación del historial por presupuesto de tokens
+Las sesiones se guardan en SQLite: todos los workers ven las mismas, sin afinidad de sesión
+"""
+
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+from sqlite_util import thread_connection
+
+ROLE_LABELS = {"user": "Cliente", "assistant": "Asistente"}
+
+# Tokens de overhead por mensaje (rol y separadores del formato de chat)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación de ~4 caracteres por token"""
+    return len(text) // 4
+
+
+def _clip(text: str, max_chars: int) -> str:
+    """Primera oración del texto, recortada a max_chars"""
+    text = ' '.join(text.split())
+    for end in ('. ', '? ', '! '):
+        index = text.find(end)
+        if 0 < index < max_chars:
+            return text[:index + 1]
+    return text if len(text) <= max_chars else text[:max_chars - 1] + '…'
+
+
+def summarize(summary: str, messages: List[Dict[str, str]], max_chars: int, clip_chars: int = 120) -> str:
+    """Agrega mensajes viejos al resumen (una línea corta por mensaje); conserva lo más reciente"""
+    parts = [summary] if summary else []
+    for message in messages:
+        parts.append(f"{ROLE_LABELS.get(message['role'], message['role'])}: {_clip(message['content'], clip_chars)}")
+    merged = ' | '.join(parts)
+    if len(merged) > max_chars:
+        merged = '…' + merged[-(max_chars - 1):]
+    return merged
+
+
+def compact_history(messages: List[Dict[str, str]], summary: str, budget_tokens: int, summary_chars: int,
+                    estimate: Callable[[str], int] = estimate_tokens) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """Deja los turnos más nuevos textuales y colapsa los viejos en un resumen para entrar en el presupuesto
+
+    Retorna (mensajes para el prompt, info de la compactación).
+    """
+    def cost(message: Dict[str, str]) -> int:
+        return estimate(message['content']) + MESSAGE_OVERHEAD_TOKENS
+
+    def summary_message(text: str) -> Dict[str, str]:
+        return {"role": "system", "content": f"Resumen de la conversación previa: {text}"}
+
+    full_tokens = sum(cost(message) for message in messages) + (cost(summary_message(summary)) if summary else 0)
+    if full_tokens <= budget_tokens:
+        history = ([summary_message(summary)] if summary else []) + list(messages)
+        return history, {
+            "history_messages": len(messages),
+            "summarized_messages": 0,
+            "history_tokens": full_tokens,
+            "tokens_saved": 0
+        }
+
+    # El resumen usa a lo sumo un tercio del presupuesto; el resto queda para los mensajes más nuevos
+    # (la reserva se calcula con ~4 caracteres por token porque el texto del resumen todavía no existe)
+    summary_chars = min(summary_chars, budget_tokens // 3 * 4)
+    available = budget_tokens - estimate_tokens(summary_message('x' * summary_chars)['content']) - MESSAGE_OVERHEAD_TOKENS
+    kept: List[Dict[str, str]] = []
+    used = 0
+    for message in reversed(messages):
+        message_cost = cost(message)
+        if used + message_cost > available:
+            break
+        kept.append(message)
+        used += message_cost
+    kept.reverse()
+
+    older = messages[:len(messages) - len(kept)]
+    history = [summary_message(summarize(summary, older, summary_chars))] + kept
+    history_tokens = sum(cost(message) for message in history)
+    return history, {
+        "history_messages": len(messages),
+        "summarized_messages": len(older),
+        "history_tokens": history_tokens,
+        "tokens_saved": max(full_tokens - history_tokens, 0)
+    }
+
+
+class Session:
+    """Referencia a una sesión guardada (el historial se lee con SessionStore.snapshot)"""
+
+    __slots__ = ('id', 'key')
+
+    def __init__(self, session_id: str, key: str):
+        self.id = session_id
+        self.key = key
+
+
+class SessionStore:
+    """Sesiones con TTL en SQLite, compartidas entre threads y workers
+
+    Se guardan a lo sumo max_sessions (se descartan las de actividad más vieja) y cada una
+    a lo sumo max_messages mensajes recortados; los que salen del historial pasan al resumen.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl: float = 1800, max_messages: int = 40,
+                 max_message_chars: int = 4000, summary_chars: int = 1200):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.max_message_chars = max_message_chars
+        self.summary_chars = summary_chars
+        self._local = threading.local()
+
+        # Contadores expuestos en /debug (por proceso)
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+        self.unknown = 0
+
+        self._keepalive = self._connection()
+        with self._keepalive as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL DEFAULT '', updated REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_messages ("
+                "key TEXT NOT NULL REFERENCES sessions (key) ON DELETE CASCADE, seq INTEGER NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, PRIMARY KEY (key, seq))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path, foreign_keys=True)
+
+    def create(self, namespace: str) -> Session:
+        """Sesión nueva con un id generado por el servidor (los clientes no eligen ids)
+
+        De paso borra las sesiones expiradas y las que excedan max_sessions.
+        """
+        session_id = uuid.uuid4().hex
+        key = f"{namespace}:{session_id}"
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = conn.execute("DELETE FROM sessions WHERE updated < ?", (now - self.ttl,)).rowcount
+            conn.execute("INSERT INTO sessions (key, updated) VALUES (?, ?)", (key, now))
+            evicted = conn.execute(
+                "DELETE FROM sessions WHERE key IN ("
+                "SELECT key FROM sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.created += 1
+        self.expired += expired
+        self.evicted += evicted
+        return Session(session_id, key)
+
+    def get(self, namespace: str, session_id: str) -> Optional[Session]:
+        """Sesión vigente emitida por create(); None si no existe, expiró o es de otro namespace"""
+        key = f"{namespace}:{session_id}"
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT updated FROM sessions WHERE key = ?", (key,)).fetchone()
+            expired = row is not None and now - row[0] > self.ttl
+            if expired:
+                conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            elif row is not None:
+                conn.execute("UPDATE sessions SET updated = ? WHERE key = ?", (now, key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None or expired:
+            self.expired += expired
+            self.unknown += 1
+            return None
+        return Session(session_id, key)
+
+    def snapshot(self, session: Session) -> Tuple[List[Dict[str, str]], str]:
+        """Copia del historial y el resumen de la sesión"""
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT summary FROM sessions WHERE key = ?", (session.key,)).fetchone()
+            messages = [{"role": role, "content": content} for role, content in conn.execute(
+                "SELECT role, content FROM session_messages WHERE key = ? ORDER BY seq", (session.key,))]
+        finally:
+            conn.execute("COMMIT")
+        return messages, row[0] if row else ''
+
+    def append_turn(self, session: Session, user_message: str, reply: str):
+        """Agrega un turno; los mensajes que salen del historial pasan al resumen"""
+        turn = [
+            ("user", user_message[:self.max_message_chars]),
+            ("assistant", reply[:self.max_message_chars])
+        ]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT summary FROM sessions WHERE key = ?", (session.key,)).fetchone()
+            if row is None:
+                # Expiró o se descartó mientras se esperaba a Groq
+                conn.execute("ROLLBACK")
+                return
+            summary = row[0]
+            count, last_seq = conn.execute(
+                "SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM session_messages WHERE key = ?", (session.key,)
+            ).fetchone()
+            overflow = count + len(turn) - self.max_messages
+            if overflow > 0:
+                dropped = conn.execute(
+                    "SELECT seq, role, content FROM session_messages WHERE key = ? ORDER BY seq LIMIT ?",
+                    (session.key, overflow)
+                ).fetchall()
+                if dropped:
+                    summary = summarize(summary, [{"role": role, "content": content} for _, role, content in dropped],
+                                        self.summary_chars)
+                    conn.execute("DELETE FROM session_messages WHERE key = ? AND seq <= ?",
+                                 (session.key, dropped[-1][0]))
+            conn.executemany(
+                "INSERT INTO session_messages (key, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(session.key, last_seq + i, role, content) for i, (role, content) in enumerate(turn, 1)]
+            )
+            conn.execute("UPDATE sessions SET summary = ?, updated = ? WHERE key = ?",
+                         (summary, time.time(), session.key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuración, sesiones guardadas y contadores para debug"""
+        return {
+            "sessions": self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "max_messages": self.max_messages,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "unknown": self.unknown
+        }
+
+
+def validate_history(history: Any, max_message_chars: int) -> Optional[List[Dict[str, str]]]:
+    """Normaliza un historial enviado por el cliente; None si el formato es inválido"""
+    if not isinstance(history, list):
+        return None
+    messages = []
+    for item in history:
+        if not isinstance(item, dict) or item.get('role') not in ROLE_LABELS or not isinstance(item.get('content'), str):
+            return None
+        messages.append({"role": item['role'], "content": item['content'][:max_message_chars]})
+    return messages
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Single-flight para llamadas a Groq
+Requests idénticos simultáneos comparten una sola llamada upstream
+"""
+
+import json
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Any, Callable, Awaitable, List, Tuple
+
+
+def flight_key(system_prompt: str, model: str, message: str, history: List[Dict[str, str]] = None) -> str:
+    """Clave de coalescing: hash del prompt del sistema + modelo + historial + mensaje"""
+    parts = [hashlib.sha256(system_prompt.encode('utf-8')).hexdigest(), model, message]
+    if history:
+        parts.append(json.dumps(history, ensure_ascii=False, sort_keys=True))
+    raw = '\x1f'.join(parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    """Llamada en curso compartida entre el líder y los que esperan"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalescing de llamadas idénticas concurrentes entre threads"""
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = threading.Lock()
+
+        # Contadores expuestos en /debug
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Ejecuta fn una sola vez por clave en curso; retorna (resultado, compartido)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para debug"""
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
+
+
+class AsyncSingleFlight:
+    """Coalescing de llamadas idénticas concurrentes dentro de un event loop"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+        # Contadores expuestos en /debug
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Ejecuta fn una sola vez por clave en curso; retorna (resultado, compartido)"""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            # La llamada corre en su propia tarea: si el cliente del líder se desconecta
+            # los demás siguen esperando el resultado
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            self.leaders += 1
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para debug"""
+        return {
+            "in_flight": len(self._tasks),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced
+        }
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Conexiones SQLite compartidas por los stores (uso, admisión, sesiones, cassettes y cache de respuestas)
+Modo WAL con espera ante locks para que varios threads y procesos worker escriban la misma base
+"""
+
+import os
+import sqlite3
+import threading
+
+
+def connect(path: str, foreign_keys: bool = False, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Abre una conexión en autocommit (las transacciones se abren con BEGIN explícito)
+
+    Un path 'file:...' se abre como URI (ej. 'file:nombre?mode=memory&cache=shared' en tests).
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=check_same_thread,
+                           uri=path.startswith('file:'))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    if foreign_keys:
+        conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+def thread_connection(local: threading.local, path: str, foreign_keys: bool = False) -> sqlite3.Connection:
+    """Una conexión por thread y por proceso (las conexiones no sobreviven a un fork)"""
+    conn = getattr(local, 'conn', None)
+    if conn is None or local.pid != os.getpid():
+        conn = connect(path, foreign_keys)
+        local.conn = conn
+        local.pid = os.getpid()
+    return conn
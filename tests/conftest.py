@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+
+import pytest
+
+# Los módulos del backend están en la raíz del repo; Stack (Groq falso + backend) en benchmarks/
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+
+
+def wait_for(condition, timeout: float = 10.0, interval: float = 0.05):
+    """Reintenta condition() hasta que retorne algo verdadero (y lo retorna) o venza el timeout"""
+    deadline = time.monotonic() + timeout
+    while True:
+        result = condition()
+        if result or time.monotonic() > deadline:
+            return result
+        time.sleep(interval)
+
+
+def start_stack(request):
+    """Groq falso + backend de la variante del parámetro, con las STACK_OPTIONS del módulo de tests"""
+    from load import Stack
+    options = {"groq_latency": 0.0, "groq_jitter": 0.0, "env": {},
+               **getattr(request.module, 'STACK_OPTIONS', {})}
+    return Stack(request.param, **options)
+
+
+@pytest.fixture(scope='module', params=['flask', 'async'])
+def stack(request):
+    """Un backend por módulo de tests, en sus dos variantes (Flask y asyncio)"""
+    stack = start_stack(request)
+    yield stack
+    stack.close()
+
+
+@pytest.fixture(params=['flask', 'async'])
+def fresh_stack(request):
+    """Un backend nuevo por test, para los que consumen estado del Groq falso"""
+    stack = start_stack(request)
+    yield stack
+    stack.close()
@@ -0,0 +1,90 @@
+"""Control de admisión por tenant: bucket de tokens/minuto, USD/día, estado compartido entre procesos y 429 en /chat"""
+import multiprocessing
+
+import pytest
+import requests
+
+from admission import AdmissionController, AdmissionRejected
+
+MODEL = "llama3-70b-8192"
+# 1 USD por millón de tokens de entrada y de salida: 1000 tokens cuestan 0.001 USD
+PRICING = {"input": 1.0, "output": 1.0}
+
+STACK_OPTIONS = {"env": {
+    "ADMISSION_ENABLED": "true",
+    # Un request de /chat (prompt + GROQ_MAX_TOKENS) vacía el bucket entero
+    "ADMISSION_TOKENS_PER_MINUTE": "1000",
+    "ADMISSION_USD_PER_DAY": "1000"
+}}
+
+
+def pricing(model: str) -> dict:
+    return PRICING
+
+
+def controller(path: str, tokens_per_minute: float = 1000, usd_per_day: float = 100) -> AdmissionController:
+    return AdmissionController(path, tokens_per_minute=tokens_per_minute, usd_per_day=usd_per_day, pricing=pricing)
+
+
+def test_rejects_when_the_token_bucket_is_empty(tmp_path):
+    admission = controller(str(tmp_path / 'admission.db'))
+    admission.admit("tienda", MODEL, 400, 200)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("tienda", MODEL, 400, 200)
+    assert rejected.value.reason == "tokens_per_minute"
+    # Faltan 200 tokens a 1000/minuto
+    assert rejected.value.retry_after == pytest.approx(12, abs=0.5)
+    # Otro tenant tiene su propio bucket
+    admission.admit("otra-tienda", MODEL, 400, 200)
+
+
+def test_settle_returns_unused_reservation(tmp_path):
+    admission = controller(str(tmp_path / 'admission.db'))
+    ticket = admission.admit("tienda", MODEL, 400, 500)
+    admission.settle(ticket, 300, admission.estimate_cost(MODEL, 200, 100))
+
+    status = admission.status("tienda")
+    assert status["tokens_available"] == pytest.approx(700, abs=5)
+    assert status["usd_spent_today"] == pytest.approx(0.0003)
+
+
+def test_rejects_over_the_daily_usd_budget(tmp_path):
+    admission = controller(str(tmp_path / 'admission.db'), tokens_per_minute=1_000_000, usd_per_day=0.001)
+    admission.admit("tienda", MODEL, 500, 500)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.admit("tienda", MODEL, 10, 10)
+    assert rejected.value.reason == "usd_per_day"
+    # Se reintenta después de la medianoche
+    assert 0 < rejected.value.retry_after <= 24 * 3600
+
+
+def admit_in_other_process(path: str, tokens: int):
+    controller(path).admit("tienda", MODEL, tokens, 0)
+
+
+def test_budget_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / 'admission.db')
+    admission = controller(path)
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        pool.apply(admit_in_other_process, (path, 800))
+
+    with pytest.raises(AdmissionRejected):
+        admission.admit("tienda", MODEL, 400, 0)
+
+
+def groq_calls(stack) -> int:
+    return requests.get(stack.groq_url + '/stats', timeout=5).json()["completions"]
+
+
+def test_chat_over_budget_gets_429_without_calling_groq(stack):
+    before = groq_calls(stack)
+    first = requests.post(stack.url + '/chat', json={"message": "¿Qué venden?"}, timeout=30)
+    assert first.status_code == 200
+
+    second = requests.post(stack.url + '/chat', json={"message": "¿Hacen envíos?"}, timeout=30)
+    assert second.status_code == 429
+    assert second.json()["reason"] == "tokens_per_minute"
+    assert int(second.headers["Retry-After"]) >= 1
+    assert groq_calls(stack) == before + 1
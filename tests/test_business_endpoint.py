@@ -0,0 +1,69 @@
+"""GET /business precalculado: ETag e If-None-Match, negociación gzip/br y Cache-Control según ?v="""
+import gzip
+
+import pytest
+import requests
+
+
+def get_business(stack, accept_encoding: str = 'identity', **kwargs) -> requests.Response:
+    """GET /business con los bytes tal como llegan (sin descomprimir) en response.content"""
+    headers = {"Accept-Encoding": accept_encoding, **kwargs.pop('headers', {})}
+    response = requests.get(stack.url + '/business', headers=headers, stream=True, timeout=10, **kwargs)
+    response._content = response.raw.read(decode_content=False)
+    return response
+
+
+def test_if_none_match_returns_304_without_body(stack):
+    first = get_business(stack)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    for if_none_match in (etag, f"W/{etag}", f'"otro", {etag}'):
+        revalidated = get_business(stack, headers={"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b''
+        assert revalidated.headers["ETag"] == etag
+
+    assert get_business(stack, headers={"If-None-Match": '"otro"'}).status_code == 200
+
+
+def test_etag_of_one_encoding_validates_the_others(stack):
+    gzip_etag = get_business(stack, 'gzip').headers["ETag"]
+    response = get_business(stack, headers={"If-None-Match": gzip_etag})
+    assert response.status_code == 304
+
+
+def test_gzip_is_negotiated_and_precompressed(stack):
+    identity = get_business(stack)
+    compressed = get_business(stack, 'gzip, deflate')
+
+    assert compressed.headers["Content-Encoding"] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers["Vary"]
+    assert compressed.headers["ETag"] != identity.headers["ETag"]
+    assert len(compressed.content) < len(identity.content)
+    assert gzip.decompress(compressed.content) == identity.content
+    assert "Content-Encoding" not in identity.headers
+
+
+def test_br_is_preferred_when_available(stack):
+    brotli = pytest.importorskip('brotli')
+    identity = get_business(stack)
+
+    compressed = get_business(stack, 'gzip, br')
+    assert compressed.headers["Content-Encoding"] == 'br'
+    assert brotli.decompress(compressed.content) == identity.content
+    # q=0 excluye la codificación aunque se la prefiera
+    assert get_business(stack, 'gzip;q=0.5, br;q=0').headers["Content-Encoding"] == 'gzip'
+
+
+def test_versioned_url_is_cached_as_immutable(stack):
+    unversioned = get_business(stack)
+    version = unversioned.headers["X-Business-Version"]
+    assert unversioned.headers["Cache-Control"] == 'public, max-age=60, must-revalidate'
+
+    versioned = get_business(stack, params={"v": version})
+    assert versioned.headers["Cache-Control"] == 'public, max-age=31536000, immutable'
+    # Una versión vieja recibe el contenido vigente, pero con el cache corto
+    stale = get_business(stack, params={"v": "version-vieja"})
+    assert stale.headers["Cache-Control"] == 'public, max-age=60, must-revalidate'
+    assert stale.content == unversioned.content
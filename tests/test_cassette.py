@@ -0,0 +1,79 @@
+"""Cassettes de Groq: lo grabado en modo record se reproduce igual en replay, sin llamar a Groq"""
+import json
+
+import pytest
+import requests
+
+from cassette import CassetteStore, fingerprint, split_reply
+
+PAYLOAD = {"model": "llama3-70b-8192", "temperature": 0.7,
+           "messages": [{"role": "user", "content": "¿Hacen envíos?"}]}
+USAGE = {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150}
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / 'cassettes.db')
+    CassetteStore(path).put(PAYLOAD, "Sí, enviamos a CABA.", USAGE, 250.0)
+
+    replay = CassetteStore(path, latency_scale=0.5)
+    recorded = replay.get({**PAYLOAD, "stream": True})
+    assert recorded == {"reply": "Sí, enviamos a CABA.", "usage": USAGE, "latency_ms": 250.0, "delay": 0.125}
+    assert replay.get({**PAYLOAD, "temperature": 0.2}) is None
+    assert (replay.replayed, replay.misses) == (1, 1)
+
+
+def test_fingerprint_ignores_key_order_and_stream():
+    reordered = json.loads(json.dumps(dict(reversed(list(PAYLOAD.items())))))
+    assert fingerprint(reordered) == fingerprint({**PAYLOAD, "stream": False})
+
+
+def test_split_reply_preserves_the_text():
+    reply = "¡Hola! Respuesta de prueba grabada para reproducir como stream"
+    chunks = split_reply(reply, 16)
+    assert ''.join(chunks) == reply
+    assert all(len(chunk) <= 16 for chunk in chunks)
+
+
+def completions(stack) -> int:
+    return requests.get(stack.groq_url + '/stats', timeout=5).json()["completions"]
+
+
+def stream_reply(stack, message: str) -> str:
+    """Texto armado con los deltas del stream SSE"""
+    reply = ''
+    event = None
+    with requests.post(stack.url + '/chat/stream', json={"message": message}, stream=True, timeout=30) as response:
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: ') and event == 'delta':
+                reply += json.loads(line[len('data: '):])["content"]
+    return reply
+
+
+@pytest.mark.parametrize('app_kind', ['flask', 'async'])
+def test_recorded_replies_replay_without_groq(app_kind, tmp_path):
+    from load import Stack
+    env = {"GROQ_CASSETTE_PATH": str(tmp_path / 'cassettes.db'), "REPLY_CACHE_ENABLED": "false"}
+    messages = ["¿Hacen envíos?", "¿Qué venden?"]
+
+    recorder = Stack(app_kind, groq_latency=0.0, groq_jitter=0.0, env={**env, "GROQ_MODE": "record"})
+    try:
+        recorded = [requests.post(recorder.url + '/chat', json={"message": message}, timeout=30).json()["reply"]
+                    for message in messages]
+        assert completions(recorder) == len(messages)
+    finally:
+        recorder.close()
+
+    player = Stack(app_kind, groq_latency=0.0, groq_jitter=0.0, env={**env, "GROQ_MODE": "replay"})
+    try:
+        replayed = [requests.post(player.url + '/chat', json={"message": message}, timeout=30).json()["reply"]
+                    for message in messages]
+        assert replayed == recorded
+        # El stream reproduce la misma grabación en deltas
+        assert stream_reply(player, messages[0]) == recorded[0]
+        missing = requests.post(player.url + '/chat', json={"message": "Algo que nunca se grabó"}, timeout=30)
+        assert "GROQ_MODE=replay" in missing.json()["reply"]
+        assert completions(player) == 0
+    finally:
+        player.close()
@@ -0,0 +1,59 @@
+"""Índice del catálogo: relevancia con tildes, plurales, sinónimos, SKU exacto e idf"""
+from catalog_index import CatalogIndex, tokenize
+
+CATALOG = [
+    {"sku": "PP-SALMON", "title": "Salmón rosado con puré", "price": 15000,
+     "attrs": {"category": "Platos principales", "segment": "Pescados", "tags": []}},
+    {"sku": "PP-POLLO", "title": "Pata muslo al limón", "price": 9000,
+     "attrs": {"category": "Platos principales", "segment": "Aves", "tags": ["sin tacc"]}},
+    {"sku": "PP-CORDERO", "title": "Cordero braseado con puré", "price": 18000,
+     "attrs": {"category": "Platos principales", "segment": "Carnes", "tags": []}},
+    {"sku": "PO-CHOCO", "title": "Chocotorta", "price": 6000,
+     "attrs": {"category": "Postres", "segment": "Dulces", "tags": ["sin tacc"]}},
+    {"sku": "GU-PAPAS", "title": "Papas rústicas", "price": 4000,
+     "attrs": {"category": "Guarniciones", "segment": "Vegetariano", "tags": []}},
+]
+
+
+def test_tokenize_normalizes_accents_plurals_and_synonyms():
+    assert tokenize("¿Cuánto sale el salmón?") == ["salmon"]
+    assert tokenize("Chicken") == tokenize("pollos") == ["pollo"]
+    assert tokenize("tortas de limones") == ["torta", "limon"]
+
+
+def test_search_ranks_the_matching_product_first():
+    index = CatalogIndex(CATALOG)
+    assert index.search("¿tenés salmon?")[0] == "PP-SALMON"
+    assert index.search("quiero algo de chicken")[0] == "PP-POLLO"
+    assert index.search("un postre")[0] == "PO-CHOCO"
+
+
+def test_rare_terms_outweigh_common_ones():
+    # "puré" aparece en dos productos, "cordero" en uno solo
+    assert CatalogIndex(CATALOG).search("cordero con puré")[0] == "PP-CORDERO"
+
+
+def test_exact_sku_wins_over_text_matches():
+    assert CatalogIndex(CATALOG).search("salmón o GU-PAPAS?")[0] == "GU-PAPAS"
+
+
+def test_search_drops_weak_matches_and_unknown_words():
+    index = CatalogIndex(CATALOG)
+    assert index.search("sin tacc", top_n=8) == ["PP-POLLO", "PO-CHOCO"]
+    assert index.search("platos", top_n=1) == ["PP-SALMON"]
+    assert index.search("hola, gracias") == []
+    assert index.search("") == []
+
+
+def test_patched_index_matches_a_fresh_one():
+    index = CatalogIndex(CATALOG)
+    upserts = [{"sku": "PP-SALMON", "title": "Trucha grillada", "price": 14000,
+                "attrs": {"category": "Platos principales", "segment": "Pescados", "tags": []}}]
+    patched = index.patched(upserts, ["PO-CHOCO"])
+    fresh = CatalogIndex([upserts[0]] + [p for p in CATALOG[1:] if p["sku"] != "PO-CHOCO"])
+
+    for query in ("salmon", "trucha", "postre", "sin tacc", "puré", "platos principales"):
+        assert patched.search(query) == fresh.search(query)
+    assert patched.categories() == fresh.categories()
+    # El índice original no cambia
+    assert index.search("salmon")[0] == "PP-SALMON"
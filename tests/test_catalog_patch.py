@@ -0,0 +1,164 @@
+"""PATCH /business/catalog: recálculo incremental igual a compilar de cero, conflictos, auth y swap atómico"""
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+
+import pytest
+import requests
+
+from conftest import REPO_DIR, wait_for
+
+ADMIN_TOKEN = "token-de-prueba"
+STACK_OPTIONS = {"env": {"CATALOG_ADMIN_TOKEN": ADMIN_TOKEN}}
+AUTH = {"Authorization": f"Bearer {ADMIN_TOKEN}"}
+
+# Cambios de productos (reutiliza fragmentos), de descuentos (recalcula todas las ofertas) y mixtos
+DELTAS = [
+    {"upsert": [{"sku": "PP-PM-CALAB", "price": 13000},
+                {"sku": "TEST-TARTA", "title": "Tarta de calabaza y queso", "price": 9900,
+                 "attrs": {"category": "Tartas", "segment": "Vegetariano", "tags": ["sin tacc"]}}],
+     "delete": ["PP-CORD-PURE"]},
+    {"discounts": {"upsert": [{"key": "cash", "label": "Efectivo", "percent": 10}]}},
+    {"upsert": [{"sku": "TEST-TARTA", "title": "Tarta de calabaza"}], "discounts": {"delete": ["cash"]}}
+]
+QUERIES = ["calabaza", "cordero con puré", "tarta sin tacc", "¿cuánto sale la pata muslo?", "hola"]
+
+
+def compare_snapshots(patched, fresh) -> list:
+    """Diferencias entre el snapshot parchado y el compilado de cero (vacía si son iguales)"""
+    differences = []
+
+    def check(what, got, expected):
+        if got != expected:
+            differences.append(what)
+
+    check("version", patched.version, fresh.version)
+    check("data", patched.data, fresh.data)
+    check("prompt_prefix", patched.prompt_prefix, fresh.prompt_prefix)
+    check("categories", patched.index.categories(), fresh.index.categories())
+    for query in QUERIES:
+        check(f"search {query}", patched.index.search(query), fresh.index.search(query))
+    for locale in patched.locales():
+        got, expected = patched.for_locale(locale), fresh.for_locale(locale)
+        check(f"{locale} offers", got.table.offers(), expected.table.offers())
+        check(f"{locale} full_prompt", got.full_prompt, expected.full_prompt)
+        skus = expected.table.skus[:5]
+        check(f"{locale} prompt_for", got.prompt_for(skus), expected.prompt_for(skus))
+    return differences
+
+
+def patch_parity(workdir: str) -> list:
+    """En un proceso aparte (app tiene estado global): aplica DELTAS sobre un snapshot con todo
+    compilado y compara cada resultado con una compilación de cero del archivo escrito"""
+    os.chdir(workdir)
+    os.environ.update({"GROQ_DEBUG": "false", "GROQ_SAVE_DEBUG": "false"})
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app
+    from business_cache import CompiledBusiness, content_hash
+
+    differences = []
+    app.preload_state()
+    for i, delta in enumerate(DELTAS):
+        # Fragmentos de todos los productos ya renderizados, para que el parche los reutilice
+        snapshot = app.business_cache.get()
+        for locale in snapshot.locales():
+            snapshot.for_locale(locale).full_prompt
+        snapshot.index
+
+        app.patch_business_catalog(app.parse_catalog_delta(delta))
+        with open(app.BUSINESS_JSON_PATH, 'rb') as f:
+            raw = f.read()
+        data = json.loads(raw)
+        fresh = CompiledBusiness(app.BusinessProfile(data), data, content_hash(raw),
+                                 app.compile_business_locale, app.build_prompt_prefix)
+        differences += [f"delta {i}: {what}" for what in compare_snapshots(app.business_cache.get(), fresh)]
+    return differences
+
+
+def test_patched_snapshot_matches_fresh_compile(tmp_path):
+    shutil.copytree(os.path.join(REPO_DIR, 'data'), tmp_path / 'data')
+    (tmp_path / 'debug_data').mkdir()
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        assert pool.apply(patch_parity, (str(tmp_path),)) == []
+
+
+def current_version(stack) -> str:
+    return requests.get(stack.url + '/business', timeout=10).headers["X-Business-Version"]
+
+
+def test_stale_base_version_conflicts(stack):
+    base = current_version(stack)
+    first = requests.patch(stack.url + '/business/catalog', headers=AUTH, timeout=10, json={
+        "upsert": [{"sku": "PP-PM-CALAB", "price": 12900}], "base_version": base})
+    assert first.status_code == 200
+    assert first.json()["previous_version"] == base
+
+    stale = requests.patch(stack.url + '/business/catalog', headers=AUTH, timeout=10, json={
+        "upsert": [{"sku": "PP-PM-CALAB", "price": 12800}], "base_version": base})
+    assert stale.status_code == 409
+    assert stale.json()["business_version"] == first.json()["version"]
+    assert current_version(stack) == first.json()["version"]
+
+
+def test_patch_requires_admin_token(stack):
+    delta = {"upsert": [{"sku": "PP-PM-CALAB", "price": 1}]}
+    before = current_version(stack)
+    for headers in ({}, {"Authorization": "Bearer otro-token"}, {"Authorization": ADMIN_TOKEN}):
+        response = requests.patch(stack.url + '/business/catalog', headers=headers, json=delta, timeout=10)
+        assert response.status_code == 401
+    assert current_version(stack) == before
+
+
+@pytest.mark.parametrize('app_kind', ['flask', 'async'])
+def test_patch_disabled_without_admin_token(app_kind):
+    from load import Stack
+    stack = Stack(app_kind, groq_latency=0.0, groq_jitter=0.0, env={"CATALOG_ADMIN_TOKEN": ""})
+    try:
+        response = requests.patch(stack.url + '/business/catalog', headers=AUTH, timeout=10,
+                                  json={"upsert": [{"sku": "PP-PM-CALAB", "price": 1}]})
+        assert response.status_code == 403
+    finally:
+        stack.close()
+
+
+def test_readers_never_see_a_mixed_snapshot(stack):
+    business = requests.get(stack.url + '/business', timeout=10).json()
+    products = {business["version"]: len(business["catalog"])}
+    observed = []
+    header_mismatches = []
+    stop = threading.Event()
+
+    def read():
+        session = requests.Session()
+        while not stop.is_set():
+            response = session.get(stack.url + '/business', timeout=10)
+            body = response.json()
+            if response.headers["X-Business-Version"] != body["version"]:
+                header_mismatches.append((response.headers["X-Business-Version"], body["version"]))
+            observed.append((body["version"], len(body["catalog"])))
+            chat = session.post(stack.url + '/chat', json={"message": "Hola, ¿qué venden?"}, timeout=30).json()
+            observed.append((chat["business_version"], chat["usage"]["catalog"]["products_total"]))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    try:
+        # Cada versión agrega un SKU: la versión determina cuántos productos ve el lector
+        for i in range(10):
+            # Cada parche espera lecturas nuevas para que se intercalen con las escrituras
+            wait_for(lambda: len(observed) >= 3 * (i + 1))
+            result = requests.patch(stack.url + '/business/catalog', headers=AUTH, timeout=10, json={
+                "upsert": [{"sku": f"MIX-{i}", "title": f"Producto agregado {i}", "price": 1000 + i}]}).json()
+            products[result["version"]] = result["products"]
+    finally:
+        stop.set()
+        for reader in readers:
+            reader.join(timeout=30)
+
+    assert len(observed) > 20
+    assert header_mismatches == []
+    assert {version for version, _ in observed} <= set(products)
+    assert all(count == products[version] for version, count in observed)
@@ -0,0 +1,69 @@
+"""/chat/batch contra un Groq falso local: totales del lote y registro cuando el cliente corta"""
+import json
+
+import requests
+
+from conftest import wait_for
+
+STACK_OPTIONS = {"groq_latency": 0.2}
+
+
+def recorded_batch(stack, batch_id: str):
+    """Totales del lote en /debug/batches, esperando a que se registren"""
+    def find():
+        for batch in requests.get(stack.url + '/debug/batches', timeout=10).json():
+            if batch["id"] == batch_id:
+                return batch
+        return None
+
+    return wait_for(find)
+
+
+def test_batch_streams_items_then_totals(stack):
+    messages = [{"id": f"m{i}", "message": f"Pregunta número {i}"} for i in range(5)]
+    response = requests.post(stack.url + '/chat/batch', json={"messages": messages}, timeout=30)
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+
+    items, summary = lines[:-1], lines[-1]["batch"]
+    assert sorted(item["id"] for item in items) == [f"m{i}" for i in range(5)]
+    assert all(item["status"] == 200 for item in items)
+    assert summary["id"] == response.headers["X-Batch-Id"]
+    assert summary["completed"]
+    assert recorded_batch(stack, summary["id"])["completed"]
+
+
+def test_batch_rejects_invalid_items(stack):
+    response = requests.post(stack.url + '/chat/batch', json={"messages": "no es una lista"}, timeout=10)
+    assert response.status_code == 400
+
+
+def test_batch_rejects_invalid_locales(stack):
+    response = requests.post(stack.url + '/chat/batch', json={"messages": ["Hola"], "locale": ["es-AR"]}, timeout=10)
+    assert response.status_code == 400
+
+    messages = [{"id": "ok", "message": "Hola", "locale": "en-US"},
+                {"id": "lista", "message": "Hola", "locale": ["es-AR"]},
+                {"id": "largo", "message": "Hola", "locale": "x" * 500}]
+    response = requests.post(stack.url + '/chat/batch', json={"messages": messages}, timeout=30)
+    items = {item["id"]: item for item in map(json.loads, response.text.splitlines()[:-1])}
+    assert items["ok"]["status"] == 200
+    assert items["lista"]["status"] == 400
+    assert items["largo"]["status"] == 400
+
+
+def test_disconnect_records_incomplete_batch(stack):
+    messages = [f"Consulta larga {i}" for i in range(40)]
+    response = requests.post(stack.url + '/chat/batch', json={"messages": messages}, stream=True, timeout=30)
+    batch_id = response.headers["X-Batch-Id"]
+    first = json.loads(next(response.iter_lines()))
+    assert first["status"] == 200
+    response.close()
+
+    batch = recorded_batch(stack, batch_id)
+    assert batch is not None
+    assert not batch["completed"]
+    assert batch["items"] < len(messages)
+
+    # El servidor sigue atendiendo después del corte
+    assert requests.get(stack.url + '/', timeout=10).status_code == 200
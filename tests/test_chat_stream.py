@@ -0,0 +1,92 @@
+"""/chat/stream contra un Groq falso local: eventos SSE y limpieza cuando el cliente se desconecta"""
+import json
+import os
+import sqlite3
+
+import requests
+
+from conftest import wait_for
+
+# Mensaje largo: la respuesta falsa lo repite y sale en ~15 chunks
+LONG_MESSAGE = "Quiero saber todo sobre los productos, precios y formas de pago disponibles. " * 3
+
+STACK_OPTIONS = {"groq_chunk_delay": 0.1, "env": {
+    "ADMISSION_ENABLED": "true",
+    "ADMISSION_TOKENS_PER_MINUTE": "1000000",
+    "ADMISSION_USD_PER_DAY": "1000"
+}}
+
+
+def read_events(response):
+    """Parsea el stream SSE en tuplas (evento, datos)"""
+    event = None
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event: '):
+            event = line[len('event: '):]
+        elif line.startswith('data: '):
+            yield event, json.loads(line[len('data: '):])
+
+
+def daily_spend(stack) -> float:
+    with sqlite3.connect(os.path.join(stack.workdir, 'debug_data', 'admission.db')) as conn:
+        row = conn.execute("SELECT COALESCE(SUM(cost_usd), 0) FROM daily_spend").fetchone()
+    return row[0]
+
+
+def stream_counts(stack) -> dict:
+    return requests.get(stack.groq_url + '/stats', timeout=5).json()["streams"]
+
+
+def test_stream_sends_deltas_then_done(stack):
+    with requests.post(stack.url + '/chat/stream', json={"message": "Hola, ¿qué venden?"},
+                       stream=True, timeout=30) as response:
+        assert response.status_code == 200
+        events = list(read_events(response))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[-1] == 'done'
+    assert set(kinds[:-1]) == {'delta'}
+    assert len(kinds) > 2
+
+    reply = ''.join(data["content"] for _, data in events[:-1])
+    assert reply.startswith("¡Hola! Respuesta de prueba para:")
+    assert events[-1][1]["reply"] == reply
+
+
+def test_stream_matches_chat(stack):
+    message = "¿Aceptan tarjeta de crédito?"
+    chat = requests.post(stack.url + '/chat', json={"message": message}, timeout=30).json()
+    with requests.post(stack.url + '/chat/stream', json={"message": message}, stream=True, timeout=30) as response:
+        events = list(read_events(response))
+
+    assert events[-1][0] == 'done'
+    assert events[-1][1]["reply"] == chat["reply"]
+
+
+def test_completed_stream_keeps_its_charge(stack):
+    before = daily_spend(stack)
+    with requests.post(stack.url + '/chat/stream', json={"message": LONG_MESSAGE}, stream=True, timeout=30) as response:
+        events = list(read_events(response))
+
+    assert events[-1][0] == 'done'
+    assert daily_spend(stack) > before
+
+
+def test_disconnect_closes_upstream_and_keeps_charge(stack):
+    before_spend = daily_spend(stack)
+    before_counts = stream_counts(stack)
+
+    response = requests.post(stack.url + '/chat/stream', json={"message": LONG_MESSAGE}, stream=True, timeout=30)
+    kind, _ = next(read_events(response))
+    assert kind == 'delta'
+    # Mientras el stream sigue abierto la reserva está cobrada
+    reserved = daily_spend(stack)
+    assert reserved > before_spend
+    response.close()
+
+    # El backend corta la conexión con Groq antes de que termine la respuesta...
+    assert wait_for(lambda: stream_counts(stack)["aborted"] > before_counts["aborted"])
+    assert stream_counts(stack)["completed"] == before_counts["completed"]
+    # ...y ajusta la reserva a lo estimado de lo generado, sin devolverla
+    assert wait_for(lambda: daily_spend(stack) < reserved)
+    assert daily_spend(stack) > before_spend
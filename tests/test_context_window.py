@@ -0,0 +1,88 @@
+"""Ventana de contexto: el prompt se estima sin red, se recorta (historial y después catálogo) o se rechaza con 413"""
+import contextlib
+import multiprocessing
+import os
+import shutil
+
+import requests
+
+from conftest import REPO_DIR
+
+# Mensaje que trae varios productos del catálogo al prompt
+CATALOG_MESSAGE = "¿Qué tienen de pollo, carne, cordero, pescado, pastas y postres?"
+HISTORY = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"Mensaje {i}: " + "texto " * 60}
+           for i in range(6)]
+
+
+def fit_scenarios(workdir: str) -> dict:
+    """En un proceso aparte (app tiene estado global): corre prepare_chat con el espacio para el
+    prompt (ventana - GROQ_MAX_TOKENS) justo por debajo de lo que ocupa cada parte"""
+    os.chdir(workdir)
+    os.environ.update({"GROQ_DEBUG": "false", "GROQ_SAVE_DEBUG": "false"})
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app
+
+    def prepare(data: dict, max_prompt_tokens: int = None):
+        window = app.token_estimator.context_window(app.GROQ_MODEL)
+        app.GROQ_MAX_TOKENS = window - max_prompt_tokens if max_prompt_tokens else 700
+        try:
+            context = app.prepare_chat(data)
+        except app.ChatRequestError as e:
+            return {"status": e.status, "body": e.body}
+        return {
+            "status": 200,
+            "tokens": context["prompt_estimate"]["tokens"],
+            "trimmed": context["prompt_estimate"]["trimmed"],
+            "history": context["history"],
+            "products_included": context["catalog_info"]["products_included"]
+        }
+
+    results = {}
+    with_history = {"message": "¿Hacen envíos?", "history": HISTORY}
+    results["fits"] = prepare(with_history)
+    without_history = prepare({"message": "¿Hacen envíos?"})
+    results["history"] = prepare(with_history, without_history["tokens"])
+
+    full = prepare({"message": CATALOG_MESSAGE})
+    results["full_catalog"] = full
+    results["catalog"] = prepare({"message": CATALOG_MESSAGE}, full["tokens"] - 1)
+    results["too_large"] = prepare({"message": CATALOG_MESSAGE}, 50)
+    return results
+
+
+def test_prompt_is_trimmed_before_rejecting(tmp_path):
+    shutil.copytree(os.path.join(REPO_DIR, 'data'), tmp_path / 'data')
+    (tmp_path / 'debug_data').mkdir()
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        results = pool.apply(fit_scenarios, (str(tmp_path),))
+
+    assert results["fits"]["trimmed"] == []
+    assert len(results["fits"]["history"]) == len(HISTORY)
+
+    # Primero se descartan los turnos del historial
+    assert results["history"]["status"] == 200
+    assert results["history"]["trimmed"] == ["history"]
+    assert results["history"]["history"] == []
+
+    # Después el catálogo se achica a la mitad de productos
+    assert results["full_catalog"]["products_included"] >= 2
+    assert results["catalog"]["trimmed"] == ["catalog"]
+    assert results["catalog"]["tokens"] < results["full_catalog"]["tokens"]
+    assert results["catalog"]["products_included"] <= results["full_catalog"]["products_included"] // 2
+
+    # Si ni el resumen del catálogo entra, 413 con lo estimado
+    too_large = results["too_large"]
+    assert too_large["status"] == 413
+    assert too_large["body"]["max_prompt_tokens"] == 50
+    assert too_large["body"]["estimated_tokens"] > 50
+
+
+def test_oversized_message_gets_413_without_calling_groq(stack):
+    before = requests.get(stack.groq_url + '/stats', timeout=5).json()["completions"]
+    response = requests.post(stack.url + '/chat', json={"message": "palabra " * 10000}, timeout=30)
+
+    assert response.status_code == 413
+    body = response.json()
+    assert body["estimated_tokens"] > body["max_prompt_tokens"]
+    assert body["context_window"] == 8192
+    assert requests.get(stack.groq_url + '/stats', timeout=5).json()["completions"] == before
@@ -0,0 +1,66 @@
+"""Endpoints /debug en las dos variantes del backend (Flask y asyncio)"""
+import requests
+
+from conftest import wait_for
+
+
+def test_summary_prints_to_console(stack):
+    response = requests.get(stack.url + '/debug/summary', params={"type": "total"}, timeout=10)
+    assert response.status_code == 200
+    assert response.json() == {"message": "Resumen de total impreso en consola"}
+
+
+def wait_for_entries(stack, count: int):
+    """El log se escribe en segundo plano: espera a que aparezcan los registros"""
+    entries = []
+
+    def enough() -> bool:
+        entries[:] = requests.get(stack.url + '/debug/usage_log', params={"limit": 1000}, timeout=10).json()
+        return len(entries) >= count
+
+    wait_for(enough)
+    return entries
+
+
+def test_usage_log_pages_with_cursor(stack):
+    for message in ("¿Qué venden?", "¿Hacen envíos?", "¿Aceptan tarjeta?"):
+        assert requests.post(stack.url + '/chat', json={"message": message}, timeout=30).status_code == 200
+    everything = wait_for_entries(stack, 3)
+    assert len(everything) >= 3
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 2, "since": 0}
+        if cursor:
+            params["cursor"] = cursor
+        response = requests.get(stack.url + '/debug/usage_log', params=params, timeout=10)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2
+        pages.extend(response.json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert pages == everything
+
+
+def test_usage_log_filters_by_model(stack):
+    wait_for_entries(stack, 1)
+    response = requests.get(stack.url + '/debug/usage_log', params={"model": "no-existe"}, timeout=10)
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+def test_usage_log_rejects_invalid_parameters(stack):
+    for params in ({"since": "ayer"}, {"cursor": "x"}, {"cursor": "-1"}, {"limit": "muchos"}):
+        response = requests.get(stack.url + '/debug/usage_log', params=params, timeout=10)
+        assert response.status_code == 400
+        assert response.json()["error"].startswith("Parámetro inválido")
+
+
+def test_stats_include_requests_just_served(stack):
+    before = requests.get(stack.url + '/debug/stats', params={"type": "today"}, timeout=10).json()
+    assert requests.post(stack.url + '/chat', json={"message": "¿Abren los domingos?"}, timeout=30).status_code == 200
+    after = requests.get(stack.url + '/debug/stats', params={"type": "today"}, timeout=10).json()
+    assert after["total_requests"] == before.get("total_requests", 0) + 1
+
+    assert requests.get(stack.url + '/debug/stats', params={"type": "semana"}, timeout=10).status_code == 400
@@ -0,0 +1,63 @@
+"""Histogramas logarítmicos: percentiles con error acotado y merge sumando buckets"""
+import math
+import random
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from histogram import RELATIVE_ERROR, bucket_for, bucket_value, percentiles
+from usage_store import UsageStore
+
+
+def histogram(values) -> list:
+    return list(Counter(bucket_for(value) for value in values).items())
+
+
+def exact_percentile(values, rank: int) -> float:
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(rank / 100 * len(ordered))) - 1]
+
+
+def test_bucket_value_is_within_relative_error():
+    for value in (0.0001, 0.37, 1, 42.5, 1234.5, 9_999_999):
+        assert bucket_value(bucket_for(value)) == pytest.approx(value, rel=RELATIVE_ERROR)
+    assert bucket_value(bucket_for(0)) == 0.0
+
+
+def test_percentiles_match_exact_values():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(5, 1) for _ in range(5000)]
+    result = percentiles(histogram(values))
+
+    assert result["count"] == len(values)
+    for rank in (50, 95, 99):
+        assert result[f"p{rank}"] == pytest.approx(exact_percentile(values, rank), rel=RELATIVE_ERROR)
+
+
+def test_merged_histograms_equal_the_histogram_of_all_values():
+    rng = random.Random(11)
+    morning = [rng.uniform(50, 200) for _ in range(700)]
+    night = [rng.uniform(800, 3000) for _ in range(300)] + [0.0] * 10
+
+    merged = percentiles(histogram(morning) + histogram(night))
+    assert merged == percentiles(histogram(morning + night))
+    assert merged["count"] == 1010
+    assert percentiles([]) == {"count": 0, "p50": None, "p95": None, "p99": None}
+
+
+def test_store_merges_periods_without_keeping_samples(tmp_path):
+    store = UsageStore(str(tmp_path / 'usage.db'))
+    latencies = {datetime(2025, 8, 1, 10): [100.0] * 90, datetime(2025, 8, 2, 10): [1000.0] * 10}
+    store.record_batch([
+        {"when": when, "model": "llama3-70b-8192", "requests": 1, "latency_ms": latency}
+        for when, values in latencies.items() for latency in values
+    ])
+
+    month = store.percentiles('month', '2025-08')["llama3-70b-8192"]["latency_ms"]
+    assert month["count"] == 100
+    assert month["p50"] == pytest.approx(100, rel=RELATIVE_ERROR)
+    assert month["p95"] == pytest.approx(1000, rel=RELATIVE_ERROR)
+    # Sin período se combinan los días
+    assert store.percentiles('day')["llama3-70b-8192"]["latency_ms"] == month
+    assert store.percentiles('day', '2025-08-02')["llama3-70b-8192"]["latency_ms"]["count"] == 10
@@ -0,0 +1,115 @@
+"""Ruteo por intención: respuesta fija, modelo chico o grande según el mensaje"""
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from catalog_index import CatalogIndex
+from conftest import REPO_DIR
+from intent_router import IntentRouter, build_templates, classify, template_language
+
+with open(os.path.join(REPO_DIR, 'data', 'business.json'), encoding='utf-8') as f:
+    BUSINESS = json.load(f)
+INDEX = CatalogIndex(BUSINESS["catalog"])
+TEMPLATES = build_templates(BUSINESS, BUSINESS["defaultLocale"])
+
+
+def route(message: str, history_messages: int = 0, small_model: str = "llama3-8b-8192") -> dict:
+    router = IntentRouter("llama3-70b-8192", small_model)
+    return router.route(message, lambda text, limit: len(INDEX.search(text, limit)), history_messages,
+                        TEMPLATES, "¡Gracias!")
+
+
+def test_classify_separates_intents_from_catalog_words():
+    info = classify("¿Cuánto sale el envío?")
+    assert info["intents"] == ["delivery"]
+    assert info["catalog_words"] == 2
+    assert info["rest"] == "cuanto sale"
+
+    assert classify("Hola, gracias")["intents"] == ["greeting", "thanks"]
+    assert classify("¿Me recomendás algo para 6 personas?")["reasoning"] is True
+
+
+@pytest.mark.parametrize('message,intent', [
+    ("Hola", "greeting"),
+    ("¿Hacen envíos?", "delivery"),
+    ("¿Qué medios de pago tienen?", "payments"),
+    ("¡Muchas gracias!", "thanks"),
+])
+def test_simple_questions_get_a_template_reply(message, intent):
+    decision = route(message)
+    assert decision["tier"] == "template"
+    assert decision["intent"] == intent
+    assert decision["reply"]
+
+
+def test_template_combines_greeting_with_the_informative_answer():
+    reply = route("Hola, ¿hacen envíos?")["reply"]
+    assert reply.startswith(TEMPLATES["hello"])
+    assert TEMPLATES["delivery"] in reply
+    assert reply.endswith("¡Gracias!")
+
+
+def test_price_of_shipping_is_not_answered_with_a_template():
+    # "cuánto sale" pide un monto: la política de envíos sola no lo contesta
+    decision = route("¿Cuánto sale el envío?")
+    assert decision["tier"] != "template"
+    assert "reply" not in decision
+
+
+@pytest.mark.parametrize('message,tier,reason', [
+    ("¿Cuánto sale la tarta de calabaza?", "small", "simple"),
+    ("¿Qué me recomendás para un evento de 20 personas?", "large", "reasoning"),
+])
+def test_model_tier_follows_message_complexity(message, tier, reason):
+    decision = route(message)
+    assert (decision["tier"], decision["reason"]) == (tier, reason)
+
+
+def test_long_history_or_missing_small_model_goes_large():
+    assert route("¿Cuánto sale la tarta de calabaza?", history_messages=10)["reason"] == "long_history"
+    assert route("¿Cuánto sale la tarta de calabaza?", small_model=None)["reason"] == "no_small_model"
+
+
+def test_templates_in_other_languages_only_cover_social_intents():
+    templates = build_templates(BUSINESS, "en-US")
+    assert set(templates) == {"hello", "greeting", "thanks"}
+    assert build_templates(BUSINESS, "fr-FR") == {}
+
+
+def test_template_language_only_accepts_languages_with_templates():
+    assert template_language("es-AR") == template_language("ES") == "es"
+    assert template_language("pt-BR") == "pt"
+    assert template_language("xx-1") is None
+    assert template_language(None) is None
+
+
+def cached_templates(workdir: str) -> dict:
+    """En un proceso aparte (app tiene estado global): pide las respuestas fijas con locales arbitrarios"""
+    os.chdir(workdir)
+    os.environ.update({"GROQ_DEBUG": "false", "GROQ_SAVE_DEBUG": "false"})
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app
+
+    compiled = app.business_cache.get()
+    for n in range(500):
+        assert app.business_templates(compiled, f"xx-{n}") == {}
+    for locale in ("es-AR", "es-MX", "en-US", "en-GB", "pt-BR"):
+        app.business_templates(compiled, locale)
+    return {
+        "keys": sorted(key for key in compiled._derived if key.startswith('templates:')),
+        "es-MX": app.business_templates(compiled, "es-MX") == build_templates(compiled.data, "es-AR")
+    }
+
+
+def test_template_cache_is_bounded_by_language(tmp_path):
+    shutil.copytree(os.path.join(REPO_DIR, 'data'), tmp_path / 'data')
+    (tmp_path / 'debug_data').mkdir()
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        result = pool.apply(cached_templates, (str(tmp_path),))
+
+    assert result["keys"] == ["templates:en", "templates:es", "templates:pt"]
+    assert result["es-MX"]
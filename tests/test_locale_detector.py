@@ -0,0 +1,41 @@
+"""Detector de idioma: precisión mínima sobre el corpus etiquetado, fallback sin señales y locale del cliente"""
+import pytest
+import requests
+
+from bench_locale import FALLBACK, accuracy, load_corpus, legacy_detect_locale
+from locale_detector import locale_detector
+
+MIN_ACCURACY = 0.95
+MIN_LOCALE_ACCURACY = 0.90
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    return load_corpus()
+
+
+def test_corpus_accuracy(corpus):
+    result = accuracy(locale_detector.detect, corpus)
+    assert result["accuracy"] >= MIN_ACCURACY, result["errors"]
+    assert set(result["per_locale"]) == set(locale_detector.locales)
+    for locale, locale_accuracy in result["per_locale"].items():
+        assert locale_accuracy >= MIN_LOCALE_ACCURACY, (locale, result["errors"])
+    # No puede quedar por debajo del scan de palabras clave que reemplazó
+    assert result["accuracy"] >= accuracy(legacy_detect_locale, corpus)["accuracy"]
+
+
+def test_without_signals_uses_fallback_or_accept_language():
+    assert locale_detector.detect('', FALLBACK, None) == FALLBACK
+    assert locale_detector.detect('123', FALLBACK, None) == FALLBACK
+    assert locale_detector.detect('ok', FALLBACK, 'pt-BR,pt;q=0.9') == 'pt-BR'
+
+
+def test_chat_validates_client_locale(stack):
+    for locale in (["es-AR"], {"es": "AR"}, 42, "x" * 500, "es_AR; DROP"):
+        response = requests.post(stack.url + '/chat', json={"message": "Hola", "locale": locale}, timeout=30)
+        assert response.status_code == 400, locale
+        assert "locale" in response.json()["error"]
+
+    response = requests.post(stack.url + '/chat', json={"message": "Hola", "locale": "pt-BR"}, timeout=30)
+    assert response.status_code == 200
+    assert response.json()["locale"] == "pt-BR"
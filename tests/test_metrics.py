@@ -0,0 +1,82 @@
+"""Métricas en formato de texto de Prometheus: render del registro y GET /metrics después de un /chat"""
+import re
+
+import requests
+
+from metrics import Counter, Histogram, MetricsRegistry, StageTimer
+
+SAMPLE_RE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str) -> dict:
+    """{(nombre, labels ordenados): valor}; falla si alguna línea no respeta el formato"""
+    assert text.endswith('\n')
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('# HELP ') or line.startswith('# TYPE '):
+            continue
+        match = SAMPLE_RE.match(line)
+        assert match, f"línea inválida: {line!r}"
+        labels = tuple(sorted(LABEL_RE.findall(match.group(2) or '')))
+        samples[(match.group(1), labels)] = float(match.group(3))
+    return samples
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, ("groq",))
+
+    assert histogram.render() == [
+        "# HELP demo_seconds Demo",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{stage="groq",le="0.1"} 1',
+        'demo_seconds_bucket{stage="groq",le="1.0"} 3',
+        'demo_seconds_bucket{stage="groq",le="+Inf"} 4',
+        'demo_seconds_sum{stage="groq"} 4.25',
+        'demo_seconds_count{stage="groq"} 4'
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("demo_total", "Demo", ("kind",))
+    counter.inc(('dice "hola"\n',), 2)
+    assert counter.render()[-1] == 'demo_total{kind="dice \\"hola\\"\\n"} 2'
+
+
+def test_registry_folds_pending_stage_timings():
+    registry = MetricsRegistry()
+    timer = StageTimer()
+    timer.lap('parse')
+    timer.lap('groq')
+    registry.record_stages('chat', timer)
+    registry.record_stages('chat', timer)
+
+    samples = parse(registry.render())
+    for stage in ('parse', 'groq'):
+        labels = (('endpoint', 'chat'), ('stage', stage))
+        assert samples[("chat_stage_seconds_count", labels)] == 2
+        assert samples[("chat_stage_seconds_bucket", tuple(sorted(labels + (('le', '+Inf'),))))] == 2
+
+
+def test_metrics_endpoint_after_chat(stack):
+    assert requests.post(stack.url + '/chat', json={"message": "Hola, ¿qué venden?"}, timeout=30).status_code == 200
+    response = requests.get(stack.url + '/metrics', timeout=10)
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith('text/plain')
+    assert 'version=0.0.4' in response.headers["Content-Type"]
+    samples = parse(response.text)
+
+    stages = {dict(labels)["stage"] for name, labels in samples
+              if name == "chat_stage_seconds_count" and dict(labels)["endpoint"] == "chat"}
+    assert {"parse", "business", "prompt", "groq", "serialize"} <= stages
+    responses = [value for (name, labels), value in samples.items()
+                 if name == "http_responses_total" and dict(labels)["status"] == "200"]
+    assert sum(responses) >= 1
+    assert "# TYPE http_request_seconds histogram" in response.text
+    # Cada serie del histograma termina en +Inf con el mismo valor que _count
+    for (name, labels), value in samples.items():
+        if name == "chat_stage_seconds_count":
+            assert samples[("chat_stage_seconds_bucket", tuple(sorted(labels + (('le', '+Inf'),))))] == value
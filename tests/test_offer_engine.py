@@ -0,0 +1,199 @@
+"""Paridad de OfferTable (con y sin numpy) contra el cálculo original producto por producto"""
+
+import random
+
+import pytest
+
+import offer_engine
+from offer_engine import OfferTable
+
+
+def format_money(amount, locale, currency):
+    return f"${amount:,}" if currency in ('ARS', 'USD') else f"{amount:,} {currency}"
+
+
+def baseline_offers(catalog, payments, locale='es-AR', currency='ARS'):
+    """El loop por producto que reemplazó OfferTable"""
+    offers = {}
+    for product in catalog:
+        base_price = product.get('price', 0)
+        discounts = []
+        for discount in payments.get('discounts', []):
+            discount_value = int(base_price * (1 - discount['percent'] / 100))
+            discounts.append({
+                'key': discount['key'],
+                'label': discount['label'],
+                'value': discount_value,
+                'formatted': format_money(discount_value, locale, currency)
+            })
+        installments = None
+        if payments.get('installments'):
+            inst_data = payments['installments']
+            count = inst_data.get('count')
+            if count and count > 0:
+                per_installment = int(base_price / count)
+                installments = {
+                    'label': inst_data.get('label', ''),
+                    'perInstallment': per_installment,
+                    'count': count,
+                    'formattedEach': format_money(per_installment, locale, currency)
+                }
+        offers[product['sku']] = {
+            'sku': product['sku'],
+            'title': product['title'],
+            'base_price': base_price,
+            'formatted': {
+                'base': format_money(base_price, locale, currency),
+                'discounts': discounts,
+                'installments': installments
+            }
+        }
+    return offers
+
+
+def random_price(rng):
+    kind = rng.random()
+    if kind < 0.05:
+        return 0
+    if kind < 0.15:
+        return round(rng.uniform(1, 100000), 2)
+    if kind < 0.25:
+        return rng.randrange(10 ** 8, 10 ** 12)
+    return rng.randrange(1, 500000)
+
+
+def random_catalog(rng, size, prefix='SKU'):
+    catalog = []
+    for i in range(size):
+        product = {'sku': f'{prefix}-{i}', 'title': f'Producto {i}'}
+        if rng.random() > 0.02:
+            product['price'] = random_price(rng)
+        catalog.append(product)
+    return catalog
+
+
+def random_payments(rng):
+    percents = [0, 100, 5, 7, 10, 12.5, 15, 33.3, 33.33, 66.6, 99.9]
+    discounts = [{'key': f'd{j}', 'label': f'Descuento {j}', 'percent': rng.choice(percents)}
+                 for j in range(rng.randrange(0, 4))]
+    installments = rng.choice([
+        None,
+        {'count': None, 'label': 'Ver cuotas'},
+        {'count': 0, 'label': 'Sin cuotas'},
+        {'count': rng.choice([1, 3, 6, 7, 12, 18, 24]), 'label': 'Cuotas sin interés'}
+    ])
+    payments = {'discounts': discounts}
+    if installments is not None:
+        payments['installments'] = installments
+    return payments
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    """Corre cada test con el cálculo vectorizado y con el de Python puro"""
+    if request.param == 'numpy':
+        if offer_engine.np is None:
+            pytest.skip("numpy no está instalado")
+    else:
+        monkeypatch.setattr(offer_engine, 'np', None)
+    return request.param
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('duplicates', [0, 5])
+def test_offers_match_baseline(engine, seed, duplicates):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng, rng.randrange(1, 400))
+    # SKUs repetidos con otro título y precio: en el loop original gana el último
+    for product in rng.choices(catalog, k=duplicates):
+        catalog.insert(rng.randrange(len(catalog) + 1),
+                       {'sku': product['sku'], 'title': 'Repetido', 'price': random_price(rng)})
+    payments = random_payments(rng)
+
+    table = OfferTable(catalog, payments, 'es-AR', 'ARS', format_money)
+    expected = baseline_offers(catalog, payments)
+
+    assert table.offers() == expected
+    # Cada SKU se renderiza una sola vez, en el orden del loop original
+    assert table.skus == list(expected)
+    assert len(table) == len(expected)
+
+
+def test_offers_subset_ignores_unknown_skus(engine):
+    rng = random.Random(99)
+    catalog = random_catalog(rng, 50)
+    payments = {'discounts': [{'key': 'cash', 'label': 'Efectivo', 'percent': 10}],
+                'installments': {'count': 3, 'label': '3 cuotas'}}
+    table = OfferTable(catalog, payments, 'es-AR', 'ARS', format_money)
+    expected = baseline_offers(catalog, payments)
+
+    assert table.offers(['SKU-3', 'NOPE', 'SKU-7']) == {'SKU-3': expected['SKU-3'], 'SKU-7': expected['SKU-7']}
+
+
+def patch_catalog(rng, catalog, changes):
+    """Cambia precios, borra y agrega SKUs; retorna (catálogo nuevo, SKUs cambiados)"""
+    new_catalog = [dict(product) for product in catalog]
+    changed = set()
+    for product in rng.sample(new_catalog, min(changes, len(new_catalog))):
+        product['price'] = random_price(rng)
+        changed.add(product['sku'])
+    for product in rng.sample(new_catalog, min(changes // 2, len(new_catalog))):
+        new_catalog.remove(product)
+    for i in range(changes // 2):
+        product = {'sku': f'NEW-{i}', 'title': f'Nuevo {i}', 'price': random_price(rng)}
+        new_catalog.append(product)
+        changed.add(product['sku'])
+    return new_catalog, changed
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('changes', [1, 5, 300])
+def test_patched_matches_fresh_table(engine, seed, changes):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng, 200)
+    payments = random_payments(rng)
+    table = OfferTable(catalog, payments, 'es-AR', 'ARS', format_money)
+    table.offers([product['sku'] for product in catalog[::3]])
+
+    new_catalog, changed = patch_catalog(rng, catalog, changes)
+    patched = table.patched(new_catalog, payments, changed)
+
+    assert patched.offers() == baseline_offers(new_catalog, payments)
+    # La tabla original no cambia
+    assert table.offers() == baseline_offers(catalog, payments)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_patched_with_new_payments_recomputes(engine, seed):
+    rng = random.Random(seed)
+    catalog = random_catalog(rng, 120)
+    payments = {'discounts': [{'key': 'cash', 'label': 'Efectivo', 'percent': 10}],
+                'installments': {'count': 6, 'label': '6 cuotas'}}
+    table = OfferTable(catalog, payments, 'es-AR', 'ARS', format_money)
+    table.offers()
+
+    new_payments = {'discounts': [{'key': 'cash', 'label': 'Efectivo', 'percent': 15},
+                                  {'key': 'transfer', 'label': 'Transferencia', 'percent': 12.5}],
+                    'installments': {'count': 12, 'label': '12 cuotas'}}
+    new_catalog, changed = patch_catalog(rng, catalog, 3)
+    patched = table.patched(new_catalog, new_payments, changed)
+
+    assert patched.offers() == baseline_offers(new_catalog, new_payments)
+
+
+def test_reuse_rows_copies_unchanged_and_computes_missing(engine):
+    catalog = [{'sku': f'S{i}', 'title': f'T{i}', 'price': 1000 * (i + 1)} for i in range(10)]
+    payments = {'discounts': [{'key': 'cash', 'label': 'Efectivo', 'percent': 33.3}],
+                'installments': {'count': 7, 'label': '7 cuotas'}}
+    table = OfferTable(catalog, payments, 'es-AR', 'ARS', format_money)
+
+    new_catalog = [dict(product) for product in catalog]
+    new_catalog[4]['price'] = 123457
+    patched = table.patched(new_catalog, payments, {'S4'})
+
+    assert [int(row[0]) for row in patched.discount_values] == [int(p['price'] * (1 - 33.3 / 100)) for p in new_catalog]
+    assert [int(value) for value in patched.installment_values] == [int(p['price'] / 7) for p in new_catalog]
+    # Las ofertas ya formateadas de los SKUs sin cambios se reutilizan
+    table.offer('S1')
+    assert table.patched(new_catalog, payments, {'S4'}).is_formatted('S1')
+    assert not table.patched(new_catalog, payments, {'S1'}).is_formatted('S1')
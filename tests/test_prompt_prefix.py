@@ -0,0 +1,111 @@
+"""Prefijo cacheable del prompt: mismos bytes en cada request de una versión y costo de los tokens cacheados"""
+import contextlib
+import json
+import multiprocessing
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_DIR
+from debug_tracker import CACHED_INPUT_DISCOUNT, GroqDebugTracker
+
+REQUESTS = [
+    {"message": "Hola, ¿qué venden?", "locale": "es-AR"},
+    {"message": "¿Cuánto sale la pata muslo?", "locale": "es-AR"},
+    {"message": "Do you have vegetarian dishes?", "locale": "en-US"},
+    {"message": "Vocês fazem entrega?", "locale": "pt-BR"},
+    {"message": "Tienen algo sin TACC?"}
+]
+
+
+def prefix_scenarios(workdir: str) -> dict:
+    """En un proceso aparte (app tiene estado global): prompts de varios requests, un cambio de
+    catálogo y un cambio de tono"""
+    os.chdir(workdir)
+    os.environ.update({"GROQ_DEBUG": "false", "GROQ_SAVE_DEBUG": "false"})
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import app
+    from business_cache import CompiledBusiness, content_hash
+
+    app.preload_state()
+    compiled = app.business_cache.get()
+    prefix = compiled.prompt_prefix.encode('utf-8')
+    contexts = [app.prepare_chat(data) for data in REQUESTS]
+    result = {
+        "prefix_chars": len(compiled.prompt_prefix),
+        "starts_with_prefix": [context["system_prompt"].encode('utf-8').startswith(prefix) for context in contexts],
+        "locales": [context["locale"] for context in contexts],
+        "estimate_hashes": [context["prompt_estimate"]["prefix_hash"] for context in contexts],
+        "prefix_hash": compiled.prefix_hash,
+        "version": compiled.version
+    }
+
+    app.patch_business_catalog(app.parse_catalog_delta({"upsert": [{"sku": "PP-PM-CALAB", "price": 12345}]}))
+    patched = app.business_cache.get()
+    result["catalog_change"] = {"version": patched.version, "prefix_hash": patched.prefix_hash,
+                                "prompt_prefix": patched.prompt_prefix == compiled.prompt_prefix}
+
+    with open(app.BUSINESS_JSON_PATH, 'rb') as f:
+        data = json.loads(f.read())
+    data["tone"] = {**data.get("tone", {}), "signoff": "¡Hasta pronto!"}
+    raw = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    retoned = CompiledBusiness(app.BusinessProfile(data), data, content_hash(raw),
+                               app.compile_business_locale, app.build_prompt_prefix)
+    result["tone_change"] = {"version": retoned.version, "prefix_hash": retoned.prefix_hash}
+    return result
+
+
+@pytest.fixture(scope='module')
+def scenarios(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('prefix')
+    shutil.copytree(os.path.join(REPO_DIR, 'data'), workdir / 'data')
+    (workdir / 'debug_data').mkdir()
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(prefix_scenarios, (str(workdir),))
+
+
+def test_every_prompt_starts_with_the_same_prefix_bytes(scenarios):
+    assert scenarios["prefix_chars"] > 0
+    assert set(scenarios["locales"]) == {"es-AR", "en-US", "pt-BR"}
+    assert all(scenarios["starts_with_prefix"])
+    assert set(scenarios["estimate_hashes"]) == {scenarios["prefix_hash"]}
+
+
+def test_prefix_hash_follows_the_prefix_bytes(scenarios):
+    # El catálogo va en la cola del prompt: la versión cambia y el prefijo cacheado se sigue usando
+    catalog_change = scenarios["catalog_change"]
+    assert catalog_change["version"] != scenarios["version"]
+    assert catalog_change["prompt_prefix"]
+    assert catalog_change["prefix_hash"] == scenarios["prefix_hash"]
+    # El tono (cierre) es parte del prefijo
+    assert scenarios["tone_change"]["prefix_hash"] != scenarios["prefix_hash"]
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return GroqDebugTracker(debug_mode=True, save_to_file=False)
+
+
+def test_cached_input_tokens_use_the_cached_price(tracker):
+    tracker.pricing["test-model"] = {"input": 1.0, "output": 2.0, "cached_input": 0.1}
+    cost, savings = tracker.calculate_cost("test-model", 1000, 100, cached_input_tokens=600)
+
+    assert cost == pytest.approx((400 * 1.0 + 600 * 0.1 + 100 * 2.0) / 1_000_000)
+    assert savings == pytest.approx(600 * 0.9 / 1_000_000)
+
+
+def test_cached_input_tokens_default_to_half_price(tracker):
+    pricing = tracker.pricing["llama3-70b-8192"]
+    assert "cached_input" not in pricing
+    cost, savings = tracker.calculate_cost("llama3-70b-8192", 1000, 100, cached_input_tokens=600)
+
+    cached_price = pricing["input"] * (1 - CACHED_INPUT_DISCOUNT)
+    assert cost == pytest.approx((400 * pricing["input"] + 600 * cached_price + 100 * pricing["output"]) / 1_000_000)
+    assert savings == pytest.approx(600 * pricing["input"] * CACHED_INPUT_DISCOUNT / 1_000_000)
+    # Sin tokens cacheados es el precio de lista; nunca se cachean más tokens que los del prompt
+    assert tracker.calculate_cost("llama3-70b-8192", 1000, 100) == (
+        pytest.approx((1000 * pricing["input"] + 100 * pricing["output"]) / 1_000_000), 0)
+    assert tracker.calculate_cost("llama3-70b-8192", 100, 0, cached_input_tokens=500)[1] == pytest.approx(
+        100 * pricing["input"] * CACHED_INPUT_DISCOUNT / 1_000_000)
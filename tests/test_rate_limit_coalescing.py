@@ -0,0 +1,62 @@
+"""Un 429 de Groq compartido por coalescing entre /chat (que lo devuelve como respuesta) y un lote (que reintenta)"""
+import json
+import threading
+import time
+
+import requests
+
+MESSAGE = "¿Tienen stock del producto más vendido?"
+
+# Groq lento para que los dos requests se junten, y con 429 en la primera llamada (un backend por test)
+STACK_OPTIONS = {"groq_latency": 0.5, "groq_rate_limit_first": 1}
+
+
+def post_chat(stack, results: dict):
+    response = requests.post(stack.url + '/chat', json={"message": MESSAGE}, timeout=30)
+    results["chat"] = (response.status_code, response.json())
+
+
+def post_batch(stack, results: dict):
+    response = requests.post(stack.url + '/chat/batch', json={"messages": [MESSAGE]}, timeout=30)
+    results["batch"] = [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def run_overlapped(stack, first, second) -> dict:
+    """Arranca first, y second mientras first todavía espera a Groq"""
+    results = {}
+    threads = [threading.Thread(target=first, args=(stack, results)),
+               threading.Thread(target=second, args=(stack, results))]
+    threads[0].start()
+    time.sleep(0.2)
+    threads[1].start()
+    for thread in threads:
+        thread.join(timeout=30)
+
+    singleflight = requests.get(stack.url + '/debug/cache', timeout=10).json()["singleflight"]
+    assert singleflight["coalesced"] >= 1, "los dos requests no se juntaron"
+    return results
+
+
+def assert_chat_got_error_reply(results: dict):
+    status, body = results["chat"]
+    assert status == 200
+    assert body["reply"] == "Error en la API de Groq: 429"
+
+
+def assert_batch_retried(results: dict):
+    item, summary = results["batch"]
+    assert item["status"] == 200
+    assert item["reply"].startswith("¡Hola! Respuesta de prueba para:")
+    assert summary["batch"]["completed"]
+
+
+def test_chat_behind_batch_leader_gets_error_reply(fresh_stack):
+    results = run_overlapped(fresh_stack, post_batch, post_chat)
+    assert_chat_got_error_reply(results)
+    assert_batch_retried(results)
+
+
+def test_batch_behind_chat_leader_retries(fresh_stack):
+    results = run_overlapped(fresh_stack, post_chat, post_batch)
+    assert_chat_got_error_reply(results)
+    assert_batch_retried(results)
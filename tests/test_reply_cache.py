@@ -0,0 +1,35 @@
+"""Nivel en disco del cache de respuestas: acotado a max_entries y sin respuestas vencidas"""
+import sqlite3
+import time
+
+from reply_cache import ReplyCache
+
+
+def disk_keys(path: str) -> set:
+    with sqlite3.connect(path) as conn:
+        return {row[0] for row in conn.execute("SELECT key FROM replies")}
+
+
+def test_disk_keeps_at_most_max_entries(tmp_path):
+    path = str(tmp_path / 'replies.db')
+    cache = ReplyCache(max_entries=3, ttl=60, path=path)
+    for i in range(5):
+        cache.set(f"k{i}", f"respuesta {i}", "llama3-70b-8192")
+
+    assert disk_keys(path) == {"k2", "k3", "k4"}
+    assert cache.stats()["disk_evictions"] == 2
+    # Un proceso nuevo (sin el LRU en memoria) no encuentra las descartadas
+    reopened = ReplyCache(max_entries=3, ttl=60, path=path)
+    assert reopened.get("k0") is None
+    assert reopened.get("k4")["reply"] == "respuesta 4"
+
+
+def test_disk_purges_expired_replies_periodically(tmp_path):
+    path = str(tmp_path / 'replies.db')
+    cache = ReplyCache(max_entries=10, ttl=0.05, path=path, purge_interval=0)
+    cache.set("vieja", "respuesta", "llama3-70b-8192")
+    time.sleep(0.1)
+    cache.set("nueva", "respuesta", "llama3-70b-8192")
+
+    assert disk_keys(path) == {"nueva"}
+    assert cache.stats()["disk_expired"] == 1
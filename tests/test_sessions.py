@@ -0,0 +1,129 @@
+"""Sesiones de conversación: compactación por presupuesto de tokens, ids emitidos por el servidor y compartidas entre workers"""
+import pytest
+import requests
+
+from sessions import MESSAGE_OVERHEAD_TOKENS, SessionStore, compact_history, estimate_tokens
+
+
+def conversation(turns: int, chars: int = 200) -> list:
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Pregunta {i}. " + "x" * chars})
+        messages.append({"role": "assistant", "content": f"Respuesta {i}. " + "y" * chars})
+    return messages
+
+
+def history_tokens(history: list) -> int:
+    return sum(estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in history)
+
+
+def test_short_history_is_kept_verbatim():
+    messages = conversation(2)
+    history, info = compact_history(messages, "", budget_tokens=1000, summary_chars=400)
+    assert history == messages
+    assert info["summarized_messages"] == 0
+    assert info["tokens_saved"] == 0
+
+
+def test_compaction_fits_the_token_budget():
+    messages = conversation(20)
+    history, info = compact_history(messages, "Cliente: Hola", budget_tokens=300, summary_chars=600)
+
+    assert history_tokens(history) <= 300
+    assert info["history_tokens"] == history_tokens(history)
+    assert info["tokens_saved"] > 0
+    # Resumen primero y después los mensajes más nuevos, textuales y en orden
+    assert history[0]["role"] == "system"
+    assert history[0]["content"].startswith("Resumen de la conversación previa: ")
+    kept = history[1:]
+    assert kept and kept == messages[-len(kept):]
+    assert info["summarized_messages"] == len(messages) - len(kept)
+
+
+def test_store_only_returns_sessions_it_created(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=10, ttl=60)
+    session = store.create("tienda")
+
+    assert store.get("tienda", session.id).id == session.id
+    assert store.get("tienda", "elegido-por-el-cliente") is None
+    # El mismo id no sirve con otro negocio
+    assert store.get("otra-tienda", session.id) is None
+    assert store.stats()["unknown"] == 2
+
+
+def test_store_forgets_expired_sessions(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=10, ttl=0)
+    session = store.create("tienda")
+    assert store.get("tienda", session.id) is None
+    assert store.stats()["expired"] == 1
+
+
+def test_store_evicts_least_recently_used_sessions(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=2, ttl=60)
+    first, second = store.create("tienda"), store.create("tienda")
+    store.get("tienda", first.id)
+    store.create("tienda")
+
+    assert store.get("tienda", second.id) is None
+    assert store.get("tienda", first.id) is not None
+    assert store.stats()["sessions"] == 2
+
+
+def test_store_moves_overflow_to_summary(tmp_path):
+    store = SessionStore(str(tmp_path / 'sessions.db'), max_sessions=10, ttl=60, max_messages=4)
+    session = store.create("tienda")
+    for i in range(3):
+        store.append_turn(session, f"Pregunta {i}", f"Respuesta {i}")
+
+    messages, summary = store.snapshot(session)
+    assert [m["content"] for m in messages] == ["Pregunta 1", "Respuesta 1", "Pregunta 2", "Respuesta 2"]
+    assert summary == "Cliente: Pregunta 0 | Asistente: Respuesta 0"
+
+
+def test_store_is_shared_between_processes(tmp_path):
+    # Dos stores sobre la misma base, como dos workers de gunicorn
+    path = str(tmp_path / 'sessions.db')
+    worker_a, worker_b = SessionStore(path), SessionStore(path)
+    session = worker_a.create("tienda")
+    worker_a.append_turn(session, "Hola", "¡Hola! ¿En qué te ayudo?")
+
+    seen = worker_b.get("tienda", session.id)
+    assert seen is not None
+    assert worker_b.snapshot(seen)[0][0] == {"role": "user", "content": "Hola"}
+
+
+def test_chat_starts_and_continues_a_session(stack):
+    first = requests.post(stack.url + '/chat', json={"message": "Hola, ¿qué venden?", "session": True},
+                          timeout=30).json()
+    session_id = first["session_id"]
+    assert first["usage"]["history"]["history_messages"] == 0
+
+    second = requests.post(stack.url + '/chat', json={"message": "¿Y hacen envíos?", "session_id": session_id},
+                           timeout=30).json()
+    assert second["session_id"] == session_id
+    assert second["usage"]["history"]["history_messages"] == 2
+
+
+def test_chat_rejects_session_ids_it_never_issued(stack):
+    response = requests.post(stack.url + '/chat', json={"message": "¿Qué me dijiste antes?",
+                                                        "session_id": "adivinado"}, timeout=30)
+    assert response.status_code == 404
+    assert response.json()["session_id"] == "adivinado"
+
+
+def test_sessions_follow_turns_across_gunicorn_workers():
+    pytest.importorskip('gunicorn')
+    from load import Stack
+    stack = Stack('gunicorn', groq_latency=0.0, groq_jitter=0.0,
+                  env={"GUNICORN_WORKERS": "3", "GUNICORN_THREADS": "2"})
+    try:
+        # Sin keep-alive cada turno es una conexión nueva que puede atender cualquier worker
+        body = requests.post(stack.url + '/chat', json={"message": "Hola", "session": True}, timeout=30).json()
+        for turn in range(1, 7):
+            response = requests.post(stack.url + '/chat', json={"message": f"Pregunta {turn}",
+                                                                "session_id": body["session_id"]}, timeout=30)
+            assert response.status_code == 200
+            body = response.json()
+            assert body["usage"]["history"]["history_messages"] == 2 * turn
+    finally:
+        stack.close()
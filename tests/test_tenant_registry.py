@@ -0,0 +1,59 @@
+"""Registro de negocios inline: un compilado por id + hash del payload, acotado por LRU"""
+from business_cache import TenantRegistry
+
+
+def registry(max_tenants: int = 256) -> TenantRegistry:
+    # Perfil y locale triviales: el registro no depende de cómo se compila cada negocio
+    return TenantRegistry(lambda payload: payload, lambda profile, locale: locale, max_tenants=max_tenants)
+
+
+def business(business_id: str, price: int = 1000) -> dict:
+    return {"id": business_id, "name": f"Negocio {business_id}",
+            "catalog": [{"sku": "A1", "title": "Producto", "price": price}]}
+
+
+def test_same_payload_compiles_once():
+    tenants = registry()
+    first = tenants.resolve(business("tienda"))
+    # Mismo contenido con las claves en otro orden
+    again = tenants.resolve(dict(reversed(list(business("tienda").items()))))
+
+    assert again is first
+    assert tenants.stats()["compiles"] == 1
+    assert tenants.stats()["hits"] == 1
+
+
+def test_changed_payload_gets_a_new_version():
+    tenants = registry()
+    old = tenants.resolve(business("tienda", price=1000))
+    new = tenants.resolve(business("tienda", price=1200))
+
+    assert new is not old
+    assert new.version != old.version
+    assert new.data["catalog"][0]["price"] == 1200
+    # Las dos versiones conviven hasta que el LRU las descarte
+    assert tenants.get("tienda", old.version) is old
+
+
+def test_get_by_id_and_version_without_payload():
+    tenants = registry()
+    compiled = tenants.resolve(business("tienda"))
+
+    assert tenants.get("tienda", compiled.version) is compiled
+    assert tenants.get("otra-tienda", compiled.version) is None
+    assert tenants.get("tienda", "version-desconocida") is None
+    assert tenants.get("tienda", None) is None
+    assert tenants.stats()["misses"] == 2
+
+
+def test_least_recently_used_tenant_is_evicted():
+    tenants = registry(max_tenants=2)
+    a = tenants.resolve(business("a"))
+    b = tenants.resolve(business("b"))
+    tenants.get("a", a.version)
+    tenants.resolve(business("c"))
+
+    assert tenants.get("b", b.version) is None
+    assert tenants.get("a", a.version) is a
+    assert tenants.stats()["tenants"] == 2
+    assert tenants.stats()["evictions"] == 1
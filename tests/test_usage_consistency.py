@@ -0,0 +1,143 @@
+"""Contadores y log de uso consistentes con N procesos x M threads registrando a la vez
+
+Cada proceso tiene su propio GroqDebugTracker y writer en segundo plano, como los workers de gunicorn:
+los rollups se suman en SQLite y el log se agrega con flock sobre los mismos archivos.
+"""
+import contextlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import pytest
+
+PROCESSES = 4
+THREADS = 4
+REQUESTS = 60
+CACHE_HITS = 10
+MODELS = ("llama3-70b-8192", "llama3-8b-8192")
+TIERS = ("template", "small", "large")
+
+
+def request_values(process: int, thread: int, i: int):
+    """Tokens y latencia deterministas de cada request, para recalcular los totales esperados"""
+    return MODELS[i % 2], 100 + process + i, 10 + thread + i, 50.0 + i
+
+
+def open_tracker(workdir: str, flush_interval: float = 0.02):
+    """Tracker de un proceso worker; por defecto con lotes chicos para forzar muchas transacciones concurrentes"""
+    os.chdir(workdir)
+    os.environ['GROQ_DEBUG'] = 'false'
+    from debug_tracker import GroqDebugTracker
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return GroqDebugTracker(debug_mode=True, batch_size=7, flush_interval=flush_interval)
+
+
+def run_worker(workdir: str, process: int):
+    tracker = open_tracker(workdir)
+
+    def track(thread: int):
+        for i in range(REQUESTS):
+            model, input_tokens, output_tokens, latency_ms = request_values(process, thread, i)
+            tracker.track_request(model, input_tokens, output_tokens, request_id=f"p{process}-t{thread}-{i}",
+                                  latency_ms=latency_ms, estimated_input_tokens=input_tokens + 5)
+            tracker.track_route(TIERS[i % 3], "test", latency_ms, cost_usd=0.001, savings_usd=0.002)
+        for i in range(CACHE_HITS):
+            tracker.track_cache_hit(MODELS[0], request_id=f"p{process}-t{thread}-hit{i}")
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        threads = [threading.Thread(target=track, args=(thread,)) for thread in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        tracker.close()
+
+
+def read_your_writes(workdir: str):
+    """Un resumen leído justo después de registrar ya incluye ese request, aunque el writer no haya despertado"""
+    tracker = open_tracker(workdir, flush_interval=30.0)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        tracker.track_request(MODELS[0], 1000, 100, latency_ms=10.0)
+        tracker.track_route("small", "test", 10.0)
+        summary = tracker.get_daily_summary()
+        entries, _ = tracker.query_usage_log(limit=10)
+        tracker.close()
+    return summary["total_requests"], summary["routing"]["small"]["requests"], len(entries)
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    (tmp_path / 'debug_data').mkdir()
+    return str(tmp_path)
+
+
+def test_concurrent_processes_and_threads_keep_exact_totals(workdir):
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=run_worker, args=(workdir, process)) for process in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+    expected = {model: {"requests": 0, "input_tokens": 0, "output_tokens": 0} for model in MODELS}
+    for process in range(PROCESSES):
+        for thread in range(THREADS):
+            for i in range(REQUESTS):
+                model, input_tokens, output_tokens, _ = request_values(process, thread, i)
+                expected[model]["requests"] += 1
+                expected[model]["input_tokens"] += input_tokens
+                expected[model]["output_tokens"] += output_tokens
+    requests = PROCESSES * THREADS * REQUESTS
+    cache_hits = PROCESSES * THREADS * CACHE_HITS
+
+    with sqlite3.connect(os.path.join(workdir, 'debug_data', 'usage.db')) as conn:
+        for granularity in ("hour", "day", "month"):
+            rows = conn.execute(
+                "SELECT model, SUM(requests), SUM(input_tokens), SUM(output_tokens), SUM(cache_hits) "
+                "FROM usage_rollups WHERE granularity = ? GROUP BY model", (granularity,)
+            ).fetchall()
+            totals = {model: {"requests": r, "input_tokens": i, "output_tokens": o} for model, r, i, o, _ in rows}
+            assert totals == expected
+            assert sum(row[4] for row in rows) == cache_hits
+
+            for metric in ("input_tokens", "output_tokens", "cost_usd", "latency_ms", "estimate_error_pct"):
+                count, = conn.execute(
+                    "SELECT SUM(count) FROM usage_histograms WHERE granularity = ? AND metric = ?",
+                    (granularity, metric)
+                ).fetchone()
+                assert count == requests
+
+            routes = dict(conn.execute(
+                "SELECT tier, SUM(requests) FROM route_rollups WHERE granularity = ? GROUP BY tier", (granularity,)
+            ).fetchall())
+            assert routes == {tier: requests // 3 for tier in TIERS}
+            route_buckets, = conn.execute(
+                "SELECT SUM(count) FROM route_histograms WHERE granularity = ?", (granularity,)
+            ).fetchone()
+            assert route_buckets == requests
+            savings, = conn.execute(
+                "SELECT SUM(savings_usd) FROM route_rollups WHERE granularity = ?", (granularity,)
+            ).fetchone()
+            assert savings == pytest.approx(requests * 0.002)
+
+    from usage_log import UsageLog
+    log = UsageLog(os.path.join(workdir, 'debug_data', 'usage_log.jsonl'),
+                   os.path.join(workdir, 'debug_data', 'usage_log.idx'),
+                   os.path.join(workdir, 'debug_data', 'usage_log.models'))
+    try:
+        assert len(log) == requests + cache_hits
+        entries, _ = log.query(since=0, limit=len(log))
+        ids = [entry["request_id"] for entry in entries]
+        assert len(ids) == len(set(ids)) == requests + cache_hits
+        assert sum(entry["input_tokens"] for entry in entries) == sum(
+            totals["input_tokens"] for totals in expected.values())
+    finally:
+        log.close()
+
+
+def test_summary_reads_its_own_pending_writes(workdir):
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        assert pool.apply(read_your_writes, (workdir,)) == (1, 1, 1)
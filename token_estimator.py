@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Estimador local de tokens de prompt
+Funciona sin red: cuenta piezas tipo BPE con regex y aplica una escala por modelo
+calibrada con el prompt_tokens real que devuelve Groq
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+# Ventana de contexto (tokens) de los modelos de la tabla de precios del tracker
+CONTEXT_WINDOWS = {
+    "llama3-70b-8192": 8192,
+    "llama3-8b-8192": 8192,
+    "llama3.1-8b-instant": 131072,
+    "llama3.3-70b-versatile": 131072,
+    "qwen3-32b": 131072,
+    "gemma2-9b": 8192,
+    "gpt-oss-20b": 131072,
+    "gpt-oss-120b": 131072,
+    "kimi-k2-1t": 131072,
+    "llama4-scout": 131072,
+    "llama4-maverick": 131072,
+    "llama-guard-4": 131072,
+    "deepseek-r1": 131072,
+    "mistral-saba": 32768,
+    "llama-guard-3": 8192
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens del formato de chat: por mensaje (rol y separadores) y para abrir la respuesta
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_PRIMING_TOKENS = 3
+
+# Piezas del pre-tokenizador: palabras (con su espacio), grupos de hasta 3 dígitos, símbolos
+_PIECE_RE = re.compile(r" ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+")
+
+# Palabras largas o con acentos se parten en más de un token
+_LONG_WORD_CHARS = 6
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+# Calibración online: peso de cada observación y rango permitido de la escala
+CALIBRATION_ALPHA = 0.05
+MIN_SCALE, MAX_SCALE = 0.5, 2.0
+
+
+def _normalize_model(model: str) -> str:
+    return model.lower().replace('-', '').replace('_', '')
+
+
+@lru_cache(maxsize=2048)
+def raw_count(text: str) -> int:
+    """Cuenta sin calibrar (memoizada: el prompt del sistema se repite entre requests)"""
+    pieces = _PIECE_RE.findall(text)
+    count = len(pieces)
+    for piece in pieces:
+        if len(piece) > _LONG_WORD_CHARS:
+            count += (len(piece) - 1) // _LONG_WORD_CHARS
+    return count + len(_NON_ASCII_RE.findall(text)) // 3
+
+
+class TokenEstimator:
+    """Estimación de tokens por modelo con una escala calibrada contra el uso real"""
+
+    def __init__(self, scales: Dict[str, float] = None,
+                 persist: Callable[[Dict[str, float]], None] = None, persist_every: int = 100):
+        self._scales: Dict[str, float] = dict(scales or {})
+        self._persist = persist
+        self._persist_every = persist_every
+        self._lock = threading.Lock()
+
+        # Contadores expuestos en /debug
+        self.observations = 0
+        self.abs_error_sum = 0.0
+
+    def context_window(self, model: str) -> int:
+        """Ventana de contexto del modelo (mismo matching de nombres que los precios del tracker)"""
+        normalized = _normalize_model(model)
+        for name, window in CONTEXT_WINDOWS.items():
+            if normalized in _normalize_model(name):
+                return window
+        return DEFAULT_CONTEXT_WINDOW
+
+    def scale(self, model: str) -> float:
+        return self._scales.get(model, 1.0)
+
+    def raw_messages(self, messages: Iterable[Dict[str, str]]) -> int:
+        """Cuenta sin calibrar de una lista de mensajes de chat"""
+        return sum(raw_count(message["content"]) + MESSAGE_OVERHEAD_TOKENS for message in messages) \
+            + REPLY_PRIMING_TOKENS
+
+    def count(self, text: str, model: str) -> int:
+        """Tokens estimados de un texto suelto"""
+        return round(raw_count(text) * self.scale(model))
+
+    def count_messages(self, messages: Iterable[Dict[str, str]], model: str) -> int:
+        """Tokens de prompt estimados para un request de chat completo"""
+        return round(self.raw_messages(messages) * self.scale(model))
+
+    def counter(self, model: str) -> Callable[[str], int]:
+        """Función texto -> tokens para un modelo (para la compactación del historial)"""
+        return lambda text: self.count(text, model)
+
+    def observe(self, model: str, raw_estimate: int, actual: int) -> Optional[float]:
+        """Ajusta la escala del modelo con el prompt_tokens real; retorna el error relativo de la estimación"""
+        if raw_estimate <= 0 or actual <= 0:
+            return None
+
+        with self._lock:
+            scale = self._scales.get(model, 1.0)
+            estimate = raw_estimate * scale
+            ratio = actual / raw_estimate
+            self._scales[model] = min(MAX_SCALE, max(MIN_SCALE, scale + CALIBRATION_ALPHA * (ratio - scale)))
+            self.observations += 1
+            error = (estimate - actual) / actual
+            self.abs_error_sum += abs(error)
+            snapshot = dict(self._scales) if self._persist and self.observations % self._persist_every == 0 else None
+
+        if snapshot is not None:
+            self._persist(snapshot)
+        return error
+
+    def calibrate(self, samples: Iterable[Tuple[str, int, int]]) -> Dict[str, float]:
+        """Calibración offline por mínimos cuadrados con muestras (modelo, estimación cruda, tokens reales)"""
+        sums: Dict[str, List[float]] = {}
+        for model, raw_estimate, actual in samples:
+            if raw_estimate > 0 and actual > 0:
+                acc = sums.setdefault(model, [0.0, 0.0])
+                acc[0] += raw_estimate * actual
+                acc[1] += raw_estimate * raw_estimate
+
+        with self._lock:
+            for model, (cross, square) in sums.items():
+                self._scales[model] = min(MAX_SCALE, max(MIN_SCALE, cross / square))
+            snapshot = dict(self._scales)
+
+        if self._persist:
+            self._persist(snapshot)
+        return snapshot
+
+    def stats(self) -> Dict[str, Any]:
+        """Escalas y error medio para debug"""
+        return {
+            "scales": dict(self._scales),
+            "observations": self.observations,
+            "mean_abs_error_pct": round(self.abs_error_sum / self.observations * 100, 2) if self.observations else None
+        }
+
+
+if __name__ == '__main__':
+    # Recalibra las escalas con los registros del log de uso que tienen la estimación cruda
+    import json
+    from debug_tracker import debug_tracker
+
+    def samples():
+        """Muestras (modelo, estimación cruda, tokens reales) del log, página por página"""
+        cursor = None
+        while True:
+            page, cursor = debug_tracker.query_usage_log(cursor=cursor, limit=1000)
+            for entry in page:
+                if entry.get("raw_estimated_input_tokens"):
+                    yield entry["model"], entry["raw_estimated_input_tokens"], entry["input_tokens"]
+            if cursor is None:
+                return
+
+    scales = TokenEstimator(persist=debug_tracker.save_token_scales).calibrate(samples())
+    print(f"📐 Escalas calibradas: {json.dumps(scales)}")
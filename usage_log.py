@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Log de uso en disco con índice de offsets
+Permite consultar por fecha, modelo y cursor sin cargar el log en memoria
+"""
+
+import os
+import json
+import fcntl
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+# Registro del índice: ts de búsqueda (monótono), ts real, offset, largo, id de modelo
+INDEX_RECORD = struct.Struct('<ddQIH')
+
+# Cuántos registros del índice se leen por bloque al escanear
+SCAN_BLOCK = 4096
+
+# Lotes de distintos procesos pueden llegar algo desordenados; margen al cortar por 'until'
+MAX_SKEW_SECONDS = 60.0
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Convierte un timestamp ISO o epoch a segundos epoch"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+class UsageLog:
+    """Log JSON Lines append-only con un índice binario de tamaño fijo por registro"""
+
+    def __init__(self, log_path: str, index_path: str, models_path: str):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.models_path = models_path
+        self._log_fd = os.open(log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._index_fd = os.open(index_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._models: Dict[str, int] = {}
+        self._model_names: List[str] = []
+        self._thread_lock = threading.Lock()
+
+        with self._locked():
+            self._load_models()
+            self._catch_up_index()
+
+    # -- escritura --------------------------------------------------------
+
+    def _locked(self):
+        """Lock exclusivo entre threads y entre procesos sobre el índice"""
+        return _FileLock(self._index_fd, self._thread_lock)
+
+    def _load_models(self):
+        """Lee la tabla de modelos (una línea por modelo, el id es el número de línea)"""
+        if not os.path.exists(self.models_path):
+            return
+        with open(self.models_path, 'r', encoding='utf-8') as f:
+            names = [line.rstrip('\n') for line in f]
+        self._model_names = names
+        self._models = {name: i for i, name in enumerate(names)}
+
+    def _model_id(self, model: str) -> int:
+        """Id del modelo, registrándolo si es nuevo (llamar con el lock tomado)"""
+        model_id = self._models.get(model)
+        if model_id is not None:
+            return model_id
+
+        # Otro proceso pudo haberlo registrado
+        self._load_models()
+        model_id = self._models.get(model)
+        if model_id is not None:
+            return model_id
+
+        with open(self.models_path, 'a', encoding='utf-8') as f:
+            f.write(model.replace('\n', ' ') + '\n')
+        model_id = len(self._model_names)
+        self._model_names.append(model)
+        self._models[model] = model_id
+        return model_id
+
+    def _index_count(self) -> int:
+        return os.fstat(self._index_fd).st_size // INDEX_RECORD.size
+
+    def _read_records(self, start: int, count: int) -> List[Tuple[float, float, int, int, int]]:
+        """Lee count registros del índice desde la posición start"""
+        data = os.pread(self._index_fd, count * INDEX_RECORD.size, start * INDEX_RECORD.size)
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        return [INDEX_RECORD.unpack_from(data, i) for i in range(0, usable, INDEX_RECORD.size)]
+
+    def _last_record(self) -> Optional[Tuple[float, float, int, int, int]]:
+        count = self._index_count()
+        if count == 0:
+            return None
+        return self._read_records(count - 1, 1)[0]
+
+    def _catch_up_index(self):
+        """Indexa las líneas del log que todavía no están en el índice (migración o crash)"""
+        last = self._last_record()
+        indexed_end = last[2] + last[3] if last else 0
+        last_key = last[0] if last else 0.0
+        log_size = os.fstat(self._log_fd).st_size
+        if log_size <= indexed_end:
+            return
+
+        records = []
+        offset = indexed_end
+        with open(self.log_path, 'rb') as f:
+            f.seek(indexed_end)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break  # línea incompleta por un crash a mitad de escritura
+                try:
+                    entry = json.loads(line)
+                    ts = parse_timestamp(entry.get('timestamp')) or last_key
+                    model_id = self._model_id(entry.get('model', ''))
+                except (ValueError, TypeError):
+                    ts, model_id = last_key, self._model_id('')
+                last_key = max(last_key, ts)
+                records.append(INDEX_RECORD.pack(last_key, ts, offset, len(line), model_id))
+                offset += len(line)
+
+        if records:
+            os.write(self._index_fd, b''.join(records))
+
+    def append_batch(self, entries: List[Dict[str, Any]]):
+        """Agrega un lote al log y al índice en una sección crítica entre procesos"""
+        if not entries:
+            return
+
+        lines = [(json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8') for entry in entries]
+        with self._locked():
+            self._catch_up_index()
+            offset = os.fstat(self._log_fd).st_size
+            last = self._last_record()
+            last_key = last[0] if last else 0.0
+
+            records = []
+            for entry, line in zip(entries, lines):
+                ts = parse_timestamp(entry.get('timestamp')) or last_key
+                last_key = max(last_key, ts)
+                records.append(INDEX_RECORD.pack(last_key, ts, offset, len(line), self._model_id(entry.get('model', ''))))
+                offset += len(line)
+
+            os.write(self._log_fd, b''.join(lines))
+            os.write(self._index_fd, b''.join(records))
+
+    def sync(self):
+        """fsync del log y del índice"""
+        os.fsync(self._log_fd)
+        os.fsync(self._index_fd)
+
+    def close(self):
+        os.close(self._log_fd)
+        os.close(self._index_fd)
+
+    def reopen(self):
+        """Abre descriptores propios en un proceso hijo
+
+        flock se asocia a la descripción de archivo: con los descriptores heredados del padre
+        los workers no se excluirían entre sí.
+        """
+        inherited = (self._log_fd, self._index_fd)
+        self._log_fd = os.open(self.log_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._index_fd = os.open(self.index_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+        self._thread_lock = threading.Lock()
+        for fd in inherited:
+            os.close(fd)
+
+    # -- lectura ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._index_count()
+
+    def _lower_bound(self, since: float) -> int:
+        """Primera posición con ts de búsqueda >= since (búsqueda binaria sobre el índice)"""
+        lo, hi = 0, self._index_count()
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._read_records(mid, 1)[0][0] < since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _load_entry(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(os.pread(self._log_fd, length, offset))
+
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              model: Optional[str] = None, cursor: Optional[int] = None,
+              limit: int = 100) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Retorna (registros, próximo cursor) en orden cronológico
+
+        Sin since ni cursor retorna los últimos `limit` registros que cumplan los filtros.
+        """
+        model_id = None
+        if model:
+            self._load_models()
+            model_id = self._models.get(model)
+            if model_id is None:
+                return [], None
+
+        def matches(record) -> bool:
+            _, ts, _, _, record_model = record
+            if model_id is not None and record_model != model_id:
+                return False
+            if since is not None and ts < since:
+                return False
+            return until is None or ts <= until
+
+        count = self._index_count()
+
+        if cursor is None and since is None:
+            # Escaneo hacia atrás desde el final (o desde 'until')
+            found = []
+            end = count if until is None else self._lower_bound(until + MAX_SKEW_SECONDS + 1e-6)
+            while end > 0 and len(found) < limit:
+                start = max(0, end - SCAN_BLOCK)
+                for record in reversed(self._read_records(start, end - start)):
+                    if matches(record):
+                        found.append(record)
+                        if len(found) == limit:
+                            break
+                end = start
+            return [self._load_entry(r[2], r[3]) for r in reversed(found)], None
+
+        position = cursor if cursor is not None else self._lower_bound(since)
+        found = []
+        while position < count and len(found) < limit:
+            block = self._read_records(position, min(SCAN_BLOCK, count - position))
+            for record in block:
+                position += 1
+                if until is not None and record[0] > until + MAX_SKEW_SECONDS:
+                    return [self._load_entry(r[2], r[3]) for r in found], None
+                if matches(record):
+                    found.append(record)
+                    if len(found) == limit:
+                        break
+
+        next_cursor = position if position < count else None
+        return [self._load_entry(r[2], r[3]) for r in found], next_cursor
+
+
+class _FileLock:
+    """Context manager para flock exclusivo (flock no excluye threads del mismo proceso)"""
+
+    def __init__(self, fd: int, thread_lock: threading.Lock):
+        self.fd = fd
+        self.thread_lock = thread_lock
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+        return False
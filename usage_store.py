@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Almacenamiento de contadores de uso en SQLite (modo WAL)
+Seguro entre threads y entre procesos worker
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from histogram import bucket_for, percentiles
+from sqlite_util import thread_connection
+
+# Granularidades de los rollups y el formato de su período
+GRANULARITIES = {
+    "hour": "%Y-%m-%dT%H",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m"
+}
+
+# Métricas con histograma (solo se registran para llamadas reales a Groq)
+HISTOGRAM_METRICS = ("input_tokens", "output_tokens", "cost_usd", "latency_ms", "estimate_error_pct")
+
+
+# Suma contadores a una fila de rollup (la crea si no existe)
+ROLLUP_UPSERT = (
+    "INSERT INTO usage_rollups "
+    "(granularity, period, model, requests, input_tokens, output_tokens, cost_usd, cache_hits, "
+    "cached_input_tokens, cache_savings_usd) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (granularity, period, model) DO UPDATE SET "
+    "requests = requests + excluded.requests, "
+    "input_tokens = input_tokens + excluded.input_tokens, "
+    "output_tokens = output_tokens + excluded.output_tokens, "
+    "cost_usd = cost_usd + excluded.cost_usd, "
+    "cache_hits = cache_hits + excluded.cache_hits, "
+    "cached_input_tokens = cached_input_tokens + excluded.cached_input_tokens, "
+    "cache_savings_usd = cache_savings_usd + excluded.cache_savings_usd"
+)
+
+# Contadores de un rollup, en el orden de ROLLUP_UPSERT
+ROLLUP_COUNTERS = ("requests", "input_tokens", "output_tokens", "cost_usd", "cache_hits",
+                   "cached_input_tokens", "cache_savings_usd")
+
+# Columnas de la tabla de lotes, en orden
+BATCH_COLUMNS = ("id", "created", "business", "model", "items", "ok", "errors", "retries", "cache_hits",
+                 "input_tokens", "cached_input_tokens", "output_tokens", "cost_usd", "duration_s", "completed")
+
+
+class UsageStore:
+    """Contadores acumulados por período y modelo, compartidos por todos los workers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+        # Con una base en memoria ('file:...?mode=memory') la primera conexión la mantiene viva
+        self._keepalive = self._connection()
+        conn = self._keepalive
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage_rollups ("
+                "granularity TEXT NOT NULL, period TEXT NOT NULL, model TEXT NOT NULL, "
+                "requests INTEGER NOT NULL DEFAULT 0, "
+                "input_tokens INTEGER NOT NULL DEFAULT 0, "
+                "output_tokens INTEGER NOT NULL DEFAULT 0, "
+                "cost_usd REAL NOT NULL DEFAULT 0, "
+                "cache_hits INTEGER NOT NULL DEFAULT 0, "
+                "cached_input_tokens INTEGER NOT NULL DEFAULT 0, "
+                "cache_savings_usd REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (granularity, period, model))"
+            )
+            # Bases creadas antes de registrar los tokens de prompt cacheados por el proveedor
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(usage_rollups)")}
+            if "cached_input_tokens" not in columns:
+                conn.execute("ALTER TABLE usage_rollups ADD COLUMN cached_input_tokens INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE usage_rollups ADD COLUMN cache_savings_usd REAL NOT NULL DEFAULT 0")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage_histograms ("
+                "granularity TEXT NOT NULL, period TEXT NOT NULL, model TEXT NOT NULL, "
+                "metric TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (granularity, period, model, metric, bucket)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id TEXT PRIMARY KEY, created REAL NOT NULL, business TEXT, model TEXT NOT NULL, "
+                "items INTEGER NOT NULL, ok INTEGER NOT NULL, errors INTEGER NOT NULL, "
+                "retries INTEGER NOT NULL, cache_hits INTEGER NOT NULL, "
+                "input_tokens INTEGER NOT NULL, cached_input_tokens INTEGER NOT NULL, "
+                "output_tokens INTEGER NOT NULL, cost_usd REAL NOT NULL, "
+                "duration_s REAL NOT NULL, completed INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS batches_created ON batches (created)")
+            # Ruteo por tier (respuesta fija, modelo chico, modelo grande) con latencia y ahorro
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_rollups ("
+                "granularity TEXT NOT NULL, period TEXT NOT NULL, tier TEXT NOT NULL, "
+                "requests INTEGER NOT NULL DEFAULT 0, "
+                "latency_ms REAL NOT NULL DEFAULT 0, "
+                "cost_usd REAL NOT NULL DEFAULT 0, "
+                "savings_usd REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (granularity, period, tier))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS route_histograms ("
+                "granularity TEXT NOT NULL, period TEXT NOT NULL, tier TEXT NOT NULL, "
+                "bucket INTEGER NOT NULL, count INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (granularity, period, tier, bucket)) WITHOUT ROWID"
+            )
+        self._backfill_month_rollups()
+
+    def _connection(self) -> sqlite3.Connection:
+        return thread_connection(self._local, self.path)
+
+    def _backfill_month_rollups(self):
+        """Bases anteriores a los rollups mensuales: se derivan una vez de las filas diarias"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not conn.execute("SELECT 1 FROM meta WHERE key = 'month_rollups'").fetchone():
+                conn.execute(
+                    "INSERT OR IGNORE INTO usage_rollups "
+                    "(granularity, period, model, requests, input_tokens, output_tokens, cost_usd, cache_hits) "
+                    "SELECT 'month', substr(period, 1, 7), model, SUM(requests), SUM(input_tokens), "
+                    "SUM(output_tokens), SUM(cost_usd), SUM(cache_hits) "
+                    "FROM usage_rollups WHERE granularity = 'day' GROUP BY substr(period, 1, 7), model"
+                )
+                conn.execute("INSERT INTO meta (key, value) VALUES ('month_rollups', '1')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def increment(self, period: str, model: str, requests: int = 0, input_tokens: int = 0,
+                  output_tokens: int = 0, cost_usd: float = 0.0, cache_hits: int = 0,
+                  cached_input_tokens: int = 0, cache_savings_usd: float = 0.0,
+                  granularity: str = 'day'):
+        """Suma contadores de forma atómica (un UPSERT por período)"""
+        self._connection().execute(
+            ROLLUP_UPSERT,
+            (granularity, period, model, requests, input_tokens, output_tokens, cost_usd, cache_hits,
+             cached_input_tokens, cache_savings_usd)
+        )
+
+    def record(self, when: datetime, model: str, requests: int = 0, input_tokens: int = 0,
+               output_tokens: int = 0, cost_usd: float = 0.0, cache_hits: int = 0,
+               cached_input_tokens: int = 0, cache_savings_usd: float = 0.0,
+               latency_ms: Optional[float] = None, estimate_error_pct: Optional[float] = None):
+        """Actualiza los rollups por hora, día y mes y sus histogramas en una sola transacción"""
+        self.record_batch([{
+            "when": when,
+            "model": model,
+            "requests": requests,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": cost_usd,
+            "cache_hits": cache_hits,
+            "cached_input_tokens": cached_input_tokens,
+            "cache_savings_usd": cache_savings_usd,
+            "latency_ms": latency_ms,
+            "estimate_error_pct": estimate_error_pct
+        }])
+
+    def record_batch(self, records: List[Dict[str, Any]] = (), routes: List[Dict[str, Any]] = ()):
+        """Suma varios registros (los argumentos de record y record_route) a rollups e histogramas en una transacción
+
+        Se agregan en memoria antes de escribir: el costo es una fila por período, modelo (o tier) y bucket
+        tocado, no por registro. Es lo que usa el writer en segundo plano en cada flush.
+        """
+        rollups: Dict[Tuple[str, str, str], List[float]] = {}
+        histograms: Dict[Tuple[str, str, str, str, int], int] = {}
+        for record in records:
+            counters = [record.get(name, 0) for name in ROLLUP_COUNTERS]
+            # Solo las llamadas reales a Groq tienen histograma
+            buckets = []
+            if record.get("requests"):
+                buckets = [(metric, bucket_for(record[metric])) for metric in HISTOGRAM_METRICS
+                           if record.get(metric) is not None]
+            for granularity, fmt in GRANULARITIES.items():
+                key = (granularity, record["when"].strftime(fmt), record["model"])
+                totals = rollups.setdefault(key, [0] * len(ROLLUP_COUNTERS))
+                for i, value in enumerate(counters):
+                    totals[i] += value
+                for metric, bucket in buckets:
+                    histogram_key = key + (metric, bucket)
+                    histograms[histogram_key] = histograms.get(histogram_key, 0) + 1
+
+        route_rollups: Dict[Tuple[str, str, str], List[float]] = {}
+        route_histograms: Dict[Tuple[str, str, str, int], int] = {}
+        for route in routes:
+            bucket = bucket_for(route["latency_ms"])
+            for granularity, fmt in GRANULARITIES.items():
+                key = (granularity, route["when"].strftime(fmt), route["tier"])
+                totals = route_rollups.setdefault(key, [0, 0.0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += route["latency_ms"]
+                totals[2] += route.get("cost_usd", 0.0)
+                totals[3] += route.get("savings_usd", 0.0)
+                histogram_key = key + (bucket,)
+                route_histograms[histogram_key] = route_histograms.get(histogram_key, 0) + 1
+        if not rollups and not route_rollups:
+            return
+
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(ROLLUP_UPSERT, [key + tuple(totals) for key, totals in rollups.items()])
+            conn.executemany(
+                "INSERT INTO usage_histograms (granularity, period, model, metric, bucket, count) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, period, model, metric, bucket) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in histograms.items()]
+            )
+            conn.executemany(
+                "INSERT INTO route_rollups (granularity, period, tier, requests, latency_ms, cost_usd, savings_usd) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, period, tier) DO UPDATE SET "
+                "requests = requests + excluded.requests, "
+                "latency_ms = latency_ms + excluded.latency_ms, "
+                "cost_usd = cost_usd + excluded.cost_usd, "
+                "savings_usd = savings_usd + excluded.savings_usd",
+                [key + tuple(totals) for key, totals in route_rollups.items()]
+            )
+            conn.executemany(
+                "INSERT INTO route_histograms (granularity, period, tier, bucket, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (granularity, period, tier, bucket) DO UPDATE SET count = count + excluded.count",
+                [key + (count,) for key, count in route_histograms.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rows(self, granularity: str, period_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Filas por período y modelo, opcionalmente filtradas por prefijo (ej. '2025-08')"""
+        conn = self._connection()
+        query = ("SELECT period, model, requests, input_tokens, output_tokens, cost_usd, cache_hits, "
+                 "cached_input_tokens, cache_savings_usd FROM usage_rollups WHERE granularity = ?")
+        params: tuple = (granularity,)
+        if period_prefix:
+            query += " AND period >= ? AND period < ?"
+            params += (period_prefix, period_prefix + '\uffff')
+        query += " ORDER BY period, model"
+
+        return [
+            {
+                "period": row[0],
+                "model": row[1],
+                "requests": row[2],
+                "input_tokens": row[3],
+                "output_tokens": row[4],
+                "cost_usd": row[5],
+                "cache_hits": row[6],
+                "cached_input_tokens": row[7],
+                "cache_savings_usd": row[8]
+            }
+            for row in conn.execute(query, params)
+        ]
+
+    def daily_rows(self, period_prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Filas por día y modelo"""
+        return self.rows('day', period_prefix)
+
+    def day_span(self) -> Tuple[int, Optional[str], Optional[str]]:
+        """(días con actividad, primer día, último día)"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT COUNT(DISTINCT period), MIN(period), MAX(period) FROM usage_rollups WHERE granularity = 'day'"
+        ).fetchone()
+        return row[0], row[1], row[2]
+
+    def percentiles(self, granularity: str, period: Optional[str] = None,
+                    model: Optional[str] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Percentiles por modelo y métrica; sin período se combinan todos los de esa granularidad"""
+        conn = self._connection()
+        query = ("SELECT model, metric, bucket, SUM(count) FROM usage_histograms WHERE granularity = ?")
+        params: tuple = (granularity,)
+        if period:
+            query += " AND period = ?"
+            params += (period,)
+        if model:
+            query += " AND model = ?"
+            params += (model,)
+        query += " GROUP BY model, metric, bucket"
+
+        buckets: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+        for row_model, metric, bucket, count in conn.execute(query, params):
+            buckets.setdefault((row_model, metric), []).append((bucket, count))
+
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for (row_model, metric), pairs in buckets.items():
+            result.setdefault(row_model, {})[metric] = percentiles(pairs)
+        return result
+
+    def record_route(self, when: datetime, tier: str, latency_ms: float, cost_usd: float = 0.0,
+                     savings_usd: float = 0.0):
+        """Suma un request ruteado a los rollups por tier (hora, día y mes) en una transacción"""
+        self.record_batch(routes=[{
+            "when": when,
+            "tier": tier,
+            "latency_ms": latency_ms,
+            "cost_usd": cost_usd,
+            "savings_usd": savings_usd
+        }])
+
+    def routes(self, granularity: str, period: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Requests, latencia, costo y ahorro por tier; sin período se combinan todos los de esa granularidad"""
+        conn = self._connection()
+        where = "WHERE granularity = ?"
+        params: tuple = (granularity,)
+        if period:
+            where += " AND period = ?"
+            params += (period,)
+
+        result: Dict[str, Dict[str, Any]] = {}
+        for tier, requests, latency_ms, cost_usd, savings_usd in conn.execute(
+                "SELECT tier, SUM(requests), SUM(latency_ms), SUM(cost_usd), SUM(savings_usd) "
+                f"FROM route_rollups {where} GROUP BY tier ORDER BY tier", params):
+            result[tier] = {
+                "requests": requests,
+                "avg_latency_ms": round(latency_ms / requests, 3) if requests else None,
+                "cost_usd": cost_usd,
+                "savings_usd": savings_usd
+            }
+
+        buckets: Dict[str, List[Tuple[int, int]]] = {}
+        for tier, bucket, count in conn.execute(
+                f"SELECT tier, bucket, SUM(count) FROM route_histograms {where} GROUP BY tier, bucket", params):
+            buckets.setdefault(tier, []).append((bucket, count))
+        for tier, pairs in buckets.items():
+            if tier in result:
+                result[tier]["latency_ms"] = percentiles(pairs)
+        return result
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self._connection().execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    def add_batch(self, batch: Dict[str, Any]):
+        """Guarda los totales de un lote (los requests del lote ya suman en los rollups)"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            tuple(batch[column] if column != "completed" else int(batch[column]) for column in BATCH_COLUMNS)
+        )
+
+    def batches(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Últimos lotes, del más nuevo al más viejo"""
+        rows = self._connection().execute(
+            f"SELECT {', '.join(BATCH_COLUMNS)} FROM batches ORDER BY created DESC LIMIT ?", (limit,)
+        )
+        return [
+            {**dict(zip(BATCH_COLUMNS, row)), "completed": bool(row[-1])}
+            for row in rows
+        ]
+
+    def import_once(self, key: str, rows: List[Dict[str, Any]]) -> bool:
+        """Importa filas históricas una sola vez entre todos los procesos"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = ?", (key,)).fetchone():
+                conn.execute("ROLLBACK")
+                return False
+            for row in rows:
+                self.increment(**row)
+                self.increment(**dict(row, period=row["period"][:7]), granularity='month')
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, '1')", (key,))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
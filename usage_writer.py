@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Escritor en segundo plano para el debug tracker
+Agrega el log de uso como JSON Lines y suma los rollups en SQLite, por lotes
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from typing import Dict, Any, Callable, Optional
+
+from usage_log import UsageLog
+from usage_store import UsageStore
+
+
+def migrate_json_log(json_path: str, jsonl_path: str) -> int:
+    """Convierte un usage_log.json (lista) a JSON Lines; retorna la cantidad de registros migrados"""
+    if not os.path.exists(json_path) or os.path.exists(jsonl_path):
+        return 0
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+
+    tmp_path = f"{jsonl_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, jsonl_path)
+    os.replace(json_path, f"{json_path}.migrated")
+    return len(entries)
+
+
+class BatchedUsageWriter:
+    """Drena una cola de registros y los escribe en lotes desde un thread propio
+
+    Cada lote es un append al log (si hay) y una transacción de rollups en el store (si hay):
+    el thread del request nunca toca disco. Los contadores quedan atrasados a lo sumo flush_interval;
+    flush() espera a que se escriba lo encolado hasta ese momento.
+    """
+
+    def __init__(self, usage_log: Optional[UsageLog], store: Optional[UsageStore] = None, batch_size: int = 100,
+                 flush_interval: float = 1.0, on_error: Callable[[Exception], None] = None):
+        self.usage_log = usage_log
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._on_error = on_error
+        self._start()
+
+    def _start(self):
+        """Cola vacía, contadores en cero y el thread del writer corriendo"""
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+        self._thread.start()
+
+        # Contadores expuestos en /debug
+        self.batches_written = 0
+        self.entries_written = 0
+        self.records_written = 0
+
+    def after_fork(self):
+        """En un proceso hijo el thread del padre no existe: arranca uno propio con una cola nueva"""
+        self._start()
+
+    def append(self, entry: Dict[str, Any]):
+        """Encola un registro del log; no hace I/O en el thread del request"""
+        self._queue.put(('log', entry))
+
+    def record(self, **record):
+        """Encola los argumentos de UsageStore.record para el próximo lote"""
+        self._queue.put(('usage', record))
+
+    def record_route(self, **route):
+        """Encola los argumentos de UsageStore.record_route para el próximo lote"""
+        self._queue.put(('route', route))
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Espera a que se escriba todo lo encolado hasta ahora (para leer lo propio recién registrado)"""
+        if self._closed or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        """Loop del writer: junta hasta batch_size registros o espera flush_interval"""
+        stop = False
+        while not stop:
+            batch = []
+            waiting = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    # Alguien espera en flush(): se escribe ya lo juntado
+                    waiting.append(item)
+                    break
+                batch.append(item)
+
+            self._write_batch(batch)
+            for done in waiting:
+                done.set()
+
+    def _write_batch(self, batch: list):
+        """Agrega los registros del lote al log y a su índice, y suma los rollups en una transacción"""
+        if not batch:
+            return
+        entries = [payload for kind, payload in batch if kind == 'log']
+        records = [payload for kind, payload in batch if kind == 'usage']
+        routes = [payload for kind, payload in batch if kind == 'route']
+
+        if entries and self.usage_log is not None:
+            try:
+                self.usage_log.append_batch(entries)
+                self.entries_written += len(entries)
+            except Exception as e:
+                self._report(e)
+        if (records or routes) and self.store is not None:
+            try:
+                self.store.record_batch(records, routes)
+                self.records_written += len(records) + len(routes)
+            except Exception as e:
+                self._report(e)
+        self.batches_written += 1
+
+    def _report(self, error: Exception):
+        if self._on_error:
+            self._on_error(error)
+
+    def close(self):
+        """Drena la cola y hace fsync del log (se llama al apagar el proceso)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self.usage_log is not None:
+            self.usage_log.sync()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores del writer para debug"""
+        return {
+            "pending": self._queue.qsize(),
+            "batches_written": self.batches_written,
+            "entries_written": self.entries_written,
+            "records_written": self.records_written,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval
+        }